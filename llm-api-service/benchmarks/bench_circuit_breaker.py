@@ -0,0 +1,80 @@
+"""Simulate a provider outage with and without circuit breakers.
+
+Requests go to a configured provider and fall back to a backup provider, as
+in the service. The configured provider times out for the middle third of
+the run and then recovers. Outcomes are recorded in a ``ProviderMonitor``
+on a simulated clock, and the configured provider is only called when its
+circuit admits the call. Reports mean latency during the outage, timeouts
+paid, and how many requests after the recovery still went to the backup.
+
+Usage:
+    python benchmarks/bench_circuit_breaker.py --requests 3000 --interval 0.5
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from freegpt4.utils.provider_monitor import ProviderMonitor  # noqa: E402
+
+PRIMARY_LATENCY = 1.0   # Seconds per successful call of the configured provider
+BACKUP_LATENCY = 3.0    # Seconds per successful call of the backup provider
+TIMEOUT = 60.0          # Cost of a call to the provider while it is down
+
+def simulate(breaker: bool, requests: int, interval: float, cool_down: float) -> dict:
+    """Run the scenario and collect outage and recovery figures."""
+    now = [0.0]
+    monitor = ProviderMonitor(clock=lambda: now[0])
+    monitor.configure_circuit_breakers(failure_threshold=5 if breaker else 0, cool_down=cool_down)
+    outage = range(requests // 3, 2 * requests // 3)
+    outage_latencies = []
+    timeouts = 0
+    backup_after_recovery = 0
+
+    for index in range(requests):
+        now[0] = index * interval
+        elapsed = 0.0
+        served_by_primary = False
+        if monitor.allow_request("Primary"):
+            if index in outage:
+                elapsed += TIMEOUT
+                timeouts += 1
+                monitor.record_failure("Primary", "timeout")
+            else:
+                elapsed += PRIMARY_LATENCY
+                monitor.record_success("Primary")
+                served_by_primary = True
+        if not served_by_primary:
+            elapsed += BACKUP_LATENCY
+            monitor.record_success("Backup")
+
+        if index in outage:
+            outage_latencies.append(elapsed)
+        elif index >= outage.stop and not served_by_primary:
+            backup_after_recovery += 1
+
+    return {
+        "mean": sum(outage_latencies) / len(outage_latencies),
+        "timeouts": timeouts,
+        "backup_after": backup_after_recovery,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--interval", type=float, default=0.5, help="Simulated seconds between requests")
+    parser.add_argument("--cool-down", type=float, default=30.0)
+    args = parser.parse_args()
+
+    print(f"{'breaker':<8} {'outage mean':>12} {'timeouts':>9} {'backup after recovery':>22}")
+    for breaker in (False, True):
+        result = simulate(breaker, args.requests, args.interval, args.cool_down)
+        print(
+            f"{'on' if breaker else 'off':<8} {result['mean']:>12.2f} "
+            f"{result['timeouts']:>9} {result['backup_after']:>22}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Benchmark DatabaseManager throughput under concurrent writers.
+
+Compares two connection strategies on a fresh database file:
+
+* legacy - a new connection per operation, default rollback journal
+* pooled - reused WAL-mode connections from ``SQLitePool``
+
+Each run starts N writer threads calling ``save_chat_history`` and N reader
+threads calling ``get_settings`` for a fixed duration, and reports operations
+per second and ``database is locked`` errors. All threads share one
+database manager, as request threads do within a replica.
+``get_settings`` is measured with its settings cache bypassed, so the numbers
+show raw row reads.
+
+Usage:
+    python benchmarks/bench_database.py --writers 1 4 16 --duration 3
+"""
+
+import argparse
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from freegpt4.database import DatabaseManager  # noqa: E402
+from freegpt4.utils.exceptions import DatabaseError  # noqa: E402
+
+class LegacyDatabaseManager(DatabaseManager):
+    """Database manager with the per-operation connections used before pooling."""
+
+    @contextmanager
+    def get_connection(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn, conn.cursor()
+        except sqlite3.Error as e:
+            conn.rollback()
+            raise DatabaseError(f"Database operation failed: {e}")
+        finally:
+            conn.close()
+
+def make_manager(kind: str, path: str) -> DatabaseManager:
+    """Create a database manager of the given kind."""
+    if kind == "pooled":
+        return DatabaseManager(path)
+
+    manager = LegacyDatabaseManager(path)
+    manager.pool.close()
+    # Put the legacy database back on the default rollback journal
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.close()
+    return manager
+
+def run(kind: str, writers: int, duration: float) -> dict:
+    """Run one benchmark configuration."""
+    directory = tempfile.mkdtemp(prefix="freegpt4-bench-")
+    path = str(Path(directory) / "settings.db")
+    manager = make_manager(kind, path)
+    for index in range(writers):
+        manager.create_user(f"bench{index}", "benchmark-password")
+
+    history = '[{"role": "user", "content": "' + "x" * 2000 + '"}]'
+    counts = {"writes": 0, "reads": 0, "errors": 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def writer(index: int):
+        done = errors = 0
+        while not stop.is_set():
+            try:
+                manager.save_chat_history(f"bench{index}", history)
+                done += 1
+            except DatabaseError:
+                errors += 1
+        with lock:
+            counts["writes"] += done
+            counts["errors"] += errors
+
+    def reader():
+        done = errors = 0
+        while not stop.is_set():
+            try:
+                manager.invalidate_settings_cache()
+                manager.get_settings()
+                done += 1
+            except DatabaseError:
+                errors += 1
+        with lock:
+            counts["reads"] += done
+            counts["errors"] += errors
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return {
+        "writes_per_sec": counts["writes"] / duration,
+        "reads_per_sec": counts["reads"] / duration,
+        "errors": counts["errors"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--duration", type=float, default=3.0)
+    args = parser.parse_args()
+
+    print(f"{'mode':<8} {'writers':>7} {'writes/s':>10} {'reads/s':>10} {'errors':>7}")
+    for writers in args.writers:
+        for kind in ("legacy", "pooled"):
+            result = run(kind, writers, args.duration)
+            print(
+                f"{kind:<8} {writers:>7} {result['writes_per_sec']:>10.0f} "
+                f"{result['reads_per_sec']:>10.0f} {result['errors']:>7}"
+            )
+
+if __name__ == "__main__":
+    main()
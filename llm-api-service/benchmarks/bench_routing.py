@@ -0,0 +1,134 @@
+"""Simulate provider routing and compare request latency.
+
+Replays the same stream of simulated requests through two orderings of the
+provider fallback chain:
+
+* legacy - Auto first (modelled as a uniformly random provider, as g4f's
+  Auto mode picks any working provider), then the top 3 reliable providers
+  by success rate, then up to 5 other healthy providers
+* routed - ``ProviderRouter`` (Thompson sampling over windowed stats)
+
+Each attempt draws a latency from the provider's log-normal distribution
+and fails with the provider's failure probability; a failure costs either a
+fast error or a timeout. A request's latency is the sum of its attempts.
+Halfway through, the fastest provider degrades and a broken one recovers,
+so the routers also have to adapt. Outcomes are fed into a
+``ProviderMonitor`` per strategy, exactly as the service records them, on a
+simulated clock advancing ``INTERVAL`` seconds per request so the one-hour
+windows slide.
+
+Usage:
+    python benchmarks/bench_routing.py --requests 5000 --seed 1
+"""
+
+import argparse
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from freegpt4.utils.provider_monitor import ProviderMonitor  # noqa: E402
+from freegpt4.utils.provider_router import ProviderRouter  # noqa: E402
+
+# name: (median latency, log-normal sigma, failure probability)
+PROVIDERS = {
+    "Fast": (1.0, 0.3, 0.05),
+    "Steady": (2.0, 0.2, 0.02),
+    "Slow": (6.0, 0.3, 0.01),
+    "Flaky": (1.5, 0.4, 0.40),
+    "Broken": (3.0, 0.3, 0.95),
+    "Jittery": (1.2, 1.0, 0.05),
+}
+
+# Applied halfway through the run
+PHASE_TWO = {
+    "Fast": (1.0, 0.3, 0.70),
+    "Broken": (0.8, 0.2, 0.05),
+}
+
+TIMEOUT = 30.0          # Cost of a failure that times out
+FAST_ERROR = 0.3        # Cost of a failure that errors out quickly
+TIMEOUT_SHARE = 0.3     # Share of failures that time out
+MAX_ATTEMPTS = 9        # Configured/Auto + 3 reliable + 5 healthy
+INTERVAL = 2.0          # Simulated seconds between requests
+
+def legacy_order(monitor: ProviderMonitor, rng: random.Random) -> list:
+    """Order providers like the fallback chain without routing."""
+    available = {name: True for name in PROVIDERS}
+    order = [rng.choice(list(PROVIDERS))]
+    for name in monitor.get_reliable_providers(available)[:3]:
+        if name not in order:
+            order.append(name)
+    for name in monitor.get_healthy_providers(available)[:5]:
+        if name not in order:
+            order.append(name)
+    return order
+
+def attempt(profile: tuple, rng: random.Random) -> tuple:
+    """Simulate one provider call, returning (success, seconds)."""
+    median, sigma, failure = profile
+    if rng.random() < failure:
+        return False, TIMEOUT if rng.random() < TIMEOUT_SHARE else FAST_ERROR
+    return True, rng.lognormvariate(0, sigma) * median
+
+def simulate(strategy: str, requests: int, seed: int) -> list:
+    """Run one strategy and return per-request latencies (None when every attempt failed)."""
+    rng = random.Random(seed)
+    now = [0.0]
+    monitor = ProviderMonitor(clock=lambda: now[0])
+    router = ProviderRouter(monitor, rng=random.Random(seed + 1))
+    profiles = dict(PROVIDERS)
+    latencies = []
+
+    for index in range(requests):
+        now[0] = index * INTERVAL
+        if index == requests // 2:
+            profiles.update(PHASE_TWO)
+
+        order = router.rank(PROVIDERS) if strategy == "routed" else legacy_order(monitor, rng)
+        elapsed = 0.0
+        succeeded = False
+        for name in order[:MAX_ATTEMPTS]:
+            ok, seconds = attempt(profiles[name], rng)
+            elapsed += seconds
+            if ok:
+                monitor.record_success(name)
+                monitor.record_latency(name, seconds, seconds)
+                succeeded = True
+                break
+            monitor.record_failure(name, "timeout" if seconds == TIMEOUT else "exception")
+        latencies.append(elapsed if succeeded else None)
+    return latencies
+
+def summarize(latencies: list) -> dict:
+    """Compute mean and tail latency of successful requests."""
+    ok = sorted(value for value in latencies if value is not None)
+
+    def percentile(p):
+        return ok[min(len(ok) - 1, int(round(p / 100 * (len(ok) - 1))))]
+
+    return {
+        "mean": sum(ok) / len(ok),
+        "p50": percentile(50),
+        "p95": percentile(95),
+        "p99": percentile(99),
+        "failed": len(latencies) - len(ok),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'strategy':<8} {'mean':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'failed':>7}")
+    for strategy in ("legacy", "routed"):
+        result = summarize(simulate(strategy, args.requests, args.seed))
+        print(
+            f"{strategy:<8} {result['mean']:>7.2f} {result['p50']:>7.2f} "
+            f"{result['p95']:>7.2f} {result['p99']:>7.2f} {result['failed']:>7}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Benchmark requests/sec of the serving models for the main endpoint.
+
+Compares three ways of running ``ai_service.generate_response``:
+
+* legacy - Flask view that creates and closes an event loop per request
+* shared - Flask view running on the shared background loop (WSGI mode)
+* asgi   - ASGI app, every request on the server's own loop
+
+Provider latency is simulated by replacing ``ai_service.generate_response``
+with a coroutine that sleeps, so the numbers reflect dispatch overhead and
+concurrency only. Flask modes are driven by one client thread per concurrent
+request, like the threaded development server.
+
+Usage:
+    python benchmarks/bench_serving.py --requests 2000 --concurrency 64 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from freegpt4 import FreeGPT4_Server as server  # noqa: E402
+from freegpt4.ai_service import ai_service  # noqa: E402
+
+def install_fake_provider(latency: float):
+    """Replace the AI call with a fixed-latency coroutine."""
+    async def fake_generate_response(message: str, **kwargs) -> str:
+        await asyncio.sleep(latency)
+        return f"echo: {message}"
+
+    ai_service.generate_response = fake_generate_response
+
+def legacy_index():
+    """Main endpoint as it was served before the shared loop."""
+    question = server.request.args.get(server.server_manager.args.keyword)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(server.generate_answer(question))
+    finally:
+        loop.close()
+
+def run_flask(path: str, total: int, concurrency: int) -> float:
+    """Drive a Flask route from a pool of client threads."""
+    client = server.app.test_client()
+
+    def one_request(_):
+        response = client.get(path)
+        assert response.status_code == 200, response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one_request, range(total)))
+    return time.perf_counter() - start
+
+async def _asgi_get(app, path: str, query: str) -> int:
+    """Issue a single GET against an ASGI app and return the status code."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+def run_asgi(total: int, concurrency: int) -> float:
+    """Drive the ASGI app with bounded concurrent tasks on one loop."""
+    from freegpt4.asgi import app
+
+    async def drive():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one_request():
+            async with semaphore:
+                status = await _asgi_get(app, "/", "text=hello")
+                assert status == 200, status
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_request() for _ in range(total)))
+        return time.perf_counter() - start
+
+    return asyncio.run(drive())
+
+def main():
+    parser = argparse.ArgumentParser(description="Serving model benchmark")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per mode")
+    parser.add_argument("--concurrency", type=int, default=64, help="Concurrent clients")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated provider latency (s)")
+    opts = parser.parse_args()
+
+    server.init_server_manager(server.ServerArgumentParser().parser.parse_args(["--log-level", "WARNING"]))
+    install_fake_provider(opts.latency)
+    server.app.add_url_rule("/legacy", "legacy_index", legacy_index)
+
+    results = {
+        "legacy": run_flask("/legacy?text=hello", opts.requests, opts.concurrency),
+        "shared": run_flask("/?text=hello", opts.requests, opts.concurrency),
+        "asgi": run_asgi(opts.requests, opts.concurrency),
+    }
+
+    print(f"{opts.requests} requests, concurrency {opts.concurrency}, latency {opts.latency * 1000:.0f} ms")
+    baseline = opts.requests / results["legacy"]
+    for mode, elapsed in results.items():
+        rps = opts.requests / elapsed
+        print(f"  {mode:<8} {rps:10.1f} req/s  ({rps / baseline:.2f}x legacy)")
+
+if __name__ == "__main__":
+    main()
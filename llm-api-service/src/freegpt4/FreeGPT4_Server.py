@@ -7,19 +7,21 @@ GPT4Free Credits: github.com/xtekky/gpt4free
 
 import os
 import argparse
-import threading
 import json
 from pathlib import Path
-from typing import Optional
+from typing import Optional, AsyncGenerator
 
-from flask import Flask, request, render_template, redirect, jsonify, session
+from flask import Flask, Response, request, render_template, redirect, jsonify, session, stream_with_context
 from werkzeug.utils import secure_filename
-from g4f.api import run_api
 
 from freegpt4.config import config
 from freegpt4.database import db_manager
 from freegpt4.ai_service import ai_service
+from freegpt4 import openai_compat, batch
 from freegpt4.utils.logging import logger, setup_logging
+from freegpt4.utils.event_loop import background_loop
+from freegpt4.utils.provider_monitor import provider_monitor
+from freegpt4.utils.deadline import Deadline, NO_DEADLINE
 from freegpt4.utils.exceptions import (
     FreeGPTException, 
     ValidationError, 
@@ -30,12 +32,15 @@ from freegpt4.utils.validation import (
     validate_file_upload,
     validate_port,
     validate_proxy_format,
+    validate_conversation_id,
     sanitize_input
 )
 from freegpt4.utils.helpers import (
     load_json_file,
     save_json_file,
     parse_proxy_url,
+    parse_bool,
+    format_sse_event,
     safe_filename
 )
 from functools import wraps
@@ -163,7 +168,7 @@ class ServerArgumentParser:
         parser.add_argument(
             "--enable-fast-api",
             action='store_true',
-            help="Use the fast API standard (PORT 1336 - compatible with OpenAI integrations)",
+            help="Deprecated: the OpenAI-compatible API is always served at /v1 on the main port",
         )
         parser.add_argument(
             "--log-level",
@@ -190,6 +195,11 @@ class ServerArgumentParser:
             action='store_true',
             help="Enable detailed request/response logging",
         )
+        parser.add_argument(
+            "--asgi",
+            action='store_true',
+            help="Serve through uvicorn (ASGI) with every route on one event loop",
+        )
         
         return parser
     
@@ -203,7 +213,6 @@ class ServerManager:
     
     def __init__(self, args):
         self.args = args
-        self.fast_api_thread = None
         self._setup_working_directory()
         self._merge_settings_with_args()
         self._setup_logging()
@@ -301,13 +310,15 @@ class ServerManager:
             self.args.model = self.args.model or config.api.default_model
     
     def start_fast_api(self):
-        """Start Fast API in background thread."""
-        if self.fast_api_thread and self.fast_api_thread.is_alive():
-            return
+        """Point users of the old Fast API to the built-in OpenAI endpoints.
         
-        logger.info(f"Starting Fast API on port {config.api.fast_api_port}")
-        self.fast_api_thread = threading.Thread(target=run_api, name="fastapi", daemon=True)
-        self.fast_api_thread.start()
+        The OpenAI-compatible API used to run as a separate g4f server on its
+        own port and thread. It is now served by the main app under /v1.
+        """
+        logger.info(
+            f"OpenAI-compatible API is served at /v1/chat/completions on port {self.args.port}; "
+            "--enable-fast-api no longer starts a separate server"
+        )
     
     def setup_password(self):
         """No password setup needed - authentication disabled."""
@@ -336,84 +347,270 @@ def handle_general_exception(e):
     logger.error(f"Unexpected error: {e}", exc_info=True)
     return jsonify({"error": "Internal server error"}), 500
 
-@app.route("/", methods=["GET", "POST"])
-@log_request
-def index():
-    """Main API endpoint for chat completion."""
-    import asyncio
+def cache_allowed(cache_control: Optional[str], no_cache=None) -> bool:
+    """Check whether a request allows cached responses.
     
-    async def _async_index():
-        try:
-            # Get current settings
-            settings = db_manager.get_settings()
-            
-            # Extract question from request
-            question = None
-            if request.method == "GET":
-                question = request.args.get(server_manager.args.keyword)
-            else:
-                # Handle POST request - check for JSON body first, then file upload
-                if request.is_json:
-                    # Handle JSON body
-                    data = request.get_json()
-                    if data and server_manager.args.keyword in data:
-                        question = data[server_manager.args.keyword]
-                elif 'file' in request.files:
-                    # Handle file upload
-                    file = request.files['file']
-                    is_valid, error_msg = validate_file_upload(file, config.files.allowed_extensions)
-                    if not is_valid:
-                        raise FileUploadError(error_msg)
-                    
-                    question = file.read().decode('utf-8')
-                else:
-                    # Handle form data
-                    question = request.form.get(server_manager.args.keyword)
-            
-            if not question:
-                return "<p id='response'>Please enter a question</p>"
-            
-            # Sanitize input
-            question = sanitize_input(question, 10000)  # 10KB limit
-            
-            # Use default username
-            username = "user"
-            
-            # Generate AI response
-            response_text = await ai_service.generate_response(
-                message=question,
-                username=username,
-                use_history=server_manager.args.enable_history,
-                remove_sources=server_manager.args.remove_sources,
-                use_proxies=server_manager.args.enable_proxies,
-                cookie_file=server_manager.args.cookie_file
-            )
-            
-            logger.info(f"Generated response for user '{username}' ({len(response_text)} chars)")
-            return response_text
-            
-        except FreeGPTException as e:
-            logger.error(f"API error: {e}")
-            return f"<p id='response'>Error: {e}</p>"
-        except Exception as e:
-            logger.error(f"Unexpected API error: {e}", exc_info=True)
-            return "<p id='response'>Internal server error</p>"
+    Args:
+        cache_control: Cache-Control request header
+        no_cache: Value of the no_cache request field
+        
+    Returns:
+        False if the client asked to bypass the response cache
+    """
+    if parse_bool(no_cache):
+        return False
+    directives = (cache_control or "").lower()
+    return "no-cache" not in directives and "no-store" not in directives
+
+def request_deadline(request_timeout: Optional[str]) -> Deadline:
+    """Start the deadline of an incoming request.
+    
+    Args:
+        request_timeout: X-Request-Timeout request header in seconds
+        
+    Returns:
+        Deadline from the header, or the configured default
+        
+    Raises:
+        ValidationError: If the header is not a positive number
+    """
+    return Deadline.from_header(request_timeout, config.api.request_timeout, config.api.max_request_timeout)
+
+def batch_deadline(request_timeout: Optional[str], stream: bool = False) -> Deadline:
+    """Start the deadline of a whole batch.
+    
+    Batch items get their own budgets, and the batch deadline caps every
+    item's budget. A streamed batch keeps the connection busy with results,
+    so it has no deadline unless the client sets one. A non-streamed batch
+    sends nothing until every item is done, so by default it must finish
+    within the request timeout, before the proxy gives up on it.
     
-    # Run the async function
+    Args:
+        request_timeout: X-Request-Timeout request header in seconds
+        stream: Whether results are streamed as they finish
+        
+    Returns:
+        Deadline from the header, or the default for the batch kind
+        
+    Raises:
+        ValidationError: If the header is not a positive number
+    """
+    default = 0 if stream else config.api.request_timeout
+    return Deadline.from_header(request_timeout, default, config.api.max_request_timeout)
+
+def collect_stats() -> dict:
+    """Collect runtime statistics for the /stats endpoint."""
+    return {
+        "cache": ai_service.cache.stats() if ai_service.cache else None,
+        "disk_cache": ai_service.disk_cache.stats() if ai_service.disk_cache else None,
+        "coalescing": ai_service.in_flight.stats() if ai_service.in_flight else None,
+        "history_cache": db_manager.history_cache.stats() if db_manager.history_cache else None,
+        "cookies": ai_service.cookie_store.stats(),
+        "proxies": ai_service.proxy_pool.stats(),
+        "providers": provider_monitor.get_stats(),
+        "probes": ai_service.prober.stats() if ai_service.prober else None
+    }
+
+async def generate_answer(
+    question: Optional[str],
+    use_cache: bool = True,
+    conversation: Optional[str] = None,
+    deadline: Deadline = NO_DEADLINE
+) -> str:
+    """Generate the response body for the main chat endpoint.
+    
+    Shared by the Flask views and the ASGI app so both serving modes behave
+    the same once the question has been extracted from the request.
+    
+    Args:
+        question: Raw question text from the request
+        use_cache: Whether a cached response may be returned
+        conversation: Conversation ID, defaults to the user's default conversation
+        deadline: Request deadline
+        
+    Returns:
+        Response body
+    """
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        return loop.run_until_complete(_async_index())
+        if not question:
+            return "<p id='response'>Please enter a question</p>"
+        
+        # Sanitize input
+        question = sanitize_input(question, 10000)  # 10KB limit
+        
+        # Use default username
+        username = "user"
+        
+        # Generate AI response
+        response_text = await ai_service.generate_response(
+            message=question,
+            username=username,
+            use_history=server_manager.args.enable_history,
+            remove_sources=server_manager.args.remove_sources,
+            use_proxies=server_manager.args.enable_proxies,
+            cookie_file=server_manager.args.cookie_file,
+            use_cache=use_cache,
+            conversation=conversation,
+            deadline=deadline
+        )
+        
+        logger.info(f"Generated response for user '{username}' ({len(response_text)} chars)")
+        return response_text
+        
+    except FreeGPTException as e:
+        logger.error(f"API error: {e}")
+        return f"<p id='response'>Error: {e}</p>"
     except Exception as e:
-        logger.error(f"Async execution error: {e}", exc_info=True)
-        return f"<p id='response'>Error: AI API call failed: {e}</p>"
-    finally:
-        loop.close()
+        logger.error(f"Unexpected API error: {e}", exc_info=True)
+        return "<p id='response'>Internal server error</p>"
 
+# Headers for streamed responses; X-Accel-Buffering stops nginx from buffering
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
 
-@app.route("/settings", methods=["GET"])
-def settings():
-    """Settings page."""
+async def stream_answer(
+    question: Optional[str],
+    use_cache: bool = True,
+    conversation: Optional[str] = None,
+    deadline: Deadline = NO_DEADLINE
+) -> AsyncGenerator[str, None]:
+    """Stream the response for the main chat endpoint as Server-Sent Events.
+    
+    Each chunk is sent as ``data: {"content": ...}`` as soon as the provider
+    produces it, followed by ``data: [DONE]``. Errors are sent as an
+    ``error`` event since the status code has already been sent.
+    
+    Args:
+        question: Raw question text from the request
+        use_cache: Whether a cached response may be returned
+        conversation: Conversation ID, defaults to the user's default conversation
+        deadline: Request deadline, bounding the time until the first chunk
+        
+    Yields:
+        SSE messages
+    """
+    if not question:
+        yield format_sse_event({"error": "Please enter a question"}, event="error")
+        return
+    
+    question = sanitize_input(question, 10000)  # 10KB limit
+    username = "user"
+    total_chars = 0
+    
+    try:
+        async for chunk in ai_service.stream_response(
+            message=question,
+            username=username,
+            use_history=server_manager.args.enable_history,
+            use_proxies=server_manager.args.enable_proxies,
+            cookie_file=server_manager.args.cookie_file,
+            use_cache=use_cache,
+            conversation=conversation,
+            deadline=deadline
+        ):
+            total_chars += len(chunk)
+            yield format_sse_event({"content": chunk})
+        
+        yield format_sse_event("[DONE]")
+        logger.info(f"Streamed response for user '{username}' ({total_chars} chars)")
+        
+    except FreeGPTException as e:
+        logger.error(f"API error: {e}")
+        yield format_sse_event({"error": str(e)}, event="error")
+    except Exception as e:
+        logger.error(f"Unexpected API error: {e}", exc_info=True)
+        yield format_sse_event({"error": "Internal server error"}, event="error")
+
+# Largest page returned by the conversation endpoints
+MAX_PAGE_SIZE = 200
+
+def _page_int(value, name: str, default: Optional[int] = None) -> Optional[int]:
+    """Parse an optional non-negative integer query parameter.
+    
+    Raises:
+        ValidationError: If the value is not a non-negative integer
+    """
+    if value is None or value == "":
+        return default
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValidationError(f"'{name}' must be an integer")
+    if number < 0:
+        raise ValidationError(f"'{name}' must not be negative")
+    return number
+
+def _page_limit(value) -> int:
+    """Parse a page size, capped at MAX_PAGE_SIZE."""
+    limit = _page_int(value, "limit", 50)
+    if limit < 1:
+        raise ValidationError("'limit' must be at least 1")
+    return min(limit, MAX_PAGE_SIZE)
+
+def list_conversations_page(params) -> dict:
+    """List the user's conversations for the /conversations endpoint.
+    
+    Args:
+        params: Query parameters (``limit`` and ``before``, an ``<updated_at>:<id>`` cursor)
+        
+    Returns:
+        Conversations, most recently updated first, and the cursor of the next page
+    """
+    limit = _page_limit(params.get("limit"))
+    before = params.get("before")
+    if before is not None:
+        # A bare timestamp lists everything updated before it
+        updated_at, _, conversation_id = before.partition(":")
+        try:
+            before = (float(updated_at), conversation_id)
+        except ValueError:
+            raise ValidationError("'before' must be a cursor returned as 'next_before'")
+    
+    conversations = db_manager.list_conversations("user", limit=limit, before=before)
+    next_before = None
+    if len(conversations) == limit:
+        last = conversations[-1]
+        next_before = f"{last['updated_at']!r}:{last['id']}"
+    return {"conversations": conversations, "next_before": next_before}
+
+def conversation_messages_page(conversation_id: str, params) -> dict:
+    """Page through one conversation for the /conversations/<id> endpoint.
+    
+    Args:
+        conversation_id: Conversation ID
+        params: Query parameters (``limit`` and the ``after``/``before`` seq cursors)
+        
+    Returns:
+        Messages, oldest first, and the cursor of the next page
+        
+    Raises:
+        ValidationError: If the ID or a parameter is invalid
+    """
+    is_valid, error_msg = validate_conversation_id(conversation_id)
+    if not is_valid:
+        raise ValidationError(error_msg)
+    
+    limit = _page_limit(params.get("limit"))
+    after = _page_int(params.get("after"), "after")
+    before = _page_int(params.get("before"), "before")
+    
+    messages = db_manager.get_message_page(
+        "user", conversation_id, after_seq=after, before_seq=before, limit=limit
+    )
+    # Pages run forward with ``after`` and backward with ``before``
+    full = len(messages) == limit
+    backward = before is not None
+    return {
+        "id": conversation_id,
+        "messages": messages,
+        "next_after": messages[-1]["seq"] if full and not backward else None,
+        "next_before": messages[0]["seq"] if full and backward else None
+    }
+
+def render_settings_page() -> str:
+    """Render the settings page."""
     if not server_manager.args.enable_gui:
         return "The GUI is disabled. Use the --enable-gui argument to enable it."
     
@@ -437,9 +634,17 @@ def settings():
         logger.error(f"Settings page error: {e}")
         return f"Error: {e}"
 
-@app.route("/save", methods=["POST"])
-def save_settings():
-    """Save admin settings."""
+def apply_settings_form(form, cookie_upload=None, cookie_content: Optional[bytes] = None) -> str:
+    """Validate and apply a submitted settings form.
+    
+    Args:
+        form: Mapping of submitted form fields
+        cookie_upload: Uploaded cookie file object (must expose ``filename``)
+        cookie_content: Raw content of the uploaded cookie file
+        
+    Returns:
+        Result message for the client
+    """
     try:
         
         # Process settings update
@@ -451,12 +656,12 @@ def save_settings():
             "proxies", "fast_api", "enable_request_logging"
         ]
         for field in bool_fields:
-            settings_update[field] = request.form.get(field) == "true"
+            settings_update[field] = form.get(field) == "true"
         
         # String settings
         string_fields = ["port", "model", "keyword", "provider", "system_prompt", "log_level", "log_file", "log_format"]
         for field in string_fields:
-            value = request.form.get(field, "")
+            value = form.get(field, "")
             if field == "port":
                 is_valid, error_msg = validate_port(value)
                 if not is_valid:
@@ -474,9 +679,9 @@ def save_settings():
             settings_update[field] = sanitize_input(value)
         
         # Handle password update
-        new_password = request.form.get("new_password", "")
+        new_password = form.get("new_password", "")
         if new_password:
-            confirm_password = request.form.get("confirm_password", "")
+            confirm_password = form.get("confirm_password", "")
             if new_password != confirm_password:
                 raise ValidationError("Passwords do not match")
             if len(new_password) < 8:
@@ -485,24 +690,22 @@ def save_settings():
         
         
         # Handle file upload
-        if 'cookie_file' in request.files:
-            file = request.files['cookie_file']
-            if file.filename:
-                is_valid, error_msg = validate_file_upload(file, config.files.allowed_extensions)
-                if not is_valid:
-                    raise FileUploadError(error_msg)
-                
-                filename = safe_filename(file.filename)
-                file_path = Path(app.config['UPLOAD_FOLDER']) / filename
-                file.save(str(file_path))
-                settings_update["cookie_file"] = str(file_path)
+        if cookie_upload is not None and cookie_upload.filename:
+            is_valid, error_msg = validate_file_upload(cookie_upload, config.files.allowed_extensions)
+            if not is_valid:
+                raise FileUploadError(error_msg)
+            
+            filename = safe_filename(cookie_upload.filename)
+            file_path = Path(app.config['UPLOAD_FOLDER']) / filename
+            file_path.write_bytes(cookie_content or b"")
+            settings_update["cookie_file"] = str(file_path)
         
         # Handle proxies
-        if request.form.get("proxies") == "true":
+        if form.get("proxies") == "true":
             proxies = []
             i = 1
-            while f"proxy_{i}" in request.form:
-                proxy_url = request.form.get(f"proxy_{i}", "").strip()
+            while f"proxy_{i}" in form:
+                proxy_url = form.get(f"proxy_{i}", "").strip()
                 if proxy_url:
                     if not validate_proxy_format(proxy_url):
                         raise ValidationError(f"Invalid proxy format: {proxy_url}")
@@ -520,10 +723,6 @@ def save_settings():
         # Save settings
         db_manager.update_settings(settings_update)
         
-        # Restart Fast API if needed
-        if settings_update.get("fast_api") and not server_manager.fast_api_thread:
-            server_manager.start_fast_api()
-        
         # Reconfigure logging if logging settings changed
         logging_fields = ["log_level", "log_file", "log_format", "enable_request_logging"]
         if any(field in settings_update for field in logging_fields):
@@ -540,6 +739,150 @@ def save_settings():
         logger.error(f"Unexpected settings save error: {e}")
         return "Error: Failed to save settings"
 
+@app.route("/", methods=["GET", "POST"])
+@log_request
+def index():
+    """Main API endpoint for chat completion."""
+    try:
+        deadline = request_deadline(request.headers.get("X-Request-Timeout"))
+        
+        # Extract question from request
+        question = None
+        stream = parse_bool(request.values.get("stream"))
+        no_cache = request.values.get("no_cache")
+        conversation = request.values.get("conversation")
+        if request.method == "GET":
+            question = request.args.get(server_manager.args.keyword)
+        else:
+            # Handle POST request - check for JSON body first, then file upload
+            if request.is_json:
+                # Handle JSON body
+                data = request.get_json()
+                if data and server_manager.args.keyword in data:
+                    question = data[server_manager.args.keyword]
+                if isinstance(data, dict) and "stream" in data:
+                    stream = parse_bool(data["stream"])
+                if isinstance(data, dict) and "no_cache" in data:
+                    no_cache = data["no_cache"]
+                if isinstance(data, dict) and "conversation" in data:
+                    conversation = data["conversation"]
+            elif 'file' in request.files:
+                # Handle file upload
+                file = request.files['file']
+                is_valid, error_msg = validate_file_upload(file, config.files.allowed_extensions)
+                if not is_valid:
+                    raise FileUploadError(error_msg)
+                
+                question = file.read().decode('utf-8')
+            else:
+                # Handle form data
+                question = request.form.get(server_manager.args.keyword)
+    except FreeGPTException as e:
+        logger.error(f"API error: {e}")
+        return f"<p id='response'>Error: {e}</p>"
+    except Exception as e:
+        logger.error(f"Unexpected API error: {e}", exc_info=True)
+        return "<p id='response'>Internal server error</p>"
+    
+    use_cache = cache_allowed(request.headers.get("Cache-Control"), no_cache)
+    if stream:
+        events = background_loop.iterate(stream_answer(question, use_cache, conversation, deadline))
+        return Response(stream_with_context(events), mimetype="text/event-stream", headers=SSE_HEADERS)
+    
+    # Run on the shared event loop so concurrent requests interleave
+    try:
+        return background_loop.run(generate_answer(question, use_cache, conversation, deadline))
+    except Exception as e:
+        logger.error(f"Async execution error: {e}", exc_info=True)
+        return f"<p id='response'>Error: AI API call failed: {e}</p>"
+
+
+@app.route("/settings", methods=["GET"])
+def settings():
+    """Settings page."""
+    return render_settings_page()
+
+@app.route("/save", methods=["POST"])
+def save_settings():
+    """Save admin settings."""
+    cookie_upload = request.files.get('cookie_file')
+    cookie_content = cookie_upload.read() if cookie_upload and cookie_upload.filename else None
+    return apply_settings_form(request.form, cookie_upload, cookie_content)
+
+
+@app.route("/v1/chat/completions", methods=["POST"])
+@log_request
+def chat_completions():
+    """OpenAI-compatible chat completion endpoint."""
+    try:
+        completion_request = openai_compat.parse_chat_request(request.get_json(silent=True))
+        completion_request.use_cache &= cache_allowed(request.headers.get("Cache-Control"))
+        deadline = request_deadline(request.headers.get("X-Request-Timeout"))
+        
+        if completion_request.stream:
+            events = background_loop.iterate(openai_compat.stream_chat_completion(
+                completion_request,
+                use_proxies=server_manager.args.enable_proxies,
+                cookie_file=server_manager.args.cookie_file,
+                deadline=deadline
+            ))
+            return Response(stream_with_context(events), mimetype="text/event-stream", headers=SSE_HEADERS)
+        
+        return jsonify(background_loop.run(openai_compat.create_chat_completion(
+            completion_request,
+            remove_sources=server_manager.args.remove_sources,
+            use_proxies=server_manager.args.enable_proxies,
+            cookie_file=server_manager.args.cookie_file,
+            deadline=deadline
+        )))
+    except Exception as e:
+        if not isinstance(e, FreeGPTException):
+            logger.error(f"Unexpected chat completion error: {e}", exc_info=True)
+        message = str(e) if isinstance(e, FreeGPTException) else "Internal server error"
+        return jsonify(openai_compat.error_body(message, openai_compat.error_type(e))), openai_compat.error_status(e)
+
+@app.route("/batch", methods=["POST"])
+@log_request
+def batch_completions():
+    """Run many independent prompts concurrently."""
+    try:
+        batch_request = batch.parse_batch_request(request.get_json(silent=True))
+        batch_request.use_cache &= cache_allowed(request.headers.get("Cache-Control"))
+        deadline = batch_deadline(request.headers.get("X-Request-Timeout"), batch_request.stream)
+    except FreeGPTException as e:
+        return jsonify({"error": str(e)}), 400
+    
+    options = {
+        "remove_sources": server_manager.args.remove_sources,
+        "use_proxies": server_manager.args.enable_proxies,
+        "cookie_file": server_manager.args.cookie_file,
+        "deadline": deadline
+    }
+    if batch_request.stream:
+        lines = background_loop.iterate(batch.stream_batch(batch_request, **options))
+        return Response(stream_with_context(lines), mimetype="application/x-ndjson", headers=SSE_HEADERS)
+    
+    return jsonify(background_loop.run(batch.run_batch(batch_request, **options)))
+
+@app.route("/v1/models", methods=["GET"])
+def list_models():
+    """OpenAI-compatible model list."""
+    return jsonify(openai_compat.list_models())
+
+@app.route("/stats", methods=["GET"])
+def get_stats():
+    """Get runtime statistics."""
+    return jsonify(collect_stats())
+
+@app.route("/conversations", methods=["GET"])
+def list_conversations():
+    """List conversations, most recently updated first."""
+    return jsonify(list_conversations_page(request.args))
+
+@app.route("/conversations/<conversation_id>", methods=["GET"])
+def get_conversation(conversation_id):
+    """Get a page of messages from one conversation."""
+    return jsonify(conversation_messages_page(conversation_id, request.args))
 
 @app.route("/models", methods=["GET"])
 def get_models():
@@ -548,6 +891,41 @@ def get_models():
     return jsonify(ai_service.get_available_models(provider))
 
 
+def init_server_manager(args=None, probe: bool = True) -> ServerManager:
+    """Create the global server manager and start provider health probing.
+    
+    Args:
+        args: Parsed arguments, parsed from the command line if omitted
+        probe: Whether to start probing on the background loop; the ASGI app
+            starts it on its own loop instead
+        
+    Returns:
+        Server manager instance
+    """
+    global server_manager
+    if args is None:
+        args = ServerArgumentParser().parse_args()
+    server_manager = ServerManager(args)
+    if probe:
+        start_probing(background_loop.loop)
+    return server_manager
+
+def start_probing(loop):
+    """Start provider health probing on an event loop.
+    
+    Probes share provider state with user calls, so they must run on the
+    loop that serves those calls.
+    
+    Args:
+        loop: Running event loop
+    """
+    if ai_service.prober is not None:
+        ai_service.prober.start(
+            loop,
+            cookie_file=server_manager.args.cookie_file,
+            use_proxies=server_manager.args.enable_proxies
+        )
+
 def main():
     """Main entry point."""
     try:
@@ -556,8 +934,7 @@ def main():
         args = arg_parser.parse_args()
         
         # Initialize server manager
-        global server_manager
-        server_manager = ServerManager(args)
+        init_server_manager(args, probe=not args.asgi)
         
         # Set up password if needed
         server_manager.setup_password()
@@ -569,13 +946,26 @@ def main():
         logger.info(f"  GUI enabled: {args.enable_gui}")
         logger.info(f"  History enabled: {args.enable_history}")
         logger.info(f"  Proxies enabled: {args.enable_proxies}")
+        logger.info(f"  Serving mode: {'ASGI' if args.asgi else 'WSGI'}")
         
         # Start server
-        app.run(
-            host=config.server.host,
-            port=args.port,
-            debug=config.server.debug
-        )
+        if args.asgi:
+            import uvicorn
+            from freegpt4.asgi import app as asgi_app
+            
+            uvicorn.run(
+                asgi_app,
+                host=config.server.host,
+                port=args.port,
+                log_level=args.log_level.lower()
+            )
+        else:
+            app.run(
+                host=config.server.host,
+                port=args.port,
+                debug=config.server.debug,
+                threaded=True
+            )
         
     except KeyboardInterrupt:
         logger.info("Server shutdown requested by user")
@@ -1,25 +1,38 @@
 """AI service for handling GPT interactions."""
 
-import json
-import random
-from typing import Dict, List, Any, Optional, AsyncGenerator
-from pathlib import Path
+import asyncio
+import functools
+import inspect
+import time
+from typing import Dict, Iterable, List, Any, Optional, AsyncGenerator, Tuple
 
 import g4f
 
 from freegpt4.config import config
-from freegpt4.database import db_manager
-from freegpt4.utils.exceptions import AIProviderError, ValidationError
+from freegpt4.database import db_manager, DEFAULT_CONVERSATION
+from freegpt4.utils.exceptions import AIProviderError, DeadlineExceededError, ValidationError
 from freegpt4.utils.logging import logger
-from freegpt4.utils.http_utils import safe_api_call, TimeoutConfig
-from freegpt4.utils.helpers import (
-    load_json_file, 
-    clean_response_sources, 
-    select_random_proxy,
-    create_dummy_cookies
-)
+from freegpt4.utils.http_utils import safe_api_call
+from freegpt4.utils.deadline import Deadline, NO_DEADLINE
+from freegpt4.utils.provider_errors import ErrorClass, ProviderError, RetryAction, classify_error
+from freegpt4.utils.helpers import clean_response_sources
 from freegpt4.utils.provider_monitor import provider_monitor
-from freegpt4.utils.validation import validate_provider, validate_model
+from freegpt4.utils.provider_router import ProviderRouter
+from freegpt4.utils.health_prober import HealthProber
+from freegpt4.utils.cookie_store import CookieStore
+from freegpt4.utils.proxy_pool import ProxyPool
+from freegpt4.utils.cache import ResponseCache, SQLiteResponseCache, make_cache_key
+from freegpt4.utils.single_flight import SingleFlight
+from freegpt4.utils.context_window import fit_messages, fit_oldest_messages, get_token_budget
+from freegpt4.utils.validation import validate_provider, validate_model, validate_conversation_id
+
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+
+SUMMARY_INSTRUCTIONS = (
+    "Summarize the conversation below so it can replace the original messages. "
+    "Keep facts, names, numbers, decisions, user preferences and open questions. "
+    "Write in the language of the conversation and reply with the summary only."
+)
 
 class AIService:
     """Service for handling AI interactions."""
@@ -27,6 +40,72 @@ class AIService:
     def __init__(self):
         self.db = db_manager
         self.config = config
+        self.cache = None
+        if config.cache.enabled:
+            self.cache = ResponseCache(
+                max_entries=config.cache.max_entries,
+                max_bytes=config.cache.max_bytes,
+                ttl=config.cache.ttl
+            )
+        self.in_flight = SingleFlight() if config.api.coalesce_requests else None
+        self.router = None
+        if config.routing.enabled:
+            self.router = ProviderRouter(
+                provider_monitor,
+                prior_latency=config.routing.prior_latency,
+                failure_cost=config.routing.failure_cost
+            )
+        breaker = config.circuit_breaker
+        provider_monitor.configure_circuit_breakers(
+            failure_threshold=breaker.failure_threshold if breaker.enabled else 0,
+            cool_down=breaker.cool_down,
+            max_cool_down=breaker.max_cool_down,
+            half_open_max_calls=breaker.half_open_max_calls
+        )
+        bulkheads = config.bulkheads
+        provider_monitor.configure_bulkheads(
+            initial_limit=bulkheads.initial_limit,
+            min_limit=bulkheads.min_limit,
+            max_limit=bulkheads.max_limit,
+            max_queue=bulkheads.max_queue,
+            queue_timeout=bulkheads.queue_timeout,
+            decrease_factor=bulkheads.decrease_factor,
+            decrease_interval=bulkheads.decrease_interval
+        )
+        self.prober = None
+        if config.probing.enabled:
+            self.prober = HealthProber(
+                self.probe_provider,
+                providers=self._probe_targets,
+                monitor=provider_monitor,
+                interval=config.probing.interval,
+                jitter=config.probing.jitter,
+                concurrency=config.probing.concurrency
+            )
+        self.cookie_store = CookieStore(
+            check_interval=config.cookies.check_interval,
+            unauthorized_limit=config.cookies.unauthorized_limit
+        )
+        self.proxy_pool = ProxyPool(
+            path=config.files.proxies_file,
+            check_interval=config.proxies.check_interval,
+            alpha=config.proxies.alpha,
+            bench_after=config.proxies.bench_after_failures,
+            bench_seconds=config.proxies.bench_seconds,
+            sticky=config.proxies.sticky
+        )
+        self._compacting = set()
+        self._background_tasks = set()
+        self.disk_cache = None
+        if config.cache.enabled and config.cache.disk_enabled:
+            try:
+                self.disk_cache = SQLiteResponseCache(
+                    path=config.cache.disk_path,
+                    max_bytes=config.cache.disk_max_bytes,
+                    ttl=config.cache.disk_ttl
+                )
+            except Exception as e:
+                logger.warning(f"Disk response cache unavailable, using memory only: {e}")
     
     async def generate_response(
         self,
@@ -38,7 +117,10 @@ class AIService:
         use_history: bool = False,
         remove_sources: bool = True,
         use_proxies: bool = False,
-        cookie_file: Optional[str] = None
+        cookie_file: Optional[str] = None,
+        use_cache: bool = True,
+        conversation: Optional[str] = None,
+        deadline: Deadline = NO_DEADLINE
     ) -> str:
         """Generate AI response.
         
@@ -52,6 +134,9 @@ class AIService:
             remove_sources: Whether to remove source references
             use_proxies: Whether to use proxies
             cookie_file: Cookie file path
+            use_cache: Whether cached responses may be used (never with history)
+            conversation: Conversation ID, defaults to the user's default conversation
+            deadline: Request deadline
             
         Returns:
             AI response text
@@ -61,65 +146,33 @@ class AIService:
             ValidationError: If parameters are invalid
         """
         try:
-            # Get user settings
-            if username == "admin":
-                settings = self.db.get_settings()
-                user_settings = {
-                    "provider": provider or settings.get("provider", self.config.api.default_provider),
-                    "model": model or settings.get("model", self.config.api.default_model),
-                    "system_prompt": system_prompt or settings.get("system_prompt", ""),
-                    "message_history": use_history and settings.get("message_history", False)
-                }
-            else:
-                # For any other username, use default settings
-                settings = self.db.get_settings()
-                user_settings = {
-                    "provider": provider or settings.get("provider", self.config.api.default_provider),
-                    "model": model or settings.get("model", self.config.api.default_model),
-                    "system_prompt": system_prompt or settings.get("system_prompt", ""),
-                    "message_history": use_history and settings.get("message_history", False)
-                }
-            
-            # Validate provider and model
-            is_valid, error_msg = validate_provider(user_settings["provider"], self.config.available_providers)
-            if not is_valid:
-                raise ValidationError(error_msg)
-            
-            is_valid, error_msg = validate_model(user_settings["model"])
-            if not is_valid:
-                raise ValidationError(error_msg)
+            user_settings = await self._resolve_user_settings(username, provider, model, system_prompt, use_history)
+            conversation = self._resolve_conversation(conversation)
             
             # Prepare chat history
-            chat_history = self._prepare_chat_history(
+            chat_history = await self._prepare_chat_history(
                 message=message,
                 username=username,
+                conversation=conversation,
+                model=user_settings["model"],
                 system_prompt=user_settings["system_prompt"],
                 use_history=user_settings["message_history"]
             )
             
-            # Prepare cookies
-            cookies = self._load_cookies(cookie_file)
-            
-            # Prepare proxy
-            proxy = self._get_proxy() if use_proxies else None
-            
             # Generate response
-            response_text = await self._call_ai_api(
+            response_text = await self._complete(
                 chat_history=chat_history,
-                provider=user_settings["provider"],
-                model=user_settings["model"],
-                cookies=cookies,
-                proxy=proxy
+                user_settings=user_settings,
+                remove_sources=remove_sources,
+                use_proxies=use_proxies,
+                cookie_file=cookie_file,
+                use_cache=use_cache and not user_settings["message_history"],
+                deadline=deadline
             )
             
-            # Clean response if needed
-            if remove_sources:
-                response_text = clean_response_sources(response_text)
-            
             # Save chat history if enabled
             if user_settings["message_history"]:
-                chat_history.append({"role": "assistant", "content": response_text})
-                self.db.save_chat_history(username, json.dumps(chat_history))
+                await self._save_turn(username, conversation, message, response_text, user_settings, use_proxies, cookie_file)
             
             logger.info(f"AI response generated for user '{username}' using provider '{user_settings['provider']}'")
             return response_text
@@ -130,290 +183,1522 @@ class AIService:
             logger.error(f"Failed to generate AI response: {e}")
             raise AIProviderError(f"AI generation failed: {e}")
     
-    def _prepare_chat_history(
+    async def stream_response(
         self,
         message: str,
-        username: str,
-        system_prompt: str,
-        use_history: bool
-    ) -> List[Dict[str, str]]:
-        """Prepare chat history for AI request.
+        username: str = "admin",
+        provider: Optional[str] = None,
+        model: Optional[str] = None,
+        system_prompt: Optional[str] = None,
+        use_history: bool = False,
+        use_proxies: bool = False,
+        cookie_file: Optional[str] = None,
+        use_cache: bool = True,
+        conversation: Optional[str] = None,
+        deadline: Deadline = NO_DEADLINE
+    ) -> AsyncGenerator[str, None]:
+        """Generate AI response as a stream of chunks.
+        
+        Chunks are yielded as soon as the provider produces them. Source
+        references cannot be removed from a partial response, so streamed
+        text is forwarded unchanged. The deadline bounds the time until the
+        first chunk; after that, the provider's idle timeout applies.
         
         Args:
-            message: Current user message
-            username: Username
-            system_prompt: System prompt
-            use_history: Whether to load previous history
+            message: User message
+            username: Username for context
+            provider: AI provider override
+            model: AI model override
+            system_prompt: System prompt override
+            use_history: Whether to use chat history
+            use_proxies: Whether to use proxies
+            cookie_file: Cookie file path
+            use_cache: Whether cached responses may be used (never with history)
+            conversation: Conversation ID, defaults to the user's default conversation
+            deadline: Request deadline
             
-        Returns:
-            List of chat messages
+        Yields:
+            Response text chunks
+            
+        Raises:
+            AIProviderError: If no provider produced a response
+            ValidationError: If parameters are invalid
         """
-        chat_history = []
+        user_settings = await self._resolve_user_settings(username, provider, model, system_prompt, use_history)
+        conversation = self._resolve_conversation(conversation)
         
-        # Add system prompt if provided
-        if system_prompt:
-            chat_history.append({"role": "system", "content": system_prompt})
+        chat_history = await self._prepare_chat_history(
+            message=message,
+            username=username,
+            conversation=conversation,
+            model=user_settings["model"],
+            system_prompt=user_settings["system_prompt"],
+            use_history=user_settings["message_history"]
+        )
         
-        # Load previous history if enabled
-        if use_history:
-            history_json = self.db.get_chat_history(username)
-            if history_json:
-                try:
-                    previous_history = json.loads(history_json)
-                    # Remove system prompt from previous history to avoid duplication
-                    previous_history = [msg for msg in previous_history if msg.get("role") != "system"]
-                    chat_history.extend(previous_history)
-                except json.JSONDecodeError:
-                    logger.warning(f"Invalid chat history JSON for user '{username}'")
+        chunks = []
+        async for chunk in self._stream(
+            chat_history=chat_history,
+            user_settings=user_settings,
+            use_proxies=use_proxies,
+            cookie_file=cookie_file,
+            use_cache=use_cache and not user_settings["message_history"],
+            deadline=deadline
+        ):
+            chunks.append(chunk)
+            yield chunk
         
-        # Add current message
-        chat_history.append({"role": "user", "content": message})
+        # Save chat history once the stream is complete
+        if user_settings["message_history"]:
+            await self._save_turn(username, conversation, message, "".join(chunks), user_settings, use_proxies, cookie_file)
         
-        return chat_history
+        logger.info(f"AI response streamed for user '{username}' using provider '{user_settings['provider']}'")
     
-    def _load_cookies(self, cookie_file: Optional[str]) -> Dict[str, str]:
-        """Load cookies from file.
+    async def generate_completion(
+        self,
+        messages: List[Dict[str, str]],
+        provider: Optional[str] = None,
+        model: Optional[str] = None,
+        remove_sources: bool = False,
+        use_proxies: bool = False,
+        cookie_file: Optional[str] = None,
+        use_cache: bool = True,
+        deadline: Deadline = NO_DEADLINE
+    ) -> str:
+        """Generate AI response for a client-supplied message list.
+        
+        Used by the OpenAI-compatible API, where the client sends the whole
+        conversation, so no stored history is read or written.
         
         Args:
-            cookie_file: Path to cookie file
+            messages: Chat messages in OpenAI format
+            provider: AI provider override
+            model: AI model override
+            remove_sources: Whether to remove source references
+            use_proxies: Whether to use proxies
+            cookie_file: Cookie file path
+            use_cache: Whether cached responses may be used
+            deadline: Request deadline
             
         Returns:
-            Dictionary of cookies
+            AI response text
+            
+        Raises:
+            AIProviderError: If AI generation fails
+            ValidationError: If parameters are invalid
         """
-        if not cookie_file:
-            return create_dummy_cookies()
-        
-        cookie_path = Path(cookie_file)
-        cookies = load_json_file(cookie_path, {})
-        
-        if not cookies:
-            logger.warning(f"No cookies found in {cookie_file}, using dummy cookies")
-            return create_dummy_cookies()
-        
-        logger.debug(f"Loaded {len(cookies)} cookies from {cookie_file}")
-        return cookies
+        try:
+            user_settings = await self._resolve_user_settings("admin", provider, model, None, False)
+            
+            response_text = await self._complete(
+                chat_history=self._with_system_prompt(messages, user_settings["system_prompt"]),
+                user_settings=user_settings,
+                remove_sources=remove_sources,
+                use_proxies=use_proxies,
+                cookie_file=cookie_file,
+                use_cache=use_cache,
+                deadline=deadline
+            )
+            
+            logger.info(f"AI completion generated using provider '{user_settings['provider']}'")
+            return response_text
+            
+        except (ValidationError, AIProviderError):
+            raise
+        except Exception as e:
+            logger.error(f"Failed to generate AI completion: {e}")
+            raise AIProviderError(f"AI generation failed: {e}")
     
-    def _get_proxy(self) -> Optional[str]:
-        """Get random proxy from configuration.
+    async def stream_completion(
+        self,
+        messages: List[Dict[str, str]],
+        provider: Optional[str] = None,
+        model: Optional[str] = None,
+        use_proxies: bool = False,
+        cookie_file: Optional[str] = None,
+        use_cache: bool = True,
+        deadline: Deadline = NO_DEADLINE
+    ) -> AsyncGenerator[str, None]:
+        """Stream AI response for a client-supplied message list.
         
-        Returns:
-            Proxy URL or None
+        Args:
+            messages: Chat messages in OpenAI format
+            provider: AI provider override
+            model: AI model override
+            use_proxies: Whether to use proxies
+            cookie_file: Cookie file path
+            use_cache: Whether cached responses may be used
+            deadline: Request deadline, bounding the time until the first chunk
+            
+        Yields:
+            Response text chunks
+            
+        Raises:
+            AIProviderError: If no provider produced a response
+            ValidationError: If parameters are invalid
         """
-        proxies_path = Path(self.config.files.proxies_file)
-        proxies = load_json_file(proxies_path, [])
+        user_settings = await self._resolve_user_settings("admin", provider, model, None, False)
         
-        if not proxies:
-            logger.warning("No proxies configured")
-            return None
-        
-        proxy_url = select_random_proxy(proxies)
-        if proxy_url:
-            logger.debug(f"Using proxy: {proxy_url.split('@')[0]}@***")  # Mask credentials
+        async for chunk in self._stream(
+            chat_history=self._with_system_prompt(messages, user_settings["system_prompt"]),
+            user_settings=user_settings,
+            use_proxies=use_proxies,
+            cookie_file=cookie_file,
+            use_cache=use_cache,
+            deadline=deadline
+        ):
+            yield chunk
         
-        return proxy_url
+        logger.info(f"AI completion streamed using provider '{user_settings['provider']}'")
     
-    async def _call_ai_api(
+    async def _complete(
         self,
         chat_history: List[Dict[str, str]],
-        provider: str,
-        model: str,
-        cookies: Dict[str, str],
-        proxy: Optional[str]
+        user_settings: Dict[str, Any],
+        remove_sources: bool,
+        use_proxies: bool,
+        cookie_file: Optional[str],
+        use_cache: bool,
+        deadline: Deadline = NO_DEADLINE
     ) -> str:
-        """Call AI API to generate response.
+        """Produce a complete response, serving it from the cache if possible.
+        
+        Identical requests made while a call is running share that call.
         
         Args:
-            chat_history: Chat message history
-            provider: AI provider
-            model: AI model
-            cookies: Request cookies
-            proxy: Proxy URL
+            chat_history: Chat messages to send
+            user_settings: Resolved provider, model and system prompt
+            remove_sources: Whether to remove source references
+            use_proxies: Whether to use proxies
+            cookie_file: Cookie file path
+            use_cache: Whether the response cache may be used
+            deadline: Request deadline (a shared call keeps the deadline of the request that started it)
             
         Returns:
             AI response text
-            
-        Raises:
-            AIProviderError: If API call fails
         """
-        # Check if provider is blacklisted
-        if provider_monitor.is_provider_blacklisted(provider):
-            logger.warning(f"Provider '{provider}' is blacklisted, using fallback")
-            provider = "Auto"
+        cache_key = self._cache_key(chat_history, user_settings, remove_sources) if use_cache else None
+        if cache_key:
+            cached = await self._cache_get(cache_key)
+            if cached is not None:
+                logger.info(f"Response cache hit for provider '{user_settings['provider']}'")
+                return cached
         
-        # Get reliable providers for fallback
-        reliable_providers = provider_monitor.get_reliable_providers(self.config.available_providers)
+        async def fetch() -> str:
+            response_text = await self._call_ai_api(
+                chat_history=chat_history,
+                provider=user_settings["provider"],
+                model=user_settings["model"],
+                cookie_file=cookie_file,
+                use_proxies=use_proxies,
+                deadline=deadline
+            )
+            
+            # Clean response if needed
+            if remove_sources:
+                response_text = clean_response_sources(response_text)
+            
+            if cache_key and response_text:
+                self._cache_set(cache_key, response_text)
+            return response_text
         
-        # Try original provider first
-        if provider != "Auto":
-            ai_provider = self.config.available_providers.get(provider)
-            if ai_provider:
-                logger.info(f"Attempting with provider: {provider}")
-                response = await self._make_api_call(chat_history, ai_provider, model, cookies, proxy, provider)
-                if response:
-                    provider_monitor.record_success(provider)
-                    return response
-                else:
-                    provider_monitor.record_failure(provider, "no_response")
+        if self.in_flight is None:
+            return await fetch()
+        flight_key = "complete:" + make_cache_key(
+            user_settings["provider"],
+            user_settings["model"],
+            user_settings["system_prompt"],
+            chat_history,
+            remove_sources
+        )
+        return await self.in_flight.run(flight_key, fetch)
+    
+    async def _stream(
+        self,
+        chat_history: List[Dict[str, str]],
+        user_settings: Dict[str, Any],
+        use_proxies: bool,
+        cookie_file: Optional[str],
+        use_cache: bool,
+        deadline: Deadline = NO_DEADLINE
+    ) -> AsyncGenerator[str, None]:
+        """Stream a response, serving it from the cache if possible.
         
-        # Try Auto mode
-        logger.info("Attempting with Auto mode")
-        response = await self._make_api_call(chat_history, None, model, cookies, proxy, "Auto")
-        if response:
-            provider_monitor.record_success("Auto")
-            return response
+        A cached response is sent as a single chunk. A completed stream is
+        added to the cache. Identical requests made while a stream is running
+        subscribe to that stream.
+        
+        Args:
+            chat_history: Chat messages to send
+            user_settings: Resolved provider, model and system prompt
+            use_proxies: Whether to use proxies
+            cookie_file: Cookie file path
+            use_cache: Whether the response cache may be used
+            deadline: Request deadline
+            
+        Yields:
+            Response text chunks
+        """
+        cache_key = self._cache_key(chat_history, user_settings, False) if use_cache else None
+        if cache_key:
+            cached = await self._cache_get(cache_key)
+            if cached is not None:
+                logger.info(f"Response cache hit for provider '{user_settings['provider']}'")
+                yield cached
+                return
+        
+        async def fetch() -> AsyncGenerator[str, None]:
+            chunks = []
+            async for chunk in self._stream_ai_api(
+                chat_history=chat_history,
+                provider=user_settings["provider"],
+                model=user_settings["model"],
+                cookie_file=cookie_file,
+                use_proxies=use_proxies,
+                deadline=deadline
+            ):
+                chunks.append(chunk)
+                yield chunk
+            
+            if cache_key and chunks:
+                self._cache_set(cache_key, "".join(chunks))
+        
+        if self.in_flight is None:
+            stream = fetch()
         else:
-            provider_monitor.record_failure("Auto", "no_response")
+            flight_key = "stream:" + make_cache_key(
+                user_settings["provider"],
+                user_settings["model"],
+                user_settings["system_prompt"],
+                chat_history
+            )
+            stream = self.in_flight.stream(flight_key, fetch)
         
-        # Try reliable providers as fallback
-        logger.warning("Auto mode failed, trying reliable providers")
-        for fallback_provider in reliable_providers[:3]:  # Try top 3 reliable providers
-            try:
-                ai_provider = self.config.available_providers.get(fallback_provider)
-                if ai_provider:
-                    logger.info(f"Attempting reliable fallback: {fallback_provider}")
-                    response = await self._make_api_call(chat_history, ai_provider, model, cookies, proxy, fallback_provider)
-                    if response:
-                        provider_monitor.record_success(fallback_provider)
-                        logger.info(f"Successfully used reliable fallback: {fallback_provider}")
-                        return response
-                    else:
-                        provider_monitor.record_failure(fallback_provider, "no_response")
-            except Exception as e:
-                provider_monitor.record_failure(fallback_provider, "exception")
-                logger.warning(f"Reliable fallback {fallback_provider} failed: {e}")
-                continue
+        async for chunk in stream:
+            yield chunk
+    
+    async def _cache_get(self, cache_key: str) -> Optional[str]:
+        """Look up a response in the memory cache, then the shared disk cache.
         
-        # Last resort: try any healthy provider
-        healthy_providers = provider_monitor.get_healthy_providers(self.config.available_providers)
-        logger.warning("Reliable providers failed, trying any healthy provider")
+        Disk hits are copied into the memory cache.
         
-        for fallback_provider in healthy_providers[:5]:  # Try up to 5 healthy providers
-            if fallback_provider in reliable_providers:
-                continue  # Already tried
+        Args:
+            cache_key: Cache key
             
-            try:
-                ai_provider = self.config.available_providers.get(fallback_provider)
-                if ai_provider:
-                    logger.info(f"Attempting healthy fallback: {fallback_provider}")
-                    response = await self._make_api_call(chat_history, ai_provider, model, cookies, proxy, fallback_provider)
-                    if response:
-                        provider_monitor.record_success(fallback_provider)
-                        logger.info(f"Successfully used healthy fallback: {fallback_provider}")
-                        return response
-                    else:
-                        provider_monitor.record_failure(fallback_provider, "no_response")
-            except Exception as e:
-                provider_monitor.record_failure(fallback_provider, "exception")
-                logger.warning(f"Healthy fallback {fallback_provider} failed: {e}")
-                continue
+        Returns:
+            Cached response or None
+        """
+        cached = self.cache.get(cache_key)
+        if cached is not None or self.disk_cache is None:
+            return cached
         
-        # Log provider status summary for debugging
-        status_summary = provider_monitor.get_status_summary()
-        logger.error(f"All providers failed. Status summary: {status_summary}")
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(None, self.disk_cache.get, cache_key)
+        if cached is not None:
+            self.cache.set(cache_key, cached)
+        return cached
+    
+    def _cache_set(self, cache_key: str, response_text: str):
+        """Store a response in the memory cache and, in the background, on disk.
         
-        raise AIProviderError("All providers failed to generate a response")
+        Args:
+            cache_key: Cache key
+            response_text: Response text
+        """
+        self.cache.set(cache_key, response_text)
+        if self.disk_cache is not None:
+            future = asyncio.get_running_loop().run_in_executor(None, self.disk_cache.set, cache_key, response_text)
+            self._background_tasks.add(future)
+            
+            def finished(future):
+                self._background_tasks.discard(future)
+                if not future.cancelled() and future.exception():
+                    logger.warning(f"Disk response cache write failed: {future.exception()}")
+            
+            future.add_done_callback(finished)
     
-    async def _make_api_call(
+    def _cache_key(
         self,
         chat_history: List[Dict[str, str]],
-        ai_provider,
-        model: str,
-        cookies: Dict[str, str],
-        proxy: Optional[str],
-        provider_name: str = "Unknown"
+        user_settings: Dict[str, Any],
+        remove_sources: bool
     ) -> Optional[str]:
-        """Make a single API call to g4f.
+        """Build the response cache key for a request.
         
         Args:
-            chat_history: Chat message history
-            ai_provider: AI provider object or None for Auto
-            model: AI model
-            cookies: Request cookies
-            proxy: Proxy URL
-            provider_name: Name of provider for logging
+            chat_history: Chat messages to send
+            user_settings: Resolved provider, model and system prompt
+            remove_sources: Whether source references are removed
             
         Returns:
-            AI response text or None if failed
+            Cache key or None if caching is disabled
         """
+        if self.cache is None:
+            return None
+        return make_cache_key(
+            user_settings["provider"],
+            user_settings["model"],
+            user_settings["system_prompt"],
+            chat_history,
+            remove_sources
+        )
+    
+    def _with_system_prompt(self, messages: List[Dict[str, str]], system_prompt: str) -> List[Dict[str, str]]:
+        """Prepend the configured system prompt unless the client sent one.
         
-        async def make_request():
-            if ai_provider is None:  # Auto mode
-                return await g4f.ChatCompletion.create_async(
-                    model=model,
-                    messages=chat_history,
-                    cookies=cookies,
-                    proxy=proxy
-                )
-            else:
-                return await g4f.ChatCompletion.create_async(
-                    model=model,
-                    provider=ai_provider,
-                    messages=chat_history,
-                    cookies=cookies,
-                    proxy=proxy
-                )
-        
-        try:
-            # Use safe_api_call with timeout and retry logic
-            response = await safe_api_call(
-                make_request,
-                timeout=TimeoutConfig.DEFAULT_TIMEOUT,
-                max_retries=1  # Only 1 retry per provider to fail fast
-            )
+        Args:
+            messages: Chat messages
+            system_prompt: Configured system prompt
             
-            if response is None:
-                logger.warning(f"Provider {provider_name} returned no response")
-                return None
+        Returns:
+            New list of chat messages
+        """
+        if system_prompt and not any(msg.get("role") == "system" for msg in messages):
+            return [{"role": "system", "content": system_prompt}] + list(messages)
+        return list(messages)
+    
+    async def _resolve_user_settings(
+        self,
+        username: str,
+        provider: Optional[str],
+        model: Optional[str],
+        system_prompt: Optional[str],
+        use_history: bool
+    ) -> Dict[str, Any]:
+        """Merge request overrides with stored settings and validate them.
+        
+        Args:
+            username: Username for context
+            provider: AI provider override
+            model: AI model override
+            system_prompt: System prompt override
+            use_history: Whether to use chat history
             
-            # Collect response
-            response_text = ""
+        Returns:
+            Dictionary with provider, model, system_prompt and message_history
             
-            # Handle both string responses and async generators
-            if hasattr(response, '__aiter__'):
-                # It's an async generator
-                import asyncio
-                try:
-                    async for chunk in response:
-                        response_text += str(chunk)
-                        # Add small delay to prevent blocking and allow timeout handling
-                        await asyncio.sleep(0.001)
-                except Exception as e:
-                    logger.warning(f"Error reading streaming response from {provider_name}: {e}")
-                    return None
-            else:
-                # It's already a string
-                response_text = str(response)
+        Raises:
+            ValidationError: If provider or model is invalid
+        """
+        # All users currently share the server settings
+        settings = await asyncio.get_running_loop().run_in_executor(None, self.db.get_settings)
+        user_settings = {
+            "provider": provider or settings.get("provider", self.config.api.default_provider),
+            "model": model or settings.get("model", self.config.api.default_model),
+            "system_prompt": system_prompt or settings.get("system_prompt", ""),
+            "message_history": use_history and settings.get("message_history", False)
+        }
+        
+        # Validate provider and model
+        is_valid, error_msg = validate_provider(user_settings["provider"], self.config.available_providers)
+        if not is_valid:
+            raise ValidationError(error_msg)
+        
+        is_valid, error_msg = validate_model(user_settings["model"])
+        if not is_valid:
+            raise ValidationError(error_msg)
+        
+        return user_settings
+    
+    def _resolve_conversation(self, conversation: Optional[str]) -> str:
+        """Validate a requested conversation ID.
+        
+        Args:
+            conversation: Conversation ID or None for the default conversation
             
-            if not response_text or response_text.strip() == "":
-                logger.warning(f"Empty response from provider {provider_name}")
-                return None
+        Returns:
+            Conversation ID
             
-            logger.debug(f"Received response of {len(response_text)} characters from {provider_name}")
-            return response_text
+        Raises:
+            ValidationError: If the ID is invalid
+        """
+        if conversation is None:
+            return DEFAULT_CONVERSATION
+        
+        is_valid, error_msg = validate_conversation_id(conversation)
+        if not is_valid:
+            raise ValidationError(error_msg)
+        return conversation
+    
+    async def _save_turn(
+        self,
+        username: str,
+        conversation: str,
+        message: str,
+        response_text: str,
+        user_settings: Dict[str, Any],
+        use_proxies: bool,
+        cookie_file: Optional[str]
+    ):
+        """Store a question and its answer, then schedule history compaction.
+        
+        Args:
+            username: Username
+            conversation: Conversation ID
+            message: User message
+            response_text: AI response
+            user_settings: Resolved provider, model and system prompt
+            use_proxies: Whether to use proxies
+            cookie_file: Cookie file path
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self.db.append_messages, username, [
+            {"role": "user", "content": message},
+            {"role": "assistant", "content": response_text}
+        ], conversation)
+        
+        key = (username, conversation)
+        if self.config.history.compaction_enabled and key not in self._compacting:
+            self._compacting.add(key)
+            task = asyncio.ensure_future(
+                self._compact_history(username, conversation, user_settings, use_proxies, cookie_file)
+            )
+            self._background_tasks.add(task)
+            
+            def finished(task):
+                self._background_tasks.discard(task)
+                self._compacting.discard(key)
+                if not task.cancelled() and task.exception():
+                    logger.warning(f"Chat history compaction failed for user '{username}': {task.exception()}")
+            
+            task.add_done_callback(finished)
+    
+    async def _compact_history(
+        self,
+        username: str,
+        conversation: str,
+        user_settings: Dict[str, Any],
+        use_proxies: bool,
+        cookie_file: Optional[str]
+    ):
+        """Summarize the oldest messages of a long conversation.
+        
+        Runs in the background after a turn is saved. Once the stored history
+        reaches the compaction threshold, the oldest messages outside the
+        newest ones are summarized by the AI and replaced with a single system
+        message holding the summary. Only messages that fit the transcript
+        budget are summarized and replaced; the rest stay as they are until a
+        later compaction, so no message is ever dropped unsummarized.
+        
+        Args:
+            username: Username
+            conversation: Conversation ID
+            user_settings: Resolved provider, model and system prompt
+            use_proxies: Whether to use proxies
+            cookie_file: Cookie file path
+        """
+        history_config = self.config.history
+        loop = asyncio.get_running_loop()
+        
+        count = await loop.run_in_executor(None, self.db.count_messages, username, conversation)
+        if count < history_config.compaction_threshold:
+            return
+        
+        oldest = await loop.run_in_executor(
+            None, self.db.get_oldest_messages, username, count - history_config.compaction_keep_recent, conversation
+        )
+        if len(oldest) < 2:
+            return
+        
+        transcript, _ = fit_oldest_messages(
+            [{"role": msg["role"], "content": msg["content"]} for msg in oldest],
+            history_config.compaction_max_tokens
+        )
+        covered = oldest[:len(transcript)]
+        if len(covered) < 2:
+            return
+        
+        summary = await self._call_ai_api(
+            chat_history=[
+                {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+                {"role": "user", "content": "\n\n".join(f"{msg['role']}: {msg['content']}" for msg in transcript)}
+            ],
+            provider=user_settings["provider"],
+            model=user_settings["model"],
+            cookie_file=cookie_file,
+            use_proxies=use_proxies,
+            # Runs after the request returned, so it gets a budget of its own
+            deadline=Deadline(self.config.api.request_timeout or None)
+        )
+        summary = clean_response_sources(summary).strip()
+        if not summary:
+            return
+        
+        replaced = await loop.run_in_executor(None, functools.partial(
+            self.db.replace_messages,
+            username,
+            covered[0]["seq"],
+            covered[-1]["seq"],
+            len(covered),
+            {"role": "system", "content": SUMMARY_PREFIX + summary},
+            conversation
+        ))
+        if replaced:
+            logger.info(f"Compacted {len(covered)} chat history messages for user '{username}' into a summary")
+    
+    async def _prepare_chat_history(
+        self,
+        message: str,
+        username: str,
+        conversation: str,
+        model: str,
+        system_prompt: str,
+        use_history: bool
+    ) -> List[Dict[str, str]]:
+        """Prepare chat history for AI request.
+        
+        Previous messages are windowed to the model's prompt token budget:
+        the system prompt and the newest messages are kept, older ones are
+        truncated or dropped.
+        
+        Args:
+            message: Current user message
+            username: Username
+            conversation: Conversation ID
+            model: Model the prompt is for
+            system_prompt: System prompt
+            use_history: Whether to load previous history
+            
+        Returns:
+            List of chat messages
+        """
+        chat_history = []
+        
+        # Add system prompt if provided
+        if system_prompt:
+            chat_history.append({"role": "system", "content": system_prompt})
+        
+        # Load the newest previous messages if enabled
+        if use_history:
+            chat_history.extend(await asyncio.get_running_loop().run_in_executor(None, functools.partial(
+                self.db.get_messages, username, conversation, limit=self.config.history.max_messages
+            )))
+        
+        # Add current message
+        chat_history.append({"role": "user", "content": message})
+        
+        budget = get_token_budget(
+            model,
+            self.config.history.token_budgets,
+            self.config.history.default_token_budget
+        )
+        fitted, tokens = fit_messages(chat_history, budget)
+        if fitted != chat_history:
+            logger.info(f"Chat history for user '{username}' windowed from {len(chat_history)} to {len(fitted)} messages")
+        logger.info(f"Prompt for user '{username}': {len(fitted)} messages, ~{tokens} tokens (budget {budget}, model '{model}')")
+        
+        return fitted
+    
+    def _load_cookies(self, cookie_file: Optional[str], provider_name: str) -> Dict[str, str]:
+        """Get the next cookie set for a provider from the cookie store.
+        
+        Args:
+            cookie_file: Path to cookie file
+            provider_name: Provider the cookies are for
+            
+        Returns:
+            Dictionary of cookies
+        """
+        return self.cookie_store.get(cookie_file, provider_name)
+    
+    def _get_proxy(self, use_proxies: bool, provider_name: str) -> Optional[str]:
+        """Choose a proxy for a provider call from the proxy pool.
+        
+        Args:
+            use_proxies: Whether to use proxies
+            provider_name: Provider the call goes to
+            
+        Returns:
+            Proxy URL or None
+        """
+        if not use_proxies:
+            return None
+        return self.proxy_pool.select(provider_name)
+    
+    def _provider_candidates(self, provider: str, exclude: Iterable[str] = ()):
+        """Yield providers to try, in fallback order.
+        
+        The configured provider comes first. With routing enabled, the other
+        providers follow in the router's order and Auto mode comes last;
+        otherwise Auto mode comes next, then up to 3 reliable providers and
+        finally up to 5 other healthy providers. Providers whose circuit is
+        open are skipped; a yielded provider whose circuit is half-open holds
+        a trial slot, so it must be called.
+        
+        Args:
+            provider: Configured provider name
+            exclude: Providers that are already being called
+            
+        Yields:
+            Tuples of (provider name, provider object or None for Auto, stage)
+        """
+        if provider != "Auto" and provider not in exclude and not provider_monitor.is_provider_available(provider):
+            logger.warning(f"Circuit of provider '{provider}' is open, using fallback")
+            provider = "Auto"
+        
+        if self.router is not None:
+            candidates = self._routed_candidates(provider)
+        else:
+            candidates = self._fallback_candidates(provider)
+        for provider_name, ai_provider, stage in candidates:
+            if provider_name in exclude:
+                continue
+            # Auto mode picks its own provider, so it has no circuit to check
+            if provider_name == "Auto" or provider_monitor.allow_request(provider_name):
+                yield provider_name, ai_provider, stage
+    
+    def _fallback_candidates(self, provider: str):
+        """Yield providers in the fixed fallback order used without routing.
+        
+        Args:
+            provider: Configured provider name
+            
+        Yields:
+            Tuples of (provider name, provider object or None for Auto, stage)
+        """
+        # Get reliable providers for fallback
+        reliable_providers = provider_monitor.get_reliable_providers(self.config.available_providers)
+        tried = set()
+        
+        # Try original provider first
+        if provider != "Auto":
+            ai_provider = self.config.available_providers.get(provider)
+            if ai_provider:
+                tried.add(provider)
+                yield provider, ai_provider, "configured"
+        
+        # Try Auto mode
+        tried.add("Auto")
+        yield "Auto", None, "auto"
+        
+        # Try reliable providers as fallback
+        logger.warning("Auto mode failed, trying reliable providers")
+        for fallback_provider in reliable_providers[:3]:  # Try top 3 reliable providers
+            ai_provider = self.config.available_providers.get(fallback_provider)
+            if ai_provider and fallback_provider not in tried:
+                tried.add(fallback_provider)
+                yield fallback_provider, ai_provider, "reliable"
+        
+        # Last resort: try any healthy provider
+        healthy_providers = provider_monitor.get_healthy_providers(self.config.available_providers)
+        logger.warning("Reliable providers failed, trying any healthy provider")
+        
+        for fallback_provider in healthy_providers[:5]:  # Try up to 5 healthy providers
+            if fallback_provider in reliable_providers or fallback_provider in tried:
+                continue  # Already tried
+            ai_provider = self.config.available_providers.get(fallback_provider)
+            if ai_provider:
+                tried.add(fallback_provider)
+                yield fallback_provider, ai_provider, "healthy"
+    
+    def _probe_targets(self) -> List[str]:
+        """Get the providers the health prober checks, including those with an open circuit."""
+        return [
+            provider_name for provider_name, ai_provider in self.config.available_providers.items()
+            if ai_provider
+        ]
+    
+    async def probe_provider(
+        self,
+        provider_name: str,
+        cookie_file: Optional[str] = None,
+        use_proxies: bool = False
+    ) -> bool:
+        """Send the canned probe prompt to a provider and record the outcome.
+        
+        Probes bypass the circuit breaker: a successful probe closes an open
+        circuit, so a recovered provider is back before users try it. A
+        failed probe only updates the provider's status; it neither counts
+        toward opening the circuit nor lowers the concurrency limit, since
+        no user call was affected.
+        
+        Args:
+            provider_name: Provider name
+            cookie_file: Cookie file path
+            use_proxies: Whether to use proxies
+            
+        Returns:
+            True if the provider answered
+        """
+        ai_provider = self.config.available_providers.get(provider_name)
+        if not ai_provider:
+            return False
+        
+        model = getattr(ai_provider, "default_model", None) or self.config.api.default_model
+        chat_history = [{"role": "user", "content": self.config.probing.prompt}]
+        cookies = self._load_cookies(cookie_file, provider_name)
+        proxy = self._get_proxy(use_proxies, provider_name)
+        try:
+            response = await asyncio.wait_for(
+                self._attempt_api_call(
+                    chat_history, ai_provider, model, cookies, proxy, provider_name, asyncio.Event(), probe=True
+                ),
+                timeout=self.config.probing.timeout
+            )
+        except asyncio.TimeoutError as e:
+            self._record_error(e, provider_name, cookies, proxy, probe=True)
+            return False
+        
+        if not response:
+            return False
+        provider_monitor.record_success(provider_name, probe=True)
+        return True
+    
+    def _routable_providers(self) -> List[str]:
+        """Get the providers the router may choose from."""
+        return [
+            provider_name for provider_name, ai_provider in self.config.available_providers.items()
+            if ai_provider and provider_monitor.is_provider_available(provider_name)
+        ]
+    
+    def _routed_candidates(self, provider: str):
+        """Yield providers in the router's order.
+        
+        An explicitly configured provider is tried first; Auto mode leaves
+        the first choice to the router. g4f's own Auto selection is the
+        last resort.
+        
+        Args:
+            provider: Configured provider name
+            
+        Yields:
+            Tuples of (provider name, provider object or None for Auto, stage)
+        """
+        available = self.config.available_providers
+        if provider != "Auto" and available.get(provider):
+            yield provider, available[provider], "configured"
+        
+        ranked = self.router.rank(name for name in self._routable_providers() if name != provider)
+        logger.debug(f"Routing order: {', '.join(ranked)}")
+        for provider_name in ranked[:self.config.routing.max_providers]:
+            yield provider_name, available[provider_name], "routed"
+        
+        yield "Auto", None, "auto"
+    
+    async def _acquire_slot(self, provider_name: str, deadline: Deadline = NO_DEADLINE) -> bool:
+        """Take an in-flight slot from a provider's bulkhead.
+        
+        A provider at its concurrency limit gets a short wait in its queue.
+        If no slot frees up, the call is skipped without counting as a
+        failure, so the caller moves on to the next provider; the circuit
+        trial reserved for the call is given back.
+        
+        Args:
+            provider_name: Provider name
+            deadline: Request deadline, bounding the wait
+            
+        Returns:
+            True if the call may go ahead; the slot must be given back with ``_release_slot``
+        """
+        if not self.config.bulkheads.enabled:
+            return True
+        try:
+            acquired = await provider_monitor.get_bulkhead(provider_name).acquire(deadline.remaining())
+        except asyncio.CancelledError:
+            provider_monitor.release_request(provider_name)
+            raise
+        if not acquired:
+            provider_monitor.release_request(provider_name)
+            logger.info(f"Provider {provider_name} is at its concurrency limit, trying the next one")
+        return acquired
+    
+    def _release_slot(self, provider_name: str):
+        """Give back an in-flight slot taken with ``_acquire_slot``.
+        
+        Args:
+            provider_name: Provider name
+        """
+        if self.config.bulkheads.enabled:
+            provider_monitor.get_bulkhead(provider_name).release()
+    
+    async def _call_ai_api(
+        self,
+        chat_history: List[Dict[str, str]],
+        provider: str,
+        model: str,
+        cookie_file: Optional[str],
+        use_proxies: bool,
+        deadline: Deadline = NO_DEADLINE
+    ) -> str:
+        """Call AI API to generate response.
+        
+        Args:
+            chat_history: Chat message history
+            provider: AI provider
+            model: AI model
+            cookie_file: Cookie file path
+            use_proxies: Whether to use proxies
+            deadline: Request deadline, shared by every provider in the fallback chain
+            
+        Returns:
+            AI response text
+            
+        Raises:
+            AIProviderError: If API call fails
+            DeadlineExceededError: If the deadline passed before a provider answered
+        """
+        if self.config.hedging.enabled:
+            return await self._hedged_call_ai_api(chat_history, provider, model, cookie_file, use_proxies, deadline)
+        
+        for provider_name, ai_provider, stage in self._provider_candidates(provider):
+            if deadline.expired:
+                provider_monitor.release_request(provider_name)
+                break
+            if not await self._acquire_slot(provider_name, deadline):
+                continue
+            try:
+                logger.info(f"Attempting {stage} provider: {provider_name}")
+                cookies = self._load_cookies(cookie_file, provider_name)
+                proxy = self._get_proxy(use_proxies, provider_name)
+                response = await self._make_api_call(
+                    chat_history, ai_provider, model, cookies, proxy, provider_name, deadline
+                )
+                if response:
+                    provider_monitor.record_success(provider_name)
+                    if stage in ("reliable", "healthy"):
+                        logger.info(f"Successfully used {stage} fallback: {provider_name}")
+                    return response
+            except asyncio.CancelledError:
+                # Free a half-open trial the cancelled call was holding
+                provider_monitor.release_request(provider_name)
+                raise
+            except Exception as e:
+                provider_monitor.record_failure(provider_name, "exception")
+                logger.warning(f"Provider {provider_name} failed: {e}")
+                continue
+            finally:
+                self._release_slot(provider_name)
+        
+        deadline.check()
+        
+        # Log provider status summary for debugging
+        status_summary = provider_monitor.get_status_summary()
+        logger.error(f"All providers failed. Status summary: {status_summary}")
+        
+        raise AIProviderError("All providers failed to generate a response")
+    
+    def _race_providers(self, provider: str) -> List[str]:
+        """Get the providers a hedged call starts at once.
+        
+        An explicitly configured provider is always included; the remaining
+        slots go to the router's top picks, or the most reliable providers
+        when routing is disabled. Providers are admitted by their circuit
+        breaker, so every returned provider must be called.
+        
+        Args:
+            provider: Configured provider name
+            
+        Returns:
+            Provider names, empty if racing is disabled
+        """
+        race_top_n = self.config.hedging.race_top_n
+        if race_top_n <= 0:
+            return []
+        
+        available = self.config.available_providers
+        race = []
+        if provider != "Auto" and available.get(provider) and provider_monitor.allow_request(provider):
+            race.append(provider)
+        if self.router is not None:
+            preferred = self.router.rank(self._routable_providers())
+        else:
+            preferred = provider_monitor.get_reliable_providers(available)
+        for reliable_provider in preferred:
+            if len(race) >= race_top_n:
+                break
+            if (
+                reliable_provider not in race
+                and available.get(reliable_provider)
+                and provider_monitor.allow_request(reliable_provider)
+            ):
+                race.append(reliable_provider)
+        return race
+    
+    def _hedge_delay(self, provider_name: str) -> float:
+        """Get how long to wait for a first token before hedging.
+        
+        Args:
+            provider_name: Provider that was started last
+            
+        Returns:
+            Delay in seconds, from the provider's recent first-token percentile
+        """
+        hedging = self.config.hedging
+        delay = provider_monitor.get_latency_percentile(provider_name, hedging.latency_percentile)
+        if delay is None:
+            delay = hedging.default_delay
+        return min(hedging.max_delay, max(hedging.min_delay, delay))
+    
+    async def _hedged_call_ai_api(
+        self,
+        chat_history: List[Dict[str, str]],
+        provider: str,
+        model: str,
+        cookie_file: Optional[str],
+        use_proxies: bool,
+        deadline: Deadline = NO_DEADLINE
+    ) -> str:
+        """Call AI API with hedged requests.
+        
+        Providers are started from the usual fallback chain (optionally
+        racing several reliable providers from the start). When no running
+        call has produced a first token within the last provider's recent
+        first-token percentile, the next provider is started alongside it.
+        The first complete response wins and the other calls are cancelled.
+        When the deadline passes, every running call is cancelled.
+        
+        Args:
+            chat_history: Chat message history
+            provider: AI provider
+            model: AI model
+            cookie_file: Cookie file path
+            use_proxies: Whether to use proxies
+            deadline: Request deadline
+            
+        Returns:
+            AI response text
+            
+        Raises:
+            AIProviderError: If no provider produced a response
+            DeadlineExceededError: If the deadline passed before a provider answered
+        """
+        available = self.config.available_providers
+        race = self._race_providers(provider)
+        candidates = self._provider_candidates(provider, exclude=race)
+        attempts: Dict[asyncio.Future, Tuple[str, asyncio.Event]] = {}
+        rejected = set()
+        hedge_at: Optional[float] = None
+        
+        async def attempt(provider_name: str, ai_provider, first_token: asyncio.Event) -> Optional[str]:
+            # A provider at its concurrency limit yields None, so the next one is launched
+            if not await self._acquire_slot(provider_name, deadline):
+                rejected.add(asyncio.current_task())
+                return None
+            try:
+                cookies = self._load_cookies(cookie_file, provider_name)
+                proxy = self._get_proxy(use_proxies, provider_name)
+                return await self._attempt_api_call(
+                    chat_history, ai_provider, model, cookies, proxy, provider_name, first_token, deadline
+                )
+            finally:
+                self._release_slot(provider_name)
+        
+        def launch(provider_name: str, ai_provider, stage: str):
+            nonlocal hedge_at
+            first_token = asyncio.Event()
+            task = asyncio.ensure_future(attempt(provider_name, ai_provider, first_token))
+            attempts[task] = (provider_name, first_token)
+            hedge_at = time.monotonic() + self._hedge_delay(provider_name)
+            logger.info(f"Attempting {stage} provider (hedged): {provider_name}")
+        
+        def launch_next() -> bool:
+            nonlocal hedge_at
+            for provider_name, ai_provider, stage in candidates:
+                if deadline.expired:
+                    provider_monitor.release_request(provider_name)
+                    break
+                launch(provider_name, ai_provider, stage)
+                return True
+            hedge_at = None
+            return False
+        
+        for provider_name in race:
+            launch(provider_name, available[provider_name], "race")
+        if not attempts:
+            launch_next()
+        
+        try:
+            while attempts:
+                streaming = any(first_token.is_set() for _, first_token in attempts.values())
+                timeout = None if streaming or hedge_at is None else max(0.0, hedge_at - time.monotonic())
+                done, _ = await asyncio.wait(
+                    list(attempts), timeout=deadline.timeout(timeout), return_when=asyncio.FIRST_COMPLETED
+                )
+                
+                if not done:
+                    # Nothing has produced a first token in time: hedge with the next provider
+                    if not streaming and hedge_at is not None and time.monotonic() >= hedge_at:
+                        waiting = ", ".join(name for name, _ in attempts.values())
+                        logger.info(f"No first token from {waiting} within hedge threshold, hedging")
+                        launch_next()
+                    continue
+                
+                replace = False
+                for task in done:
+                    provider_name, _ = attempts.pop(task)
+                    response = task.result()
+                    if response:
+                        provider_monitor.record_success(provider_name)
+                        logger.info(f"Hedged call won by provider: {provider_name}")
+                        return response
+                    # A provider turned away at its concurrency limit never ran, so
+                    # don't wait out another hedge delay before trying the next one
+                    replace |= task in rejected and not streaming
+                
+                if replace or not attempts:
+                    launch_next()
+        finally:
+            # Cancel the losers
+            for task in attempts:
+                task.cancel()
+            if attempts:
+                await asyncio.gather(*attempts, return_exceptions=True)
+        
+        deadline.check()
+        
+        status_summary = provider_monitor.get_status_summary()
+        logger.error(f"All providers failed. Status summary: {status_summary}")
+        
+        raise AIProviderError("All providers failed to generate a response")
+    
+    async def _attempt_api_call(
+        self,
+        chat_history: List[Dict[str, str]],
+        ai_provider,
+        model: str,
+        cookies: Dict[str, str],
+        proxy: Optional[str],
+        provider_name: str,
+        first_token: asyncio.Event,
+        deadline: Deadline = NO_DEADLINE,
+        probe: bool = False
+    ) -> Optional[str]:
+        """Collect a streamed API call, signalling when the first chunk arrives.
+        
+        Failures are recorded in the monitor. Cancellation is not a failure
+        and is not recorded; it only gives back the half-open trial slot the
+        call reserved. Probes reserve no trial.
+        
+        Args:
+            chat_history: Chat message history
+            ai_provider: AI provider object or None for Auto
+            model: AI model
+            cookies: Request cookies
+            proxy: Proxy URL
+            provider_name: Name of provider for logging
+            first_token: Event set when the first chunk arrives
+            deadline: Request deadline
+            probe: Whether this is a health probe rather than a user call
             
+        Returns:
+            AI response text or None if failed
+        """
+        start_time = time.monotonic()
+        first_token_latency = None
+        chunks = []
+        try:
+            async for chunk in self._stream_api_call(
+                chat_history, ai_provider, model, cookies, proxy, provider_name, deadline
+            ):
+                if first_token_latency is None:
+                    first_token_latency = time.monotonic() - start_time
+                    first_token.set()
+                chunks.append(chunk)
+        except asyncio.CancelledError:
+            if not probe:
+                provider_monitor.release_request(provider_name)
+            raise
         except Exception as e:
-            error_msg = str(e).lower()
-            error_type = "unknown"
-            
-            if "401" in error_msg or "unauthorized" in error_msg:
-                error_type = "unauthorized"
-                logger.warning(f"Provider {provider_name} returned unauthorized error: {e}")
-            elif "chrome" in error_msg or "browser" in error_msg:
-                error_type = "browser_required"
-                logger.warning(f"Provider {provider_name} requires browser but none found: {e}")
-            elif "timeout" in error_msg or "too slow" in error_msg:
-                error_type = "timeout"
-                logger.warning(f"Provider {provider_name} connection timeout: {e}")
-            elif "connection" in error_msg or "network" in error_msg:
-                error_type = "network"
-                logger.warning(f"Provider {provider_name} network error: {e}")
+            self._record_error(e, provider_name, cookies, proxy, deadline, probe)
+            return None
+        
+        response_text = "".join(chunks)
+        if not response_text.strip():
+            logger.warning(f"Empty response from provider {provider_name}")
+            provider_monitor.record_failure(provider_name, "no_response", probe=probe)
+            return None
+        
+        self._record_transport_success(cookies, proxy, first_token_latency)
+        provider_monitor.record_latency(provider_name, first_token_latency, time.monotonic() - start_time)
+        return response_text
+    
+    async def _stream_ai_api(
+        self,
+        chat_history: List[Dict[str, str]],
+        provider: str,
+        model: str,
+        cookie_file: Optional[str],
+        use_proxies: bool,
+        deadline: Deadline = NO_DEADLINE
+    ) -> AsyncGenerator[str, None]:
+        """Stream a response, falling back until a provider produces output.
+        
+        Fallback is only possible before the first chunk has been yielded;
+        once output reached the client a failing provider ends the stream.
+        The deadline only bounds the wait for the first chunk.
+        
+        Args:
+            chat_history: Chat message history
+            provider: AI provider
+            model: AI model
+            cookie_file: Cookie file path
+            use_proxies: Whether to use proxies
+            deadline: Request deadline
+            
+        Yields:
+            Response text chunks
+            
+        Raises:
+            AIProviderError: If no provider produced a response
+            DeadlineExceededError: If the deadline passed before the first chunk
+        """
+        for provider_name, ai_provider, stage in self._provider_candidates(provider):
+            if deadline.expired:
+                provider_monitor.release_request(provider_name)
+                break
+            if not await self._acquire_slot(provider_name, deadline):
+                continue
+            logger.info(f"Attempting {stage} provider (stream): {provider_name}")
+            cookies = self._load_cookies(cookie_file, provider_name)
+            proxy = self._get_proxy(use_proxies, provider_name)
+            stream = self._stream_api_call(chat_history, ai_provider, model, cookies, proxy, provider_name, deadline)
+            started = False
+            start_time = time.monotonic()
+            first_token = None
+            try:
+                async for chunk in stream:
+                    if not started:
+                        started = True
+                        first_token = time.monotonic() - start_time
+                    yield chunk
+            except Exception as e:
+                if started:
+                    provider_monitor.record_failure(provider_name, "exception")
+                    logger.warning(f"Stream from provider {provider_name} broke off: {e}")
+                    raise AIProviderError(f"Stream interrupted: {e}")
+                self._record_error(e, provider_name, cookies, proxy, deadline)
+                continue
+            finally:
+                try:
+                    await stream.aclose()
+                finally:
+                    self._release_slot(provider_name)
+            
+            if started:
+                provider_monitor.record_success(provider_name)
+                self._record_transport_success(cookies, proxy, first_token)
+                provider_monitor.record_latency(provider_name, first_token, time.monotonic() - start_time)
+                return
+            provider_monitor.record_failure(provider_name, "no_response")
+        
+        deadline.check()
+        
+        status_summary = provider_monitor.get_status_summary()
+        logger.error(f"All providers failed. Status summary: {status_summary}")
+        
+        raise AIProviderError("All providers failed to generate a response")
+    
+    async def _stream_api_call(
+        self,
+        chat_history: List[Dict[str, str]],
+        ai_provider,
+        model: str,
+        cookies: Dict[str, str],
+        proxy: Optional[str],
+        provider_name: str = "Unknown",
+        deadline: Deadline = NO_DEADLINE
+    ) -> AsyncGenerator[str, None]:
+        """Stream a single API call to g4f.
+        
+        Providers without streaming support fall back to a regular call whose
+        whole response is yielded as one chunk. The first chunk must arrive
+        within the provider's first-token timeout (or before the request
+        deadline, if that is sooner) and every further chunk within its idle
+        timeout.
+        
+        Args:
+            chat_history: Chat message history
+            ai_provider: AI provider object or None for Auto
+            model: AI model
+            cookies: Request cookies
+            proxy: Proxy URL
+            provider_name: Name of provider for logging
+            deadline: Request deadline
+            
+        Yields:
+            Non-empty response text chunks
+            
+        Raises:
+            asyncio.TimeoutError: If the provider is silent for longer than its timeouts
+        """
+        kwargs = {"model": model, "messages": chat_history, "cookies": cookies, "proxy": proxy}
+        if ai_provider is not None:
+            kwargs["provider"] = ai_provider
+        
+        first_token_deadline = min(
+            time.monotonic() + self._adaptive_timeout(provider_name, "first_token"), deadline.expires_at
+        )
+        try:
+            response = g4f.ChatCompletion.create_async(stream=True, **kwargs)
+            if inspect.isawaitable(response):
+                response = await asyncio.wait_for(response, timeout=max(0.0, first_token_deadline - time.monotonic()))
+        except Exception as e:
+            if classify_error(e).error_class is not ErrorClass.STREAM_NOT_SUPPORTED:
+                raise
+            logger.debug(f"Provider {provider_name} does not support streaming: {e}")
+            response = await asyncio.wait_for(
+                g4f.ChatCompletion.create_async(**kwargs),
+                timeout=deadline.timeout(self._adaptive_timeout(provider_name, "total"))
+            )
+        
+        if hasattr(response, '__aiter__'):
+            async for text in self._read_chunks(response, provider_name, first_token_deadline):
+                yield text
+        elif response:
+            yield str(response)
+    
+    async def _read_chunks(
+        self,
+        response,
+        provider_name: str,
+        first_token_deadline: float
+    ) -> AsyncGenerator[str, None]:
+        """Read a streamed provider response, enforcing first-token and idle timeouts.
+        
+        The longest wait between chunks of a completed stream is recorded in
+        the monitor, so idle timeouts follow the provider's behaviour. Only
+        time spent waiting on the provider counts, not time the consumer
+        takes between chunks.
+        
+        Args:
+            response: Async iterator of response chunks
+            provider_name: Name of provider for timeouts and statistics
+            first_token_deadline: Monotonic time by which the first chunk must arrive
+            
+        Yields:
+            Non-empty response text chunks
+            
+        Raises:
+            asyncio.TimeoutError: If a chunk does not arrive in time
+        """
+        idle_timeout = self._adaptive_timeout(provider_name, "chunk_gap")
+        iterator = response.__aiter__()
+        chunks = 0
+        max_gap = 0.0
+        try:
+            while True:
+                waiting_since = time.monotonic()
+                timeout = idle_timeout if chunks else max(0.0, first_token_deadline - waiting_since)
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), timeout=timeout)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    waiting_for = "next chunk" if chunks else "first token"
+                    raise asyncio.TimeoutError(f"No {waiting_for} from provider {provider_name} within {timeout:.1f}s")
+                if chunks:
+                    max_gap = max(max_gap, time.monotonic() - waiting_since)
+                chunks += 1
+                text = str(chunk)
+                if text:
+                    yield text
+        finally:
+            if hasattr(iterator, "aclose"):
+                await iterator.aclose()
+        
+        if chunks > 1:
+            provider_monitor.record_chunk_gap(provider_name, max_gap)
+    
+    def _adaptive_timeout(self, provider_name: str, kind: str) -> float:
+        """Get a provider's timeout from its recent latency distribution.
+        
+        Args:
+            provider_name: Provider name
+            kind: "first_token" or "total" (time to first token, or to the
+                whole response for non-streamed calls) or "chunk_gap" (idle
+                time between chunks)
+            
+        Returns:
+            Timeout in seconds: the configured percentile of recent latencies
+            times the headroom factor, clamped to the configured bounds, or
+            the default while the provider has too few samples
+        """
+        timeouts = self.config.timeouts
+        if kind == "chunk_gap":
+            default, lower, upper = timeouts.idle_default, timeouts.idle_min, timeouts.idle_max
+        elif kind == "total":
+            default, lower, upper = timeouts.total_default, timeouts.total_min, timeouts.total_max
+        else:
+            default, lower, upper = timeouts.first_token_default, timeouts.first_token_min, timeouts.first_token_max
+        if not timeouts.adaptive:
+            return default
+        
+        observed = provider_monitor.get_latency_percentile(
+            provider_name, timeouts.percentile, kind=kind, min_samples=timeouts.min_samples
+        )
+        if observed is None:
+            return default
+        return min(upper, max(lower, observed * timeouts.factor))
+    
+    async def _make_api_call(
+        self,
+        chat_history: List[Dict[str, str]],
+        ai_provider,
+        model: str,
+        cookies: Dict[str, str],
+        proxy: Optional[str],
+        provider_name: str = "Unknown",
+        deadline: Deadline = NO_DEADLINE
+    ) -> Optional[str]:
+        """Make a single API call to g4f.
+        
+        Args:
+            chat_history: Chat message history
+            ai_provider: AI provider object or None for Auto
+            model: AI model
+            cookies: Request cookies
+            proxy: Proxy URL
+            provider_name: Name of provider for logging
+            deadline: Request deadline
+            
+        Returns:
+            AI response text or None if failed (the failure is recorded in the
+            monitor, unless the call was only cut short by the deadline)
+        """
+        
+        last_error = None
+        
+        async def make_request():
+            nonlocal last_error, proxy
+            if proxy and last_error is not None and classify_error(last_error).action is RetryAction.SWITCH_PROXY:
+                # Retrying after a network error or block: go through another proxy
+                self.proxy_pool.record_failure(proxy)
+                proxy = self.proxy_pool.select(provider_name)
+            try:
+                if ai_provider is None:  # Auto mode
+                    return await g4f.ChatCompletion.create_async(
+                        model=model,
+                        messages=chat_history,
+                        cookies=cookies,
+                        proxy=proxy
+                    )
+                else:
+                    return await g4f.ChatCompletion.create_async(
+                        model=model,
+                        provider=ai_provider,
+                        messages=chat_history,
+                        cookies=cookies,
+                        proxy=proxy
+                    )
+            except Exception as e:
+                last_error = e
+                raise
+        
+        start_time = time.monotonic()
+        first_token = None
+        try:
+            # Use safe_api_call with timeout and retry logic
+            response = await safe_api_call(
+                make_request,
+                timeout=self._adaptive_timeout(provider_name, "total"),
+                max_retries=1,  # Only 1 retry per provider to fail fast
+                deadline=deadline,
+                proxied=bool(proxy)
+            )
+            
+            if response is None:
+                logger.warning(f"Provider {provider_name} returned no response")
+                # safe_api_call gave up; without a recorded error the attempts timed out
+                error = last_error or asyncio.TimeoutError(f"Provider {provider_name} timed out")
+                self._record_error(error, provider_name, cookies, proxy, deadline)
+                return None
+            
+            # Handle both string responses and async generators
+            if hasattr(response, '__aiter__'):
+                # It's an async generator; join once instead of concatenating per chunk
+                chunks = []
+                first_token_deadline = min(
+                    start_time + self._adaptive_timeout(provider_name, "first_token"), deadline.expires_at
+                )
+                try:
+                    async for chunk in self._read_chunks(response, provider_name, first_token_deadline):
+                        if first_token is None:
+                            first_token = time.monotonic() - start_time
+                        chunks.append(chunk)
+                    response_text = "".join(chunks)
+                except Exception as e:
+                    logger.warning(f"Error reading streaming response from {provider_name}: {e}")
+                    self._record_error(e, provider_name, cookies, proxy, deadline)
+                    return None
             else:
-                logger.warning(f"Provider {provider_name} failed with error: {e}")
+                # It's already a string
+                response_text = str(response)
+            
+            if not response_text or response_text.strip() == "":
+                logger.warning(f"Empty response from provider {provider_name}")
+                provider_monitor.record_failure(provider_name, "no_response")
+                return None
             
-            # Record failure in monitor
-            provider_monitor.record_failure(provider_name, error_type)
+            total = time.monotonic() - start_time
+            provider_monitor.record_latency(provider_name, first_token if first_token is not None else total, total)
+            self._record_transport_success(cookies, proxy, first_token if first_token is not None else total)
+            
+            logger.debug(f"Received response of {len(response_text)} characters from {provider_name}")
+            return response_text
+            
+        except Exception as e:
+            self._record_error(e, provider_name, cookies, proxy, deadline)
             return None
     
+    def _record_transport_success(self, cookies: Dict[str, str], proxy: Optional[str], latency: Optional[float]):
+        """Record a successful provider call in the cookie store and proxy pool.
+        
+        Args:
+            cookies: Cookies the call was made with
+            proxy: Proxy the call went through
+            latency: Seconds until the first response chunk
+        """
+        self.cookie_store.record_success(cookies)
+        if proxy:
+            self.proxy_pool.record_success(proxy, latency)
+    
+    def _record_error(
+        self,
+        error: Exception,
+        provider_name: str,
+        cookies: Dict[str, str],
+        proxy: Optional[str],
+        deadline: Deadline = NO_DEADLINE,
+        probe: bool = False
+    ):
+        """Record a failed provider call in the monitor, cookie store and proxy pool.
+        
+        A timeout after the request deadline has passed is not held against
+        the provider: the call was cut short by the client's budget, not by
+        the provider's own timeout.
+        
+        Args:
+            error: Raised exception
+            provider_name: Provider that failed
+            cookies: Cookies the call was made with
+            proxy: Proxy the call went through
+            deadline: Request deadline the call ran under
+            probe: Whether the call was a health probe
+        """
+        provider_error = self._classify_error(error, provider_name)
+        if provider_error.error_class is ErrorClass.TIMEOUT and deadline.expired:
+            provider_monitor.release_request(provider_name)
+            return
+        provider_monitor.record_failure(provider_name, provider_error.error_class.value, probe=probe)
+        if provider_error.error_class is ErrorClass.UNAUTHORIZED:
+            self.cookie_store.record_unauthorized(cookies, provider_name)
+        elif proxy and provider_error.proxy_fault:
+            self.proxy_pool.record_failure(proxy)
+    
+    def _classify_error(self, error: Exception, provider_name: str) -> ProviderError:
+        """Classify a provider error for the health monitor and log it.
+        
+        Args:
+            error: Raised exception
+            provider_name: Name of provider for logging
+            
+        Returns:
+            Classified error
+        """
+        provider_error = classify_error(error)
+        status = f" (HTTP {provider_error.status})" if provider_error.status else ""
+        logger.warning(f"Provider {provider_name} failed with {provider_error.error_class.value} error{status}: {error}")
+        return provider_error
+    
     def get_available_models(self, provider: str) -> List[str]:
         """Get available models for a provider.
         
@@ -0,0 +1,248 @@
+"""ASGI application for FreeGPT4 Web API.
+
+Serves the same routes as the Flask app, but every handler runs on the
+server's event loop, so many provider calls can be in flight at once in a
+single worker. Start it with ``--asgi`` or ``uvicorn freegpt4.asgi:app``.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+from freegpt4 import FreeGPT4_Server as server
+from freegpt4 import openai_compat, batch
+from freegpt4.config import config
+from freegpt4.ai_service import ai_service
+from freegpt4.utils.logging import logger
+from freegpt4.utils.exceptions import FreeGPTException, FileUploadError
+from freegpt4.utils.validation import validate_file_upload
+from freegpt4.utils.helpers import parse_bool
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize the server manager and probe providers on the serving loop."""
+    if getattr(server, "server_manager", None) is None:
+        server.init_server_manager(probe=False)
+    server.start_probing(asyncio.get_running_loop())
+    yield
+    if ai_service.prober is not None:
+        ai_service.prober.stop()
+
+app = FastAPI(
+    title="FreeGPT4 Web API",
+    docs_url=None,
+    redoc_url=None,
+    openapi_url=None,
+    lifespan=lifespan
+)
+
+@app.middleware("http")
+async def log_request(request: Request, call_next):
+    """Log API requests if request logging is enabled."""
+    if server.server_manager.args.enable_request_logging:
+        client_ip = request.headers.get("x-forwarded-for", request.client.host if request.client else "unknown")
+        logger.info(f"Request: {request.method} {request.url.path} from {client_ip}")
+        logger.debug(f"User-Agent: {request.headers.get('user-agent', 'Unknown')}")
+        if request.method == "GET":
+            logger.debug(f"Query params: {dict(request.query_params)}")
+    return await call_next(request)
+
+@app.exception_handler(StarletteHTTPException)
+async def handle_http_exception(request: Request, e: StarletteHTTPException):
+    """Handle HTTP errors such as 404."""
+    if e.status_code == 404:
+        return JSONResponse({"error": "Not found"}, status_code=404)
+    return JSONResponse({"error": str(e.detail)}, status_code=e.status_code)
+
+@app.exception_handler(FreeGPTException)
+async def handle_freegpt_exception(request: Request, e: FreeGPTException):
+    """Handle FreeGPT exceptions."""
+    logger.error(f"FreeGPT error: {e}")
+    return JSONResponse({"error": str(e)}, status_code=400)
+
+@app.exception_handler(Exception)
+async def handle_general_exception(request: Request, e: Exception):
+    """Handle general exceptions."""
+    logger.error(f"Unexpected error: {e}", exc_info=True)
+    return JSONResponse({"error": "Internal server error"}, status_code=500)
+
+@app.api_route("/", methods=["GET", "POST"], response_class=HTMLResponse)
+async def index(request: Request):
+    """Main API endpoint for chat completion."""
+    keyword = server.server_manager.args.keyword
+
+    try:
+        deadline = server.request_deadline(request.headers.get("x-request-timeout"))
+
+        # Extract question from request
+        question = None
+        stream = parse_bool(request.query_params.get("stream"))
+        no_cache = request.query_params.get("no_cache")
+        conversation = request.query_params.get("conversation")
+        if request.method == "GET":
+            question = request.query_params.get(keyword)
+        elif request.headers.get("content-type", "").startswith("application/json"):
+            data = await request.json()
+            if isinstance(data, dict) and keyword in data:
+                question = data[keyword]
+            if isinstance(data, dict) and "stream" in data:
+                stream = parse_bool(data["stream"])
+            if isinstance(data, dict) and "no_cache" in data:
+                no_cache = data["no_cache"]
+            if isinstance(data, dict) and "conversation" in data:
+                conversation = data["conversation"]
+        else:
+            form = await request.form()
+            if "stream" in form:
+                stream = parse_bool(form.get("stream"))
+            if "no_cache" in form:
+                no_cache = form.get("no_cache")
+            if "conversation" in form:
+                conversation = form.get("conversation")
+            file = form.get("file")
+            if file is not None and not isinstance(file, str):
+                # Handle file upload
+                is_valid, error_msg = validate_file_upload(file, config.files.allowed_extensions)
+                if not is_valid:
+                    raise FileUploadError(error_msg)
+
+                question = (await file.read()).decode('utf-8')
+            else:
+                question = form.get(keyword)
+    except FreeGPTException as e:
+        logger.error(f"API error: {e}")
+        return HTMLResponse(f"<p id='response'>Error: {e}</p>")
+    except Exception as e:
+        logger.error(f"Unexpected API error: {e}", exc_info=True)
+        return HTMLResponse("<p id='response'>Internal server error</p>")
+
+    use_cache = server.cache_allowed(request.headers.get("cache-control"), no_cache)
+    if stream:
+        return StreamingResponse(
+            server.stream_answer(question, use_cache, conversation, deadline),
+            media_type="text/event-stream",
+            headers=server.SSE_HEADERS
+        )
+
+    return HTMLResponse(await server.generate_answer(question, use_cache, conversation, deadline))
+
+# Plain function so FastAPI runs the database and template work in its threadpool
+@app.get("/settings", response_class=HTMLResponse)
+def settings():
+    """Settings page."""
+    # Templates are shared with the Flask app, which also provides their context
+    with server.app.test_request_context("/settings"):
+        return HTMLResponse(server.render_settings_page())
+
+@app.post("/save", response_class=HTMLResponse)
+async def save_settings(request: Request):
+    """Save admin settings."""
+    form = await request.form()
+    cookie_upload = form.get("cookie_file")
+    cookie_content = None
+    if cookie_upload is None or isinstance(cookie_upload, str):
+        cookie_upload = None
+    elif cookie_upload.filename:
+        cookie_content = await cookie_upload.read()
+    return HTMLResponse(await run_in_threadpool(server.apply_settings_form, form, cookie_upload, cookie_content))
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    """OpenAI-compatible chat completion endpoint."""
+    args = server.server_manager.args
+    try:
+        try:
+            payload = await request.json()
+        except ValueError:
+            payload = None
+        completion_request = openai_compat.parse_chat_request(payload)
+        completion_request.use_cache &= server.cache_allowed(request.headers.get("cache-control"))
+        deadline = server.request_deadline(request.headers.get("x-request-timeout"))
+
+        if completion_request.stream:
+            return StreamingResponse(
+                openai_compat.stream_chat_completion(
+                    completion_request,
+                    use_proxies=args.enable_proxies,
+                    cookie_file=args.cookie_file,
+                    deadline=deadline
+                ),
+                media_type="text/event-stream",
+                headers=server.SSE_HEADERS
+            )
+
+        return JSONResponse(await openai_compat.create_chat_completion(
+            completion_request,
+            remove_sources=args.remove_sources,
+            use_proxies=args.enable_proxies,
+            cookie_file=args.cookie_file,
+            deadline=deadline
+        ))
+    except Exception as e:
+        if not isinstance(e, FreeGPTException):
+            logger.error(f"Unexpected chat completion error: {e}", exc_info=True)
+        message = str(e) if isinstance(e, FreeGPTException) else "Internal server error"
+        return JSONResponse(
+            openai_compat.error_body(message, openai_compat.error_type(e)),
+            status_code=openai_compat.error_status(e)
+        )
+
+@app.post("/batch")
+async def batch_completions(request: Request):
+    """Run many independent prompts concurrently."""
+    args = server.server_manager.args
+    try:
+        try:
+            payload = await request.json()
+        except ValueError:
+            payload = None
+        batch_request = batch.parse_batch_request(payload)
+        batch_request.use_cache &= server.cache_allowed(request.headers.get("cache-control"))
+        deadline = server.batch_deadline(request.headers.get("x-request-timeout"), batch_request.stream)
+    except FreeGPTException as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    options = {
+        "remove_sources": args.remove_sources,
+        "use_proxies": args.enable_proxies,
+        "cookie_file": args.cookie_file,
+        "deadline": deadline
+    }
+    if batch_request.stream:
+        return StreamingResponse(
+            batch.stream_batch(batch_request, **options),
+            media_type="application/x-ndjson",
+            headers=server.SSE_HEADERS
+        )
+
+    return JSONResponse(await batch.run_batch(batch_request, **options))
+
+@app.get("/v1/models")
+async def list_models():
+    """OpenAI-compatible model list."""
+    return JSONResponse(openai_compat.list_models())
+
+@app.get("/stats")
+async def get_stats():
+    """Get runtime statistics."""
+    return JSONResponse(server.collect_stats())
+
+# Plain functions so FastAPI runs the database reads in its threadpool
+@app.get("/conversations")
+def list_conversations(request: Request):
+    """List conversations, most recently updated first."""
+    return JSONResponse(server.list_conversations_page(request.query_params))
+
+@app.get("/conversations/{conversation_id}")
+def get_conversation(conversation_id: str, request: Request):
+    """Get a page of messages from one conversation."""
+    return JSONResponse(server.conversation_messages_page(conversation_id, request.query_params))
+
+@app.get("/models")
+async def get_models(provider: str = "Auto"):
+    """Get available models for a provider."""
+    return JSONResponse(ai_service.get_available_models(provider))
@@ -0,0 +1,200 @@
+"""Batch chat completion with concurrent fan-out.
+
+A batch is a list of independent prompts, each with an optional provider and
+model. Items run concurrently through ``AIService.generate_response`` up to a
+concurrency cap, and a failing item reports its own error instead of failing
+the whole batch.
+"""
+
+import asyncio
+import json
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from freegpt4.config import config
+from freegpt4.ai_service import ai_service
+from freegpt4.utils.deadline import Deadline, NO_DEADLINE
+from freegpt4.utils.exceptions import FreeGPTException, ValidationError
+from freegpt4.utils.helpers import parse_bool
+from freegpt4.utils.logging import logger
+from freegpt4.utils.validation import sanitize_input
+
+@dataclass
+class BatchItem:
+    """Single prompt in a batch."""
+    prompt: str
+    provider: Optional[str] = None
+    model: Optional[str] = None
+
+@dataclass
+class BatchRequest:
+    """Parsed batch request."""
+    items: List[BatchItem]
+    concurrency: int
+    stream: bool = False
+    use_cache: bool = True
+
+def parse_batch_request(payload: Any) -> BatchRequest:
+    """Validate a batch request body.
+
+    Items are either prompt strings or objects with ``prompt`` and optional
+    ``provider`` and ``model`` fields.
+
+    Args:
+        payload: Decoded JSON body
+
+    Returns:
+        Parsed request
+
+    Raises:
+        ValidationError: If the body is invalid
+    """
+    if not isinstance(payload, dict):
+        raise ValidationError("Request body must be a JSON object")
+
+    raw_items = payload.get("items")
+    if not isinstance(raw_items, list) or not raw_items:
+        raise ValidationError("'items' must be a non-empty list")
+    if len(raw_items) > config.batch.max_items:
+        raise ValidationError(f"A batch can contain at most {config.batch.max_items} items")
+
+    items = []
+    for index, raw in enumerate(raw_items):
+        if isinstance(raw, str):
+            raw = {"prompt": raw}
+        if not isinstance(raw, dict) or not isinstance(raw.get("prompt"), str) or not raw["prompt"].strip():
+            raise ValidationError(f"Item {index} must be a prompt string or an object with a 'prompt'")
+        items.append(BatchItem(
+            prompt=sanitize_input(raw["prompt"], 10000),  # 10KB limit
+            provider=raw.get("provider"),
+            model=raw.get("model")
+        ))
+
+    try:
+        concurrency = int(payload.get("concurrency", config.batch.default_concurrency))
+    except (TypeError, ValueError):
+        raise ValidationError("'concurrency' must be an integer")
+    if concurrency < 1:
+        raise ValidationError("'concurrency' must be at least 1")
+
+    return BatchRequest(
+        items=items,
+        concurrency=min(concurrency, config.batch.max_concurrency),
+        stream=parse_bool(payload.get("stream", False)),
+        use_cache=not parse_bool(payload.get("no_cache", False))
+    )
+
+async def iter_batch(
+    batch: BatchRequest,
+    remove_sources: bool = True,
+    use_proxies: bool = False,
+    cookie_file: Optional[str] = None,
+    deadline: Deadline = NO_DEADLINE
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """Run a batch and yield each result as soon as it finishes.
+
+    Each item gets its own ``REQUEST_TIMEOUT`` budget, started when it gets
+    a concurrency slot, so items queued behind others are not starved. The
+    batch deadline caps every item's budget; items still waiting for a slot
+    when it passes fail without calling a provider.
+
+    Args:
+        batch: Parsed batch request
+        remove_sources: Whether to remove source references
+        use_proxies: Whether to use proxies
+        cookie_file: Cookie file path
+        deadline: Deadline of the whole batch, an upper bound on each item's
+
+    Yields:
+        Result dictionaries with ``index`` and either ``response`` or ``error``
+    """
+    semaphore = asyncio.Semaphore(batch.concurrency)
+
+    async def run_item(index: int, item: BatchItem) -> Dict[str, Any]:
+        async with semaphore:
+            item_deadline = Deadline(config.api.request_timeout or None)
+            if deadline.expires_at < item_deadline.expires_at:
+                item_deadline = deadline
+            try:
+                response_text = await ai_service.generate_response(
+                    message=item.prompt,
+                    username="user",
+                    provider=item.provider,
+                    model=item.model,
+                    use_history=False,
+                    remove_sources=remove_sources,
+                    use_proxies=use_proxies,
+                    cookie_file=cookie_file,
+                    use_cache=batch.use_cache,
+                    deadline=item_deadline
+                )
+                return {"index": index, "response": response_text}
+            except FreeGPTException as e:
+                return {"index": index, "error": str(e)}
+            except Exception as e:
+                logger.error(f"Unexpected error in batch item {index}: {e}", exc_info=True)
+                return {"index": index, "error": "Internal server error"}
+
+    tasks = [asyncio.ensure_future(run_item(index, item)) for index, item in enumerate(batch.items)]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            yield await next_result
+    finally:
+        # Stop outstanding items if the client went away
+        for task in tasks:
+            task.cancel()
+
+async def stream_batch(
+    batch: BatchRequest,
+    remove_sources: bool = True,
+    use_proxies: bool = False,
+    cookie_file: Optional[str] = None,
+    deadline: Deadline = NO_DEADLINE
+) -> AsyncGenerator[str, None]:
+    """Run a batch and stream results as newline-delimited JSON.
+
+    Results are written in completion order; each line carries its ``index``.
+
+    Args:
+        batch: Parsed batch request
+        remove_sources: Whether to remove source references
+        use_proxies: Whether to use proxies
+        cookie_file: Cookie file path
+        deadline: Deadline of the whole batch, an upper bound on each item's
+
+    Yields:
+        One JSON line per result
+    """
+    async for result in iter_batch(batch, remove_sources, use_proxies, cookie_file, deadline):
+        yield json.dumps(result, ensure_ascii=False) + "\n"
+
+async def run_batch(
+    batch: BatchRequest,
+    remove_sources: bool = True,
+    use_proxies: bool = False,
+    cookie_file: Optional[str] = None,
+    deadline: Deadline = NO_DEADLINE
+) -> Dict[str, Any]:
+    """Run a batch and return all results in request order.
+
+    Args:
+        batch: Parsed batch request
+        remove_sources: Whether to remove source references
+        use_proxies: Whether to use proxies
+        cookie_file: Cookie file path
+        deadline: Deadline of the whole batch, an upper bound on each item's
+
+    Returns:
+        Dictionary with ordered ``results`` and success/failure counts
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(batch.items)
+    async for result in iter_batch(batch, remove_sources, use_proxies, cookie_file, deadline):
+        results[result["index"]] = result
+
+    failed = sum(1 for result in results if "error" in result)
+    logger.info(f"Batch of {len(results)} items finished ({failed} failed)")
+    return {
+        "results": results,
+        "succeeded": len(results) - failed,
+        "failed": failed
+    }
@@ -18,6 +18,10 @@ DATA_DIR.mkdir(exist_ok=True)
 class DatabaseConfig:
     """Database configuration."""
     settings_file: str = os.getenv("DATABASE_PATH", str(DATA_DIR / "settings.db"))
+    pool_size: int = 8         # Idle connections kept open
+    busy_timeout: float = 5.0  # Seconds to wait for another replica's write lock
+    cache_size_kb: int = 2048  # Page cache per connection
+    synchronous: str = "NORMAL"
     
 @dataclass
 class ServerConfig:
@@ -39,7 +43,125 @@ class APIConfig:
     default_model: str = "gpt-4"
     default_provider: str = "DuckDuckGo"  # More reliable than Auto
     default_keyword: str = "text"
-    fast_api_port: int = 1336
+    coalesce_requests: bool = True  # Share one upstream call among identical requests
+    request_timeout: float = 55.0   # Default request deadline, below nginx's 60s read timeout (0 = none)
+    max_request_timeout: float = 300.0  # Largest deadline a client may ask for with X-Request-Timeout
+    
+@dataclass
+class HedgingConfig:
+    """Hedged provider call configuration."""
+    enabled: bool = False
+    race_top_n: int = 0             # Start this many reliable providers at once (0 = off)
+    latency_percentile: float = 95  # First-token percentile used as hedge threshold
+    default_delay: float = 8.0      # Threshold for providers without latency samples
+    min_delay: float = 0.5
+    max_delay: float = 30.0
+    
+@dataclass
+class RoutingConfig:
+    """Adaptive provider routing configuration."""
+    enabled: bool = True        # Rank providers by sampled expected latency
+    max_providers: int = 6      # Ranked providers tried before falling back to Auto
+    prior_latency: float = 5.0  # Latency assumed before any provider has samples
+    failure_cost: float = 10.0  # Seconds a failed attempt is expected to waste
+    
+@dataclass
+class CircuitBreakerConfig:
+    """Per-provider circuit breaker configuration."""
+    enabled: bool = True
+    failure_threshold: int = 5      # Consecutive failures that open a provider's circuit
+    cool_down: float = 30.0         # Seconds before an open circuit admits a trial call
+    max_cool_down: float = 300.0    # Cool-down doubles on every failed trial, up to this
+    half_open_max_calls: int = 1    # Trial calls admitted at once while half-open
+    
+@dataclass
+class BulkheadConfig:
+    """Per-provider concurrency limit configuration."""
+    enabled: bool = True
+    initial_limit: int = 4          # Calls in flight per provider before any feedback
+    min_limit: int = 1
+    max_limit: int = 32
+    max_queue: int = 4              # Callers that may wait for a slot; the rest move on to the next provider
+    queue_timeout: float = 0.5      # Seconds a caller waits for a slot
+    decrease_factor: float = 0.5    # Limit multiplier on a rate limit or timeout
+    decrease_interval: float = 2.0  # Seconds during which further overloads do not cut the limit again
+    
+@dataclass
+class ProbeConfig:
+    """Background provider health probing configuration."""
+    enabled: bool = True
+    interval: float = 300.0     # Mean seconds between probes of a provider
+    jitter: float = 0.2         # Random spread of the interval (+-20%)
+    concurrency: int = 3        # Probes running at once
+    timeout: float = 20.0       # Seconds before a probe counts as a timeout
+    prompt: str = "Reply with the single word OK."
+    
+@dataclass
+class TimeoutsConfig:
+    """Per-provider adaptive timeout configuration."""
+    adaptive: bool = True           # Derive timeouts from each provider's recent latencies
+    percentile: float = 99          # Latency percentile the timeouts are based on
+    factor: float = 2.0             # Headroom multiplier on that percentile
+    min_samples: int = 20           # Samples needed before a provider gets its own timeouts
+    first_token_default: float = 60.0  # Time to first token without enough samples
+    first_token_min: float = 5.0
+    first_token_max: float = 60.0
+    total_default: float = 120.0    # Whole non-streamed response without enough samples
+    total_min: float = 10.0
+    total_max: float = 300.0
+    idle_default: float = 30.0      # Gap between chunks without enough samples
+    idle_min: float = 5.0
+    idle_max: float = 60.0
+    
+@dataclass
+class CacheConfig:
+    """Response cache configuration."""
+    enabled: bool = True
+    max_entries: int = 1000
+    max_bytes: int = 32 * 1024 * 1024  # 32 MB
+    ttl: float = 300                   # 5 minutes
+    disk_enabled: bool = True          # Shared SQLite tier on the data volume
+    disk_path: str = str(DATA_DIR / "response_cache.db")
+    disk_max_bytes: int = 256 * 1024 * 1024  # 256 MB
+    disk_ttl: float = 3600             # 1 hour
+    
+@dataclass
+class HistoryConfig:
+    """Chat history configuration."""
+    max_messages: int = 200  # Newest stored messages loaded per request
+    cache_enabled: bool = True        # Keep active conversations in memory
+    cache_conversations: int = 1000
+    cache_max_bytes: int = 64 * 1024 * 1024  # 64 MB
+    default_token_budget: int = 6000  # Prompt tokens for models without a budget
+    compaction_enabled: bool = False
+    compaction_threshold: int = 60    # Stored messages that trigger compaction
+    compaction_keep_recent: int = 20  # Newest messages never summarized
+    compaction_max_tokens: int = 8000 # Transcript tokens sent for summarization
+    token_budgets: Dict[str, int] = None  # Model name or name prefix -> prompt token budget
+    
+    def __post_init__(self):
+        if self.token_budgets is None:
+            self.token_budgets = {
+                "gpt-3.5": 12000,
+                "gpt-4": 6000,
+                "gpt-4o": 24000,
+                "gpt-4.1": 24000,
+                "o1": 24000,
+                "o3": 24000,
+                "claude": 24000,
+                "gemini": 24000,
+                "llama": 6000,
+                "mistral": 6000,
+                "deepseek": 24000,
+                "qwen": 12000,
+            }
+    
+@dataclass
+class BatchConfig:
+    """Batch endpoint configuration."""
+    max_items: int = 500
+    default_concurrency: int = 8
+    max_concurrency: int = 32
     
 @dataclass
 class FileConfig:
@@ -54,6 +176,21 @@ class FileConfig:
         if self.allowed_extensions is None:
             self.allowed_extensions = {'json'}
 
+@dataclass
+class CookieConfig:
+    """Cookie store configuration."""
+    check_interval: float = 1.0     # Seconds between checks of the cookie file for changes
+    unauthorized_limit: int = 2     # Consecutive 401s that retire a cookie set
+
+@dataclass
+class ProxyConfig:
+    """Proxy pool configuration."""
+    check_interval: float = 1.0     # Seconds between checks of the proxy file for changes
+    alpha: float = 0.2              # EWMA smoothing of proxy latency and error rate
+    bench_after_failures: int = 3   # Consecutive failures that bench a proxy
+    bench_seconds: float = 60.0     # First bench; doubles for repeat offenders, up to 8x
+    sticky: bool = False            # Keep each provider on the proxy it last used
+
 @dataclass
 class LoggingConfig:
     """Logging configuration."""
@@ -72,7 +209,18 @@ class Config:
         self.server = ServerConfig()
         self.security = SecurityConfig()
         self.api = APIConfig()
+        self.batch = BatchConfig()
+        self.hedging = HedgingConfig()
+        self.routing = RoutingConfig()
+        self.circuit_breaker = CircuitBreakerConfig()
+        self.bulkheads = BulkheadConfig()
+        self.probing = ProbeConfig()
+        self.timeouts = TimeoutsConfig()
+        self.cache = CacheConfig()
+        self.history = HistoryConfig()
         self.files = FileConfig()
+        self.cookies = CookieConfig()
+        self.proxies = ProxyConfig()
         self.logging = LoggingConfig()
         
         # Load environment overrides
@@ -86,11 +234,147 @@ class Config:
         if os.getenv("DEBUG"):
             self.server.debug = os.getenv("DEBUG").lower() == "true"
             
+        # Database config
+        if os.getenv("DATABASE_POOL_SIZE"):
+            self.database.pool_size = int(os.getenv("DATABASE_POOL_SIZE"))
+        if os.getenv("DATABASE_BUSY_TIMEOUT"):
+            self.database.busy_timeout = float(os.getenv("DATABASE_BUSY_TIMEOUT"))
+        if os.getenv("DATABASE_CACHE_SIZE_KB"):
+            self.database.cache_size_kb = int(os.getenv("DATABASE_CACHE_SIZE_KB"))
+            
         # API config
         if os.getenv("DEFAULT_MODEL"):
             self.api.default_model = os.getenv("DEFAULT_MODEL")
         if os.getenv("DEFAULT_PROVIDER"):
             self.api.default_provider = os.getenv("DEFAULT_PROVIDER")
+        if os.getenv("COALESCE_REQUESTS"):
+            self.api.coalesce_requests = os.getenv("COALESCE_REQUESTS").lower() == "true"
+        if os.getenv("REQUEST_TIMEOUT"):
+            self.api.request_timeout = float(os.getenv("REQUEST_TIMEOUT"))
+        if os.getenv("MAX_REQUEST_TIMEOUT"):
+            self.api.max_request_timeout = float(os.getenv("MAX_REQUEST_TIMEOUT"))
+            
+        # Hedging config
+        if os.getenv("HEDGING_ENABLED"):
+            self.hedging.enabled = os.getenv("HEDGING_ENABLED").lower() == "true"
+        if os.getenv("HEDGING_RACE_TOP_N"):
+            self.hedging.race_top_n = int(os.getenv("HEDGING_RACE_TOP_N"))
+        if os.getenv("HEDGING_DEFAULT_DELAY"):
+            self.hedging.default_delay = float(os.getenv("HEDGING_DEFAULT_DELAY"))
+            
+        # Routing config
+        if os.getenv("ROUTING_ENABLED"):
+            self.routing.enabled = os.getenv("ROUTING_ENABLED").lower() == "true"
+        if os.getenv("ROUTING_MAX_PROVIDERS"):
+            self.routing.max_providers = int(os.getenv("ROUTING_MAX_PROVIDERS"))
+            
+        # Circuit breaker config
+        if os.getenv("CIRCUIT_BREAKER_ENABLED"):
+            self.circuit_breaker.enabled = os.getenv("CIRCUIT_BREAKER_ENABLED").lower() == "true"
+        if os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD"):
+            self.circuit_breaker.failure_threshold = int(os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD"))
+        if os.getenv("CIRCUIT_BREAKER_COOL_DOWN"):
+            self.circuit_breaker.cool_down = float(os.getenv("CIRCUIT_BREAKER_COOL_DOWN"))
+        if os.getenv("CIRCUIT_BREAKER_MAX_COOL_DOWN"):
+            self.circuit_breaker.max_cool_down = float(os.getenv("CIRCUIT_BREAKER_MAX_COOL_DOWN"))
+            
+        # Bulkhead config
+        if os.getenv("BULKHEAD_ENABLED"):
+            self.bulkheads.enabled = os.getenv("BULKHEAD_ENABLED").lower() == "true"
+        if os.getenv("BULKHEAD_INITIAL_LIMIT"):
+            self.bulkheads.initial_limit = int(os.getenv("BULKHEAD_INITIAL_LIMIT"))
+        if os.getenv("BULKHEAD_MAX_LIMIT"):
+            self.bulkheads.max_limit = int(os.getenv("BULKHEAD_MAX_LIMIT"))
+        if os.getenv("BULKHEAD_MAX_QUEUE"):
+            self.bulkheads.max_queue = int(os.getenv("BULKHEAD_MAX_QUEUE"))
+        if os.getenv("BULKHEAD_QUEUE_TIMEOUT"):
+            self.bulkheads.queue_timeout = float(os.getenv("BULKHEAD_QUEUE_TIMEOUT"))
+            
+        # Timeout config
+        if os.getenv("ADAPTIVE_TIMEOUTS"):
+            self.timeouts.adaptive = os.getenv("ADAPTIVE_TIMEOUTS").lower() == "true"
+        if os.getenv("TIMEOUT_FACTOR"):
+            self.timeouts.factor = float(os.getenv("TIMEOUT_FACTOR"))
+        if os.getenv("FIRST_TOKEN_TIMEOUT_MIN"):
+            self.timeouts.first_token_min = float(os.getenv("FIRST_TOKEN_TIMEOUT_MIN"))
+        if os.getenv("FIRST_TOKEN_TIMEOUT_MAX"):
+            self.timeouts.first_token_max = float(os.getenv("FIRST_TOKEN_TIMEOUT_MAX"))
+        if os.getenv("TOTAL_TIMEOUT_MIN"):
+            self.timeouts.total_min = float(os.getenv("TOTAL_TIMEOUT_MIN"))
+        if os.getenv("TOTAL_TIMEOUT_MAX"):
+            self.timeouts.total_max = float(os.getenv("TOTAL_TIMEOUT_MAX"))
+        if os.getenv("IDLE_TIMEOUT_MIN"):
+            self.timeouts.idle_min = float(os.getenv("IDLE_TIMEOUT_MIN"))
+        if os.getenv("IDLE_TIMEOUT_MAX"):
+            self.timeouts.idle_max = float(os.getenv("IDLE_TIMEOUT_MAX"))
+            
+        # Probe config
+        if os.getenv("PROBE_ENABLED"):
+            self.probing.enabled = os.getenv("PROBE_ENABLED").lower() == "true"
+        if os.getenv("PROBE_INTERVAL"):
+            self.probing.interval = float(os.getenv("PROBE_INTERVAL"))
+        if os.getenv("PROBE_CONCURRENCY"):
+            self.probing.concurrency = int(os.getenv("PROBE_CONCURRENCY"))
+        if os.getenv("PROBE_TIMEOUT"):
+            self.probing.timeout = float(os.getenv("PROBE_TIMEOUT"))
+            
+        # Cache config
+        if os.getenv("RESPONSE_CACHE_ENABLED"):
+            self.cache.enabled = os.getenv("RESPONSE_CACHE_ENABLED").lower() == "true"
+        if os.getenv("RESPONSE_CACHE_MAX_ENTRIES"):
+            self.cache.max_entries = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES"))
+        if os.getenv("RESPONSE_CACHE_MAX_BYTES"):
+            self.cache.max_bytes = int(os.getenv("RESPONSE_CACHE_MAX_BYTES"))
+        if os.getenv("RESPONSE_CACHE_TTL"):
+            self.cache.ttl = float(os.getenv("RESPONSE_CACHE_TTL"))
+        if os.getenv("RESPONSE_CACHE_DISK_ENABLED"):
+            self.cache.disk_enabled = os.getenv("RESPONSE_CACHE_DISK_ENABLED").lower() == "true"
+        if os.getenv("RESPONSE_CACHE_DISK_PATH"):
+            self.cache.disk_path = os.getenv("RESPONSE_CACHE_DISK_PATH")
+        if os.getenv("RESPONSE_CACHE_DISK_MAX_BYTES"):
+            self.cache.disk_max_bytes = int(os.getenv("RESPONSE_CACHE_DISK_MAX_BYTES"))
+        if os.getenv("RESPONSE_CACHE_DISK_TTL"):
+            self.cache.disk_ttl = float(os.getenv("RESPONSE_CACHE_DISK_TTL"))
+            
+        # History config
+        if os.getenv("HISTORY_MAX_MESSAGES"):
+            self.history.max_messages = int(os.getenv("HISTORY_MAX_MESSAGES"))
+        if os.getenv("HISTORY_CACHE_ENABLED"):
+            self.history.cache_enabled = os.getenv("HISTORY_CACHE_ENABLED").lower() == "true"
+        if os.getenv("HISTORY_CACHE_CONVERSATIONS"):
+            self.history.cache_conversations = int(os.getenv("HISTORY_CACHE_CONVERSATIONS"))
+        if os.getenv("HISTORY_CACHE_MAX_BYTES"):
+            self.history.cache_max_bytes = int(os.getenv("HISTORY_CACHE_MAX_BYTES"))
+        if os.getenv("HISTORY_TOKEN_BUDGET"):
+            self.history.default_token_budget = int(os.getenv("HISTORY_TOKEN_BUDGET"))
+        if os.getenv("HISTORY_COMPACTION_ENABLED"):
+            self.history.compaction_enabled = os.getenv("HISTORY_COMPACTION_ENABLED").lower() == "true"
+        if os.getenv("HISTORY_COMPACTION_THRESHOLD"):
+            self.history.compaction_threshold = int(os.getenv("HISTORY_COMPACTION_THRESHOLD"))
+        if os.getenv("HISTORY_COMPACTION_KEEP_RECENT"):
+            self.history.compaction_keep_recent = int(os.getenv("HISTORY_COMPACTION_KEEP_RECENT"))
+        if os.getenv("HISTORY_COMPACTION_MAX_TOKENS"):
+            self.history.compaction_max_tokens = int(os.getenv("HISTORY_COMPACTION_MAX_TOKENS"))
+            
+        # Cookie config
+        if os.getenv("COOKIE_CHECK_INTERVAL"):
+            self.cookies.check_interval = float(os.getenv("COOKIE_CHECK_INTERVAL"))
+        if os.getenv("COOKIE_UNAUTHORIZED_LIMIT"):
+            self.cookies.unauthorized_limit = int(os.getenv("COOKIE_UNAUTHORIZED_LIMIT"))
+            
+        # Proxy config
+        if os.getenv("PROXY_BENCH_AFTER_FAILURES"):
+            self.proxies.bench_after_failures = int(os.getenv("PROXY_BENCH_AFTER_FAILURES"))
+        if os.getenv("PROXY_BENCH_SECONDS"):
+            self.proxies.bench_seconds = float(os.getenv("PROXY_BENCH_SECONDS"))
+        if os.getenv("PROXY_STICKY"):
+            self.proxies.sticky = os.getenv("PROXY_STICKY").lower() == "true"
+            
+        # Batch config
+        if os.getenv("BATCH_MAX_ITEMS"):
+            self.batch.max_items = int(os.getenv("BATCH_MAX_ITEMS"))
+        if os.getenv("BATCH_MAX_CONCURRENCY"):
+            self.batch.max_concurrency = int(os.getenv("BATCH_MAX_CONCURRENCY"))
             
     @property
     def available_providers(self) -> Dict[str, Any]:
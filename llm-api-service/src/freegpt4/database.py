@@ -3,6 +3,9 @@
 import os
 import sqlite3
 import json
+import threading
+import time
+import weakref
 from contextlib import contextmanager
 from typing import Optional, Dict, Any, List, Tuple
 from pathlib import Path
@@ -16,6 +19,10 @@ from freegpt4.utils.exceptions import DatabaseError, ValidationError
 from freegpt4.utils.logging import logger
 from freegpt4.utils.validation import validate_username, validate_password
 from freegpt4.utils.helpers import generate_uuid
+from freegpt4.utils.sqlite_pool import SQLitePool
+from freegpt4.utils.cache import ConversationCache
+
+DEFAULT_CONVERSATION = "default"
 
 @dataclass
 class UserSettings:
@@ -59,7 +66,29 @@ class DatabaseManager:
             db_path: Path to database file
         """
         self.db_path = db_path or config.database.settings_file
+        self._settings_cache: Optional[Dict[str, Any]] = None
+        self._settings_version: Optional[int] = None
+        self._data_version: Optional[int] = None
+        self._watch_conn: Optional[sqlite3.Connection] = None
+        self._watch_lock = threading.Lock()
+        self._settings_lock = threading.Lock()
+        self._conversation_locks: "weakref.WeakValueDictionary[Tuple[str, str], threading.Lock]" = weakref.WeakValueDictionary()
+        self._conversation_locks_lock = threading.Lock()
+        self.history_cache = None
+        if config.history.cache_enabled:
+            self.history_cache = ConversationCache(
+                max_conversations=config.history.cache_conversations,
+                max_messages=config.history.max_messages,
+                max_bytes=config.history.cache_max_bytes
+            )
         self._ensure_db_directory()
+        self.pool = SQLitePool(
+            self.db_path,
+            pool_size=config.database.pool_size,
+            busy_timeout=config.database.busy_timeout,
+            cache_size_kb=config.database.cache_size_kb,
+            synchronous=config.database.synchronous
+        )
         self.initialize_database()
     
     def _ensure_db_directory(self):
@@ -82,23 +111,18 @@ class DatabaseManager:
     def get_connection(self):
         """Get database connection context manager.
         
+        Connections come from the pool and go back to it afterwards; a
+        transaction that was not committed is rolled back.
+        
         Yields:
             Database connection and cursor
         """
-        conn = None
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row  # Enable column access by name
-            cursor = conn.cursor()
-            yield conn, cursor
+            with self.pool.connection() as conn:
+                yield conn, conn.cursor()
         except sqlite3.Error as e:
-            if conn:
-                conn.rollback()
             logger.error(f"Database error: {e}")
             raise DatabaseError(f"Database operation failed: {e}")
-        finally:
-            if conn:
-                conn.close()
     
     def initialize_database(self):
         """Initialize database tables."""
@@ -140,11 +164,54 @@ class DatabaseManager:
                     )
                 """)
                 
+                # Create settings version table, bumped on every settings update
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS settings_version (
+                        id INTEGER PRIMARY KEY CHECK (id = 1),
+                        version INTEGER NOT NULL
+                    )
+                """)
+                cursor.execute("INSERT OR IGNORE INTO settings_version (id, version) VALUES (1, 0)")
+                
+                # Create append-only message store; the primary key doubles
+                # as the index for range loads of a conversation
+                # Version of each conversation, bumped on every change
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS conversations (
+                        user TEXT NOT NULL,
+                        conversation TEXT NOT NULL,
+                        version INTEGER NOT NULL,
+                        created_at REAL NOT NULL,
+                        updated_at REAL NOT NULL,
+                        PRIMARY KEY (user, conversation)
+                    )
+                """)
+                # Keyset pagination orders by (updated_at, conversation)
+                cursor.execute("DROP INDEX IF EXISTS idx_conversations_updated")
+                cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_conversations_page ON conversations (user, updated_at, conversation)"
+                )
+                
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS messages (
+                        user TEXT NOT NULL,
+                        conversation TEXT NOT NULL,
+                        seq INTEGER NOT NULL,
+                        role TEXT NOT NULL,
+                        content TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        PRIMARY KEY (user, conversation, seq)
+                    )
+                """)
+                
                 # Insert default settings if not exists
                 cursor.execute("SELECT COUNT(*) FROM settings")
                 if cursor.fetchone()[0] == 0:
                     self._create_default_settings(cursor)
                 
+                self._migrate_chat_history(cursor)
+                self._backfill_conversations(cursor)
+                
                 conn.commit()
                 logger.info("Database initialized successfully")
         except DatabaseError:
@@ -182,9 +249,174 @@ class DatabaseManager:
         ))
         logger.info("Default settings created")
     
+    def _migrate_chat_history(self, cursor):
+        """Move chat history JSON blobs into the messages table.
+        
+        Blobs are emptied once migrated. Rows that already exist are kept, so
+        replicas starting at the same time do not duplicate messages.
+        """
+        cursor.execute("SELECT 'admin' AS username, chat_history FROM settings WHERE chat_history != ''")
+        blobs = cursor.fetchall()
+        cursor.execute("SELECT username, chat_history FROM personal WHERE chat_history != ''")
+        blobs += cursor.fetchall()
+        
+        now = time.time()
+        for row in blobs:
+            try:
+                history = json.loads(row["chat_history"])
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping invalid chat history JSON for user '{row['username']}'")
+                continue
+            
+            messages = [
+                msg for msg in history
+                if isinstance(msg, dict) and msg.get("role") != "system"
+            ]
+            cursor.executemany(
+                "INSERT OR IGNORE INTO messages (user, conversation, seq, role, content, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (row["username"], DEFAULT_CONVERSATION, seq, str(msg.get("role", "user")), str(msg.get("content", "")), now)
+                    for seq, msg in enumerate(messages)
+                ]
+            )
+            cursor.execute(
+                "INSERT OR IGNORE INTO conversations (user, conversation, version, created_at, updated_at) "
+                "VALUES (?, ?, 1, ?, ?)",
+                (row["username"], DEFAULT_CONVERSATION, now, now)
+            )
+            logger.info(f"Migrated {len(messages)} chat history messages for user '{row['username']}'")
+        
+        if blobs:
+            cursor.execute("UPDATE settings SET chat_history = ''")
+            cursor.execute("UPDATE personal SET chat_history = ''")
+    
+    def _backfill_conversations(self, cursor):
+        """Register conversations whose messages were stored before they were tracked."""
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM conversations), EXISTS (SELECT 1 FROM messages)")
+        has_conversations, has_messages = cursor.fetchone()
+        if has_conversations or not has_messages:
+            return
+        
+        cursor.execute("""
+            INSERT OR IGNORE INTO conversations (user, conversation, version, created_at, updated_at)
+            SELECT user, conversation, 1, MIN(created_at), MAX(created_at)
+            FROM messages GROUP BY user, conversation
+        """)
+        logger.info(f"Registered {cursor.rowcount} existing conversations")
+    
     def get_settings(self) -> Dict[str, Any]:
         """Get server settings.
         
+        Settings are cached in process. The cache is reused while
+        ``PRAGMA data_version`` on a long-lived connection shows no commit by
+        any other connection, or while the settings version counter is
+        unchanged, so a save on another replica is picked up on the next call
+        without reading the settings row every time. Only the data version
+        is read on the long-lived connection; everything else goes through
+        the pool, so settings reads never queue behind a writer.
+        
+        Returns:
+            Dictionary with server settings
+        """
+        data_version = self._read_data_version()
+        with self._settings_lock:
+            settings, version, seen = self._settings_cache, self._settings_version, self._data_version
+        
+        current = None
+        if settings is not None and data_version is not None:
+            if data_version == seen:
+                return dict(settings)
+            
+            # Something was committed, but it may not have touched the settings
+            current = self._read_settings_version()
+            if current is not None and current == version:
+                with self._settings_lock:
+                    if self._settings_version == version:
+                        self._data_version = data_version
+                return dict(settings)
+        else:
+            current = self._read_settings_version()
+        
+        settings = self._load_settings()
+        with self._settings_lock:
+            self._settings_cache = settings
+            self._settings_version = current
+            self._data_version = data_version
+        return dict(settings)
+    
+    def _watch_connection(self) -> sqlite3.Connection:
+        """Get the long-lived connection used to detect changes.
+        
+        ``PRAGMA data_version`` on this connection changes whenever any other
+        connection, pooled or on another replica, commits. Nothing else runs
+        on it, so holding the watch lock never waits on a database lock.
+        
+        Caller must hold the watch lock.
+        """
+        if self._watch_conn is None:
+            self._watch_conn = sqlite3.connect(
+                self.db_path,
+                timeout=config.database.busy_timeout,
+                check_same_thread=False,
+                isolation_level=None
+            )
+            self._data_version = None
+            if self.history_cache is not None:
+                # Entries were confirmed against the old connection
+                self.history_cache.clear()
+        return self._watch_conn
+    
+    def _read_data_version(self) -> Optional[int]:
+        """Read ``PRAGMA data_version`` on the change detection connection.
+        
+        Read it before the data it guards, so a commit in between shows up
+        as a change on the next check.
+        
+        Returns:
+            Current data version or None if it cannot be read
+        """
+        with self._watch_lock:
+            try:
+                return self._watch_connection().execute("PRAGMA data_version").fetchone()[0]
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to read data version: {e}")
+                self._close_watch_connection()
+                return None
+    
+    def _read_settings_version(self) -> Optional[int]:
+        """Read the settings version counter before loading the settings.
+        
+        Returns:
+            Current settings version or None if it cannot be read
+        """
+        try:
+            with self.pool.connection() as conn:
+                row = conn.execute("SELECT version FROM settings_version WHERE id = 1").fetchone()
+                return row[0] if row else None
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read settings version: {e}")
+            return None
+    
+    def _close_watch_connection(self):
+        """Close the change detection connection. Caller must hold the watch lock."""
+        if self._watch_conn is not None:
+            try:
+                self._watch_conn.close()
+            except sqlite3.Error:
+                pass
+        self._watch_conn = None
+        self._data_version = None
+    
+    def invalidate_settings_cache(self):
+        """Drop the cached settings so the next read loads them from the database."""
+        with self._settings_lock:
+            self._settings_cache = None
+            self._settings_version = None
+    
+    def _load_settings(self) -> Dict[str, Any]:
+        """Read server settings from the database.
+        
         Returns:
             Dictionary with server settings
         """
@@ -240,6 +472,7 @@ class DatabaseManager:
                 if update_fields:
                     query = f"UPDATE settings SET {', '.join(update_fields)} WHERE id = 1"
                     cursor.execute(query, values)
+                    cursor.execute("UPDATE settings_version SET version = version + 1 WHERE id = 1")
                     conn.commit()
                     logger.info("Settings updated successfully")
         except DatabaseError:
@@ -247,6 +480,8 @@ class DatabaseManager:
         except Exception as e:
             logger.error(f"Failed to update settings: {e}")
             raise DatabaseError(f"Failed to update settings: {e}")
+        finally:
+            self.invalidate_settings_cache()
     
     def verify_admin_password(self, password: str) -> bool:
         """Verify admin password.
@@ -501,22 +736,413 @@ class DatabaseManager:
             logger.error(f"Failed to get all users: {e}")
             raise DatabaseError(f"Failed to get all users: {e}")
     
-    def save_chat_history(self, username: str, chat_history: str):
-        """Save chat history for user or admin.
+    def append_messages(
+        self,
+        username: str,
+        messages: List[Dict[str, str]],
+        conversation: str = DEFAULT_CONVERSATION
+    ):
+        """Append messages to a conversation.
+        
+        Each message is one row; a turn costs a single prepared INSERT no
+        matter how long the conversation already is.
         
         Args:
             username: Username ('admin' for admin user)
-            chat_history: Chat history JSON string
+            messages: Messages with role and content
+            conversation: Conversation ID
+        """
+        if not messages:
+            return
+        
+        now = time.time()
+        key = (username, conversation)
+        with self._conversation_lock(key):
+            data_version = self._read_data_version()
+            try:
+                with self.pool.connection() as conn:
+                    # Take the write lock up front so concurrent replicas cannot
+                    # compute the same sequence number
+                    conn.execute("BEGIN IMMEDIATE")
+                    conn.executemany("""
+                        INSERT INTO messages (user, conversation, seq, role, content, created_at)
+                        SELECT ?, ?, COALESCE(MAX(seq), -1) + 1, ?, ?, ?
+                        FROM messages WHERE user = ? AND conversation = ?
+                    """, [
+                        (username, conversation, msg["role"], msg["content"], now, username, conversation)
+                        for msg in messages
+                    ])
+                    version = self._bump_conversation(conn, username, conversation, now)
+                    conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to append messages for user '{username}': {e}")
+                raise DatabaseError(f"Failed to save chat history: {e}")
+            
+            # Write through to the cache if it held the previous version. The
+            # entry keeps the data version from before the write, so the next
+            # read confirms the conversation version once.
+            if self.history_cache is not None:
+                entry = self.history_cache.get(key)
+                if entry is not None and entry.version == version - 1 and data_version is not None:
+                    self.history_cache.append(key, [dict(msg) for msg in messages], version, data_version)
+                elif entry is not None:
+                    self.history_cache.invalidate(key)
+        
+        logger.debug(f"Appended {len(messages)} messages for user '{username}'")
+    
+    def _bump_conversation(self, conn, username: str, conversation: str, now: float) -> int:
+        """Increase a conversation's version inside the caller's transaction.
+        
+        Returns:
+            New conversation version
+        """
+        conn.execute("""
+            INSERT INTO conversations (user, conversation, version, created_at, updated_at)
+            VALUES (?, ?, 1, ?, ?)
+            ON CONFLICT (user, conversation) DO UPDATE SET
+                version = version + 1, updated_at = excluded.updated_at
+        """, (username, conversation, now, now))
+        return conn.execute(
+            "SELECT version FROM conversations WHERE user = ? AND conversation = ?",
+            (username, conversation)
+        ).fetchone()[0]
+    
+    def get_messages(
+        self,
+        username: str,
+        conversation: str = DEFAULT_CONVERSATION,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, str]]:
+        """Get the newest messages of a conversation.
+        
+        Active conversations are served from the history cache. A cached
+        entry is used as long as no other connection committed since it was
+        confirmed, or the conversation version is unchanged.
+        
+        Args:
+            username: Username ('admin' for admin user)
+            conversation: Conversation ID
+            limit: Maximum number of messages, None for all
+            
+        Returns:
+            Messages with role and content, oldest first
+        """
+        key = (username, conversation)
+        data_version = self._read_data_version()
+        if self.history_cache is not None:
+            entry = self.history_cache.get(key)
+            if (
+                entry is not None and data_version is not None
+                and (entry.complete or (limit is not None and limit <= len(entry.messages)))
+            ):
+                if data_version != entry.data_version and self._read_conversation_version(username, conversation) == entry.version:
+                    entry.data_version = data_version
+                if data_version == entry.data_version:
+                    self.history_cache.record(hit=True)
+                    messages = entry.messages if limit is None else entry.messages[-limit:] if limit else []
+                    return [dict(msg) for msg in messages]
+            self.history_cache.record(hit=False)
+        
+        with self._conversation_lock(key):
+            try:
+                with self.pool.connection() as conn:
+                    # Read version and messages from one snapshot
+                    conn.execute("BEGIN")
+                    version = self._conversation_version(conn, username, conversation)
+                    rows = conn.execute("""
+                        SELECT role, content FROM messages
+                        WHERE user = ? AND conversation = ?
+                        ORDER BY seq DESC LIMIT ?
+                    """, (username, conversation, -1 if limit is None else limit)).fetchall()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to get messages for user '{username}': {e}")
+                return []
+            
+            messages = [{"role": role, "content": content} for role, content in reversed(rows)]
+            if self.history_cache is not None and data_version is not None:
+                complete = limit is None or len(messages) < limit
+                self.history_cache.put(key, [dict(msg) for msg in messages], version, data_version, complete)
+            return messages
+    
+    def _conversation_version(self, conn, username: str, conversation: str) -> int:
+        """Read a conversation's version, 0 if it was never written."""
+        row = conn.execute(
+            "SELECT version FROM conversations WHERE user = ? AND conversation = ?",
+            (username, conversation)
+        ).fetchone()
+        return row[0] if row else 0
+    
+    def _read_conversation_version(self, username: str, conversation: str) -> Optional[int]:
+        """Read a conversation's version on a pooled connection, None if it cannot be read."""
+        try:
+            with self.pool.connection() as conn:
+                return self._conversation_version(conn, username, conversation)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read conversation version for user '{username}': {e}")
+            return None
+    
+    def _conversation_lock(self, key: Tuple[str, str]) -> threading.Lock:
+        """Get the lock that orders history reads and writes of one conversation.
+        
+        Locks live only while someone holds them, so idle conversations cost
+        nothing.
+        """
+        with self._conversation_locks_lock:
+            lock = self._conversation_locks.get(key)
+            if lock is None:
+                lock = self._conversation_locks[key] = threading.Lock()
+            return lock
+    
+    def _invalidate_conversation(self, username: str, conversation: str):
+        """Drop a conversation from the history cache after a pooled write."""
+        if self.history_cache is not None:
+            self.history_cache.invalidate((username, conversation))
+    
+    def list_conversations(
+        self,
+        username: str,
+        limit: int = 50,
+        before: Optional[Tuple[float, str]] = None
+    ) -> List[Dict[str, Any]]:
+        """List a user's conversations, most recently updated first.
+        
+        Conversations updated at the same time are ordered by ID, so a page
+        boundary between them neither skips nor repeats one.
+        
+        Args:
+            username: Username ('admin' for admin user)
+            limit: Maximum number of conversations
+            before: Only return conversations ordered after this (updated_at, ID) cursor
+            
+        Returns:
+            Conversations with id, created_at and updated_at
+        """
+        try:
+            with self.get_connection() as (conn, cursor):
+                cursor.execute("""
+                    SELECT conversation, created_at, updated_at FROM conversations
+                    WHERE user = ? AND (updated_at, conversation) < (?, ?)
+                    ORDER BY updated_at DESC, conversation DESC LIMIT ?
+                """, (username, *(before or (float("inf"), "")), limit))
+                return [
+                    {"id": row["conversation"], "created_at": row["created_at"], "updated_at": row["updated_at"]}
+                    for row in cursor.fetchall()
+                ]
+        except Exception as e:
+            logger.error(f"Failed to list conversations for user '{username}': {e}")
+            raise DatabaseError(f"Failed to list conversations: {e}")
+    
+    def get_message_page(
+        self,
+        username: str,
+        conversation: str,
+        after_seq: Optional[int] = None,
+        before_seq: Optional[int] = None,
+        limit: int = 50
+    ) -> List[Dict[str, Any]]:
+        """Get a page of a conversation's messages by sequence range.
+        
+        With ``before_seq`` the page holds the newest messages older than it,
+        otherwise the oldest messages newer than ``after_seq``.
+        
+        Args:
+            username: Username ('admin' for admin user)
+            conversation: Conversation ID
+            after_seq: Return messages after this sequence number
+            before_seq: Return messages before this sequence number
+            limit: Maximum number of messages
+            
+        Returns:
+            Messages with seq, role, content and created_at, oldest first
         """
         try:
             with self.get_connection() as (conn, cursor):
-                if username == "admin":
-                    cursor.execute("UPDATE settings SET chat_history = ? WHERE id = 1", (chat_history,))
+                if before_seq is not None:
+                    cursor.execute("""
+                        SELECT seq, role, content, created_at FROM messages
+                        WHERE user = ? AND conversation = ? AND seq < ?
+                        ORDER BY seq DESC LIMIT ?
+                    """, (username, conversation, before_seq, limit))
+                    rows = list(reversed(cursor.fetchall()))
                 else:
-                    cursor.execute("UPDATE personal SET chat_history = ? WHERE username = ?", (chat_history, username))
+                    cursor.execute("""
+                        SELECT seq, role, content, created_at FROM messages
+                        WHERE user = ? AND conversation = ? AND seq > ?
+                        ORDER BY seq LIMIT ?
+                    """, (username, conversation, -1 if after_seq is None else after_seq, limit))
+                    rows = cursor.fetchall()
+                return [
+                    {"seq": row["seq"], "role": row["role"], "content": row["content"], "created_at": row["created_at"]}
+                    for row in rows
+                ]
+        except Exception as e:
+            logger.error(f"Failed to get messages for user '{username}': {e}")
+            raise DatabaseError(f"Failed to get messages: {e}")
+    
+    def count_messages(self, username: str, conversation: str = DEFAULT_CONVERSATION) -> int:
+        """Count the stored messages of a conversation.
+        
+        Args:
+            username: Username ('admin' for admin user)
+            conversation: Conversation ID
+            
+        Returns:
+            Number of messages
+        """
+        try:
+            with self.get_connection() as (conn, cursor):
+                cursor.execute(
+                    "SELECT COUNT(*) FROM messages WHERE user = ? AND conversation = ?",
+                    (username, conversation)
+                )
+                return cursor.fetchone()[0]
+        except Exception as e:
+            logger.error(f"Failed to count messages for user '{username}': {e}")
+            return 0
+    
+    def get_oldest_messages(
+        self,
+        username: str,
+        limit: int,
+        conversation: str = DEFAULT_CONVERSATION
+    ) -> List[Dict[str, Any]]:
+        """Get the oldest messages of a conversation with their sequence numbers.
+        
+        Args:
+            username: Username ('admin' for admin user)
+            limit: Maximum number of messages
+            conversation: Conversation ID
+            
+        Returns:
+            Messages with seq, role and content, oldest first
+        """
+        try:
+            with self.get_connection() as (conn, cursor):
+                cursor.execute("""
+                    SELECT seq, role, content FROM messages
+                    WHERE user = ? AND conversation = ?
+                    ORDER BY seq LIMIT ?
+                """, (username, conversation, limit))
+                return [
+                    {"seq": row["seq"], "role": row["role"], "content": row["content"]}
+                    for row in cursor.fetchall()
+                ]
+        except Exception as e:
+            logger.error(f"Failed to get messages for user '{username}': {e}")
+            return []
+    
+    def replace_messages(
+        self,
+        username: str,
+        first_seq: int,
+        last_seq: int,
+        expected_count: int,
+        message: Dict[str, str],
+        conversation: str = DEFAULT_CONVERSATION
+    ) -> bool:
+        """Replace a range of messages with a single message.
+        
+        The replacement takes the last sequence number of the range, so it
+        stays in place relative to newer messages. Nothing is changed if the
+        range no longer holds ``expected_count`` messages, for example because
+        another replica already replaced it.
+        
+        Args:
+            username: Username ('admin' for admin user)
+            first_seq: First sequence number of the range
+            last_seq: Last sequence number of the range
+            expected_count: Number of messages the range must hold
+            message: Replacement message with role and content
+            conversation: Conversation ID
+            
+        Returns:
+            True if the range was replaced
+        """
+        try:
+            with self.get_connection() as (conn, cursor):
+                cursor.execute("BEGIN IMMEDIATE")
+                cursor.execute("""
+                    SELECT COUNT(*) FROM messages
+                    WHERE user = ? AND conversation = ? AND seq BETWEEN ? AND ?
+                """, (username, conversation, first_seq, last_seq))
+                if cursor.fetchone()[0] != expected_count:
+                    return False
                 
+                cursor.execute("""
+                    DELETE FROM messages
+                    WHERE user = ? AND conversation = ? AND seq BETWEEN ? AND ?
+                """, (username, conversation, first_seq, last_seq))
+                now = time.time()
+                cursor.execute(
+                    "INSERT INTO messages (user, conversation, seq, role, content, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (username, conversation, last_seq, message["role"], message["content"], now)
+                )
+                self._bump_conversation(cursor, username, conversation, now)
+                conn.commit()
+            self._invalidate_conversation(username, conversation)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to replace messages for user '{username}': {e}")
+            raise DatabaseError(f"Failed to compact chat history: {e}")
+    
+    def clear_messages(self, username: str, conversation: str = DEFAULT_CONVERSATION):
+        """Delete all messages of a conversation.
+        
+        Args:
+            username: Username ('admin' for admin user)
+            conversation: Conversation ID
+        """
+        try:
+            with self.get_connection() as (conn, cursor):
+                cursor.execute(
+                    "DELETE FROM messages WHERE user = ? AND conversation = ?",
+                    (username, conversation)
+                )
+                self._bump_conversation(cursor, username, conversation, time.time())
                 conn.commit()
-                logger.debug(f"Chat history saved for user '{username}'")
+            self._invalidate_conversation(username, conversation)
+        except Exception as e:
+            logger.error(f"Failed to clear messages for user '{username}': {e}")
+            raise DatabaseError(f"Failed to clear chat history: {e}")
+    
+    def save_chat_history(self, username: str, chat_history: str):
+        """Replace the chat history for user or admin.
+        
+        Prefer ``append_messages``, which does not rewrite the conversation.
+        
+        Args:
+            username: Username ('admin' for admin user)
+            chat_history: Chat history JSON string
+        """
+        try:
+            messages = [
+                {"role": str(msg.get("role", "user")), "content": str(msg.get("content", ""))}
+                for msg in json.loads(chat_history or "[]")
+                if isinstance(msg, dict) and msg.get("role") != "system"
+            ]
+        except json.JSONDecodeError as e:
+            raise ValidationError(f"Invalid chat history JSON: {e}")
+        
+        now = time.time()
+        try:
+            with self.get_connection() as (conn, cursor):
+                cursor.execute(
+                    "DELETE FROM messages WHERE user = ? AND conversation = ?",
+                    (username, DEFAULT_CONVERSATION)
+                )
+                cursor.executemany(
+                    "INSERT INTO messages (user, conversation, seq, role, content, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (username, DEFAULT_CONVERSATION, seq, msg["role"], msg["content"], now)
+                        for seq, msg in enumerate(messages)
+                    ]
+                )
+                self._bump_conversation(cursor, username, DEFAULT_CONVERSATION, now)
+                conn.commit()
+            self._invalidate_conversation(username, DEFAULT_CONVERSATION)
+            logger.debug(f"Chat history saved for user '{username}'")
         except Exception as e:
             logger.error(f"Failed to save chat history for user '{username}': {e}")
             raise DatabaseError(f"Failed to save chat history: {e}")
@@ -530,18 +1156,8 @@ class DatabaseManager:
         Returns:
             Chat history JSON string
         """
-        try:
-            with self.get_connection() as (conn, cursor):
-                if username == "admin":
-                    cursor.execute("SELECT chat_history FROM settings WHERE id = 1")
-                else:
-                    cursor.execute("SELECT chat_history FROM personal WHERE username = ?", (username,))
-                
-                row = cursor.fetchone()
-                return row["chat_history"] if row else ""
-        except Exception as e:
-            logger.error(f"Failed to get chat history for user '{username}': {e}")
-            return ""
+        messages = self.get_messages(username)
+        return json.dumps(messages) if messages else ""
 
 # Global database manager instance
 db_manager = DatabaseManager()
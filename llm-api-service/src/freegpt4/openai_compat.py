@@ -0,0 +1,230 @@
+"""OpenAI-compatible chat completion API.
+
+Implements ``/v1/chat/completions`` and ``/v1/models`` on top of
+``AIService``, so OpenAI clients go through the same provider fallback
+chain, health monitoring, proxies and cookies as the main endpoint.
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from freegpt4.config import config
+from freegpt4.database import db_manager
+from freegpt4.ai_service import ai_service
+from freegpt4.utils.deadline import Deadline, NO_DEADLINE
+from freegpt4.utils.exceptions import AIProviderError, DeadlineExceededError, FreeGPTException, ValidationError
+from freegpt4.utils.helpers import format_sse_event, generate_uuid, parse_bool
+from freegpt4.utils.logging import logger
+
+ALLOWED_ROLES = {"system", "user", "assistant"}
+
+@dataclass
+class ChatCompletionRequest:
+    """Parsed chat completion request."""
+    messages: List[Dict[str, str]]
+    model: str
+    provider: Optional[str] = None
+    stream: bool = False
+    use_cache: bool = True
+
+def _message_content(content: Any) -> str:
+    """Flatten OpenAI message content to text.
+
+    Args:
+        content: String content or a list of content parts
+
+    Returns:
+        Text content
+    """
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            part.get("text", "") for part in content
+            if isinstance(part, dict) and part.get("type") == "text"
+        )
+    if content is None:
+        return ""
+    raise ValidationError("Message content must be a string or a list of content parts")
+
+def parse_chat_request(payload: Any) -> ChatCompletionRequest:
+    """Validate a chat completion request body.
+
+    Args:
+        payload: Decoded JSON body
+
+    Returns:
+        Parsed request
+
+    Raises:
+        ValidationError: If the body is invalid
+    """
+    if not isinstance(payload, dict):
+        raise ValidationError("Request body must be a JSON object")
+
+    raw_messages = payload.get("messages")
+    if not isinstance(raw_messages, list) or not raw_messages:
+        raise ValidationError("'messages' must be a non-empty list")
+
+    messages = []
+    for raw in raw_messages:
+        if not isinstance(raw, dict):
+            raise ValidationError("Each message must be an object")
+        role = raw.get("role")
+        if role not in ALLOWED_ROLES:
+            raise ValidationError(f"Unsupported message role: {role}")
+        messages.append({"role": role, "content": _message_content(raw.get("content"))})
+
+    model = payload.get("model") or db_manager.get_settings().get("model", config.api.default_model)
+
+    return ChatCompletionRequest(
+        messages=messages,
+        model=str(model),
+        provider=payload.get("provider"),
+        stream=parse_bool(payload.get("stream", False)),
+        use_cache=not parse_bool(payload.get("no_cache", False))
+    )
+
+def error_body(message: str, error_type: str = "invalid_request_error") -> Dict[str, Any]:
+    """Build an OpenAI-style error body.
+
+    Args:
+        message: Error message
+        error_type: OpenAI error type
+
+    Returns:
+        Error body
+    """
+    return {"error": {"message": message, "type": error_type, "code": None}}
+
+def error_status(error: Exception) -> int:
+    """Get the HTTP status for an error raised while serving a completion."""
+    if isinstance(error, ValidationError):
+        return 400
+    if isinstance(error, DeadlineExceededError):
+        return 504
+    if isinstance(error, AIProviderError):
+        return 502
+    return 500
+
+def error_type(error: Exception) -> str:
+    """Get the OpenAI error type for an error raised while serving a completion."""
+    if isinstance(error, ValidationError):
+        return "invalid_request_error"
+    if isinstance(error, AIProviderError):
+        return "api_error"
+    return "server_error"
+
+async def create_chat_completion(
+    request: ChatCompletionRequest,
+    remove_sources: bool = False,
+    use_proxies: bool = False,
+    cookie_file: Optional[str] = None,
+    deadline: Deadline = NO_DEADLINE
+) -> Dict[str, Any]:
+    """Generate a complete chat completion response.
+
+    Args:
+        request: Parsed request
+        remove_sources: Whether to remove source references
+        use_proxies: Whether to use proxies
+        cookie_file: Cookie file path
+        deadline: Request deadline
+
+    Returns:
+        ``chat.completion`` object
+    """
+    text = await ai_service.generate_completion(
+        messages=request.messages,
+        provider=request.provider,
+        model=request.model,
+        remove_sources=remove_sources,
+        use_proxies=use_proxies,
+        cookie_file=cookie_file,
+        use_cache=request.use_cache,
+        deadline=deadline
+    )
+
+    return {
+        "id": f"chatcmpl-{generate_uuid()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": text},
+            "finish_reason": "stop"
+        }]
+    }
+
+async def stream_chat_completion(
+    request: ChatCompletionRequest,
+    use_proxies: bool = False,
+    cookie_file: Optional[str] = None,
+    deadline: Deadline = NO_DEADLINE
+) -> AsyncGenerator[str, None]:
+    """Stream a chat completion as ``chat.completion.chunk`` SSE messages.
+
+    Args:
+        request: Parsed request
+        use_proxies: Whether to use proxies
+        cookie_file: Cookie file path
+        deadline: Request deadline, bounding the time until the first chunk
+
+    Yields:
+        SSE messages, ending with ``data: [DONE]``
+    """
+    completion_id = f"chatcmpl-{generate_uuid()}"
+    created = int(time.time())
+
+    def chunk(delta: Dict[str, str], finish_reason: Optional[str] = None) -> str:
+        return format_sse_event({
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": request.model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        })
+
+    try:
+        yield chunk({"role": "assistant"})
+        async for text in ai_service.stream_completion(
+            messages=request.messages,
+            provider=request.provider,
+            model=request.model,
+            use_proxies=use_proxies,
+            cookie_file=cookie_file,
+            use_cache=request.use_cache,
+            deadline=deadline
+        ):
+            yield chunk({"content": text})
+        yield chunk({}, finish_reason="stop")
+    except FreeGPTException as e:
+        logger.error(f"Chat completion stream error: {e}")
+        yield format_sse_event(error_body(str(e), error_type(e)))
+    except Exception as e:
+        logger.error(f"Unexpected chat completion stream error: {e}", exc_info=True)
+        yield format_sse_event(error_body("Internal server error", "server_error"))
+
+    yield format_sse_event("[DONE]")
+
+def list_models() -> Dict[str, Any]:
+    """List models in OpenAI format.
+
+    Returns:
+        ``list`` object with generic models and the configured default
+    """
+    models = list(config.generic_models)
+    default_model = db_manager.get_settings().get("model", config.api.default_model)
+    if default_model not in models:
+        models.insert(0, default_model)
+
+    created = int(time.time())
+    return {
+        "object": "list",
+        "data": [
+            {"id": model, "object": "model", "created": created, "owned_by": "freegpt4"}
+            for model in models
+        ]
+    }
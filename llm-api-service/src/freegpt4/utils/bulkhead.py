@@ -0,0 +1,172 @@
+"""Per-provider concurrency limits."""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+class Bulkhead:
+    """Cap the calls in flight to one provider, tuning the cap by AIMD.
+
+    Up to ``limit`` calls run at once. Further callers wait in a queue of at
+    most ``max_queue`` entries for up to ``queue_timeout`` seconds; anything
+    beyond that is turned away so the caller can try another provider
+    instead of queueing behind a saturated one. The limit grows additively,
+    by one per ``limit`` successful calls made while the bulkhead is at
+    least half used, and is cut by ``decrease_factor`` on an overload signal
+    (rate limit or timeout), at most once per ``decrease_interval`` seconds
+    so one burst of failures counts once.
+
+    Thread-safe; waiters may live on different event loops.
+    """
+
+    __slots__ = (
+        "min_limit", "max_limit", "max_queue", "queue_timeout", "decrease_factor", "decrease_interval", "clock",
+        "in_flight", "rejected", "_limit", "_decreased_at", "_waiters", "_lock"
+    )
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        max_queue: int = 4,
+        queue_timeout: float = 0.5,
+        decrease_factor: float = 0.5,
+        decrease_interval: float = 2.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """Initialize an empty bulkhead.
+
+        Args:
+            initial_limit: Calls allowed in flight before any feedback
+            min_limit: Lower bound of the limit
+            max_limit: Upper bound of the limit
+            max_queue: Callers allowed to wait for a slot (0 = never wait)
+            queue_timeout: Seconds a caller waits for a slot before giving up
+            decrease_factor: Factor applied to the limit on overload
+            decrease_interval: Seconds after a decrease during which further overloads are ignored
+            clock: Time source for the decrease interval
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.decrease_factor = decrease_factor
+        self.decrease_interval = decrease_interval
+        self.clock = clock
+        self.in_flight = 0
+        self.rejected = 0
+        self._limit = float(min(max_limit, max(min_limit, initial_limit)))
+        self._decreased_at = float("-inf")
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        """Calls currently allowed in flight."""
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def queued(self) -> int:
+        """Callers waiting for a slot."""
+        return len(self._waiters)
+
+    async def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Take a slot, waiting in the queue briefly if none is free.
+
+        Args:
+            timeout: Longest wait in seconds, defaults to ``queue_timeout``
+
+        Returns:
+            True if a slot was taken; it must be given back with ``release``
+        """
+        timeout = self.queue_timeout if timeout is None else min(timeout, self.queue_timeout)
+        with self._lock:
+            if self.in_flight < self.limit and not self._waiters:
+                self.in_flight += 1
+                return True
+            if len(self._waiters) >= self.max_queue or timeout <= 0:
+                self.rejected += 1
+                return False
+            loop = asyncio.get_running_loop()
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+
+        try:
+            await asyncio.wait({waiter[1]}, timeout=timeout)
+        except asyncio.CancelledError:
+            if not self._withdraw(waiter):
+                # The slot was handed over just as the caller went away
+                self.release()
+            raise
+        if self._withdraw(waiter):
+            with self._lock:
+                self.rejected += 1
+            return False
+        return True
+
+    def _withdraw(self, waiter: Tuple[asyncio.AbstractEventLoop, asyncio.Future]) -> bool:
+        """Remove a waiter from the queue, False if it was already granted a slot."""
+        with self._lock:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                return False
+            return True
+
+    def release(self):
+        """Give back a slot, handing it to the longest waiting caller if the limit allows."""
+        with self._lock:
+            self.in_flight -= 1
+            self._hand_over()
+
+    def _hand_over(self):
+        """Hand free slots to waiting callers; the lock must be held."""
+        while self._waiters and self.in_flight < self.limit:
+            loop, future = self._waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(_grant, future)
+            except RuntimeError:
+                continue  # The waiter's loop is closed
+            self.in_flight += 1
+
+    def record_success(self):
+        """Grow the limit by one per window of successful calls while it is in use."""
+        with self._lock:
+            if self.in_flight * 2 >= self.limit:
+                self._limit = min(float(self.max_limit), self._limit + 1 / self._limit)
+                self._hand_over()
+
+    def record_overload(self) -> bool:
+        """Cut the limit after a rate limit or timeout.
+
+        Returns:
+            True if the limit was lowered
+        """
+        with self._lock:
+            now = self.clock()
+            if now - self._decreased_at < self.decrease_interval or self._limit <= self.min_limit:
+                return False
+            self._decreased_at = now
+            self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the current limit and load.
+
+        Returns:
+            Dictionary with limit, in-flight, queued and rejected counts
+        """
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "rejected": self.rejected,
+        }
+
+def _grant(future: asyncio.Future):
+    """Wake a waiter that was handed a slot."""
+    if not future.done():
+        future.set_result(True)
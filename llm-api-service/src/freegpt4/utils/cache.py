@@ -0,0 +1,518 @@
+"""Response caching for AI completions."""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .logging import logger
+from .sqlite_pool import SQLitePool
+
+def make_cache_key(
+    provider: str,
+    model: str,
+    system_prompt: str,
+    messages: List[Dict[str, str]],
+    remove_sources: bool = False
+) -> str:
+    """Build a cache key for a completion request.
+
+    Roles are normalized for case and surrounding whitespace, and contents
+    for surrounding whitespace only, so trivially different requests share
+    an entry while indentation and line breaks inside a prompt still count.
+
+    Args:
+        provider: Requested provider
+        model: Requested model
+        system_prompt: System prompt
+        messages: Chat messages
+        remove_sources: Whether source references are removed
+
+    Returns:
+        Hex digest identifying the request
+    """
+    normalized = [
+        [str(msg.get("role", "")).strip().lower(), str(msg.get("content", "")).strip()]
+        for msg in messages
+    ]
+    payload = json.dumps(
+        [provider, model, (system_prompt or "").strip(), bool(remove_sources), normalized],
+        ensure_ascii=False,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """Thread-safe in-memory LRU cache with per-entry TTL.
+
+    Memory is bounded both by entry count and by the total size of cached
+    responses; the least recently used entries are evicted first.
+    """
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 32 * 1024 * 1024, ttl: float = 300):
+        """Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of entries
+            max_bytes: Maximum total size of keys and values in bytes
+            ttl: Default time to live in seconds
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[str, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a cached response.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached response or None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at, _ = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        """Cache a response.
+
+        Args:
+            key: Cache key
+            value: Response text
+            ttl: Time to live in seconds, defaults to the cache TTL
+        """
+        size = len(key) + len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            logger.debug(f"Response of {size} bytes is too large to cache")
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, time.time() + (ttl if ttl is not None else self.ttl), size)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        """Remove an entry. Caller must hold the lock."""
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache statistics.
+
+        Returns:
+            Dictionary with hit/miss counters and current size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
+
+class SQLiteResponseCache:
+    """Response cache stored in a SQLite database in WAL mode.
+
+    The database lives on the shared data volume, so every replica reads and
+    fills the same cache and a restarted replica starts warm. The total size
+    of cached responses is bounded; expired entries are dropped first, then
+    the least recently used ones. Pruning runs every ``prune_every`` writes,
+    or sooner once the bytes written since the last prune may have pushed
+    the cache over its bound, and an entry's access time is refreshed at most
+    once per ``touch_interval`` seconds, so most reads never write.
+
+    Errors are logged and treated as cache misses so a locked or damaged
+    cache file never fails a request.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl: float = 3600,
+        timeout: float = 1.0,
+        prune_every: int = 64,
+        touch_interval: float = 60.0
+    ):
+        """Initialize the cache.
+
+        Args:
+            path: Database file path
+            max_bytes: Maximum total size of keys and values in bytes
+            ttl: Default time to live in seconds
+            timeout: Seconds to wait for a lock held by another replica
+            prune_every: Writes between two prunes
+            touch_interval: Seconds before a read refreshes an entry's access time again
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.timeout = timeout
+        self.prune_every = prune_every
+        self.touch_interval = touch_interval
+        self._lock = threading.Lock()
+        self._total = 0     # Size of the cache as of the last prune
+        self._written = 0   # Bytes written by this process since then
+        self._writes = 0    # Writes by this process since then
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.pool = SQLitePool(path, pool_size=4, busy_timeout=timeout)
+        with self.pool.connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed_at ON responses (accessed_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_expires_at ON responses (expires_at)")
+            conn.commit()
+        self._prune()
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a cached response.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached response or None if missing, expired or unreadable
+        """
+        now = time.time()
+        try:
+            with self.pool.connection() as conn:
+                row = conn.execute(
+                    "SELECT value, accessed_at FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+                if row is not None and row[1] < now - self.touch_interval:
+                    conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                    conn.commit()
+        except sqlite3.Error as e:
+            self._record_error("read", e)
+            return None
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0]
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        """Cache a response and evict entries beyond the size bound.
+
+        Args:
+            key: Cache key
+            value: Response text
+            ttl: Time to live in seconds, defaults to the cache TTL
+        """
+        size = len(key) + len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            logger.debug(f"Response of {size} bytes is too large to cache on disk")
+            return
+
+        now = time.time()
+        try:
+            with self.pool.connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, size, expires_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, value, size, now + (ttl if ttl is not None else self.ttl), now)
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            self._record_error("write", e)
+            return
+
+        with self._lock:
+            self._written += size
+            self._writes += 1
+            due = self._writes >= self.prune_every or self._total + self._written > self.max_bytes
+            if due:
+                self._written, self._writes = 0, 0
+        if due:
+            self._prune()
+
+    def _prune(self):
+        """Drop expired entries, then least recently used ones over the size bound."""
+        try:
+            with self.pool.connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+                evicted = 0
+                if total > self.max_bytes:
+                    # Leave headroom so the next writes do not trigger another prune at once
+                    target = self.max_bytes * 0.9
+                    cursor = conn.execute("SELECT key, size FROM responses ORDER BY accessed_at")
+                    stale = []
+                    for key, size in cursor:
+                        if total <= target:
+                            break
+                        stale.append((key,))
+                        total -= size
+                    conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+                    evicted = len(stale)
+                conn.commit()
+        except sqlite3.Error as e:
+            self._record_error("prune", e)
+            return
+
+        with self._lock:
+            self._total = total
+            self.evictions += evicted
+
+    def _record_error(self, operation: str, error: sqlite3.Error):
+        """Log a cache database error."""
+        with self._lock:
+            self.errors += 1
+        logger.warning(f"Disk response cache {operation} failed: {error}")
+
+    def clear(self):
+        """Remove all entries."""
+        try:
+            with self.pool.connection() as conn:
+                conn.execute("DELETE FROM responses")
+                conn.commit()
+        except sqlite3.Error as e:
+            self._record_error("clear", e)
+            return
+
+        with self._lock:
+            self._total, self._written, self._writes = 0, 0, 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache statistics.
+
+        Hit and miss counters are per process; size figures are shared by all
+        replicas.
+
+        Returns:
+            Dictionary with hit/miss counters and current size
+        """
+        entries, total = 0, 0
+        try:
+            with self.pool.connection() as conn:
+                entries, total = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+                ).fetchone()
+        except sqlite3.Error as e:
+            self._record_error("stats", e)
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "errors": self.errors,
+                "entries": entries,
+                "bytes": total,
+                "max_bytes": self.max_bytes,
+            }
+
+class _Conversation:
+    """Cached newest messages of one conversation."""
+
+    __slots__ = ("messages", "version", "data_version", "complete", "size")
+
+    def __init__(self, messages: List[Dict[str, str]], version: int, data_version: int, complete: bool):
+        self.messages = messages
+        self.version = version
+        self.data_version = data_version
+        self.complete = complete
+        self.size = sum(_message_size(msg) for msg in messages)
+
+def _message_size(message: Dict[str, str]) -> int:
+    """Approximate memory used by a message in bytes."""
+    return len(message.get("role", "")) + len(message.get("content", "").encode("utf-8"))
+
+class ConversationCache:
+    """Thread-safe LRU cache of the newest messages of active conversations.
+
+    Each entry remembers the conversation version it reflects and the
+    ``PRAGMA data_version`` at which that was last confirmed, so the database
+    can tell cheaply whether the entry is still current. Entries are bounded
+    in messages; the cache as a whole is bounded in conversations and bytes.
+    """
+
+    def __init__(self, max_conversations: int = 1000, max_messages: int = 200, max_bytes: int = 64 * 1024 * 1024):
+        """Initialize the cache.
+
+        Args:
+            max_conversations: Maximum number of cached conversations
+            max_messages: Maximum number of messages kept per conversation
+            max_bytes: Maximum total size of cached messages in bytes
+        """
+        self.max_conversations = max_conversations
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str], _Conversation]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Tuple[str, str]) -> Optional[_Conversation]:
+        """Get a cached conversation.
+
+        Args:
+            key: (user, conversation) pair
+
+        Returns:
+            Cached entry or None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def record(self, hit: bool):
+        """Count a lookup that was (or was not) served from the cache."""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def put(self, key: Tuple[str, str], messages: List[Dict[str, str]], version: int, data_version: int, complete: bool):
+        """Cache the newest messages of a conversation.
+
+        Args:
+            key: (user, conversation) pair
+            messages: Newest messages, oldest first
+            version: Conversation version the messages reflect
+            data_version: Data version at which the version was read
+            complete: Whether messages hold the whole conversation
+        """
+        if len(messages) > self.max_messages:
+            messages = messages[-self.max_messages:]
+            complete = False
+
+        entry = _Conversation(list(messages), version, data_version, complete)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            self._evict()
+
+    def append(self, key: Tuple[str, str], messages: List[Dict[str, str]], version: int, data_version: int):
+        """Add written messages to a cached conversation.
+
+        Args:
+            key: (user, conversation) pair
+            messages: Appended messages, oldest first
+            version: Conversation version after the write
+            data_version: Data version at which the write happened
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+
+            entry.messages.extend(messages)
+            delta = sum(_message_size(msg) for msg in messages)
+            if len(entry.messages) > self.max_messages:
+                dropped = entry.messages[:-self.max_messages]
+                del entry.messages[:-self.max_messages]
+                delta -= sum(_message_size(msg) for msg in dropped)
+                entry.complete = False
+            entry.size += delta
+            self._bytes += delta
+            entry.version = version
+            entry.data_version = data_version
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def invalidate(self, key: Tuple[str, str]):
+        """Drop a cached conversation."""
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: Tuple[str, str]):
+        """Remove an entry if present. Caller must hold the lock."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _evict(self):
+        """Evict least recently used entries beyond the bounds. Caller must hold the lock."""
+        while self._entries and (len(self._entries) > self.max_conversations or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache statistics.
+
+        Returns:
+            Dictionary with hit/miss counters and current size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "conversations": len(self._entries),
+                "bytes": self._bytes,
+                "max_conversations": self.max_conversations,
+                "max_bytes": self.max_bytes,
+            }
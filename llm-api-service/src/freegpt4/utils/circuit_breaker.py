@@ -0,0 +1,146 @@
+"""Circuit breaker for provider calls."""
+
+import time
+from enum import Enum
+from typing import Callable
+
+class CircuitState(Enum):
+    """Circuit breaker state."""
+    CLOSED = "closed"        # Calls flow normally
+    OPEN = "open"            # Calls are skipped until the cool-down ends
+    HALF_OPEN = "half_open"  # A limited number of trial calls may probe the provider
+
+class CircuitBreaker:
+    """Stop calling a failing provider for a while, then probe it.
+
+    The circuit opens after ``failure_threshold`` consecutive failures and
+    stays open for ``cool_down`` seconds. It then turns half-open and admits
+    up to ``half_open_max_calls`` trial calls at a time: a success closes the
+    circuit, a failure opens it again with the cool-down doubled (capped at
+    ``max_cool_down``). A trial that never reports back is given up after one
+    cool-down so it cannot keep the circuit half-open forever. A
+    ``failure_threshold`` of 0 disables the breaker.
+
+    Not thread-safe; callers serialize access.
+    """
+
+    __slots__ = (
+        "failure_threshold", "cool_down", "max_cool_down", "half_open_max_calls", "clock",
+        "consecutive_failures", "trips", "_state", "_opened_at", "_open_for", "_trials", "_trial_started_at"
+    )
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        cool_down: float = 30.0,
+        max_cool_down: float = 300.0,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """Initialize a closed circuit.
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit (0 = never)
+            cool_down: Seconds the circuit stays open the first time
+            max_cool_down: Upper bound for the doubled cool-down of repeated trips
+            half_open_max_calls: Trial calls admitted at once while half-open
+            clock: Time source, replaceable for simulations
+        """
+        self.failure_threshold = failure_threshold
+        self.cool_down = cool_down
+        self.max_cool_down = max_cool_down
+        self.half_open_max_calls = half_open_max_calls
+        self.clock = clock
+        self.consecutive_failures = 0
+        self.trips = 0
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._open_for = 0.0
+        self._trials = 0
+        self._trial_started_at = 0.0
+
+    @property
+    def state(self) -> CircuitState:
+        """Current state, turning an open circuit half-open once its cool-down is over."""
+        if self._state is CircuitState.OPEN and self.clock() - self._opened_at >= self._open_for:
+            self._state = CircuitState.HALF_OPEN
+            self._trials = 0
+        return self._state
+
+    @property
+    def retry_in(self) -> float:
+        """Seconds until an open circuit admits a trial call, 0 otherwise."""
+        if self.state is not CircuitState.OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self._open_for - self.clock())
+
+    def available(self) -> bool:
+        """Check whether a call could be admitted now, without reserving a trial."""
+        state = self.state
+        if state is CircuitState.CLOSED:
+            return True
+        if state is CircuitState.OPEN:
+            return False
+        return self._trials < self.half_open_max_calls or self._trial_expired()
+
+    def allow(self) -> bool:
+        """Admit a call, reserving a trial slot while half-open.
+
+        Returns:
+            True if the call may go ahead
+        """
+        if not self.available():
+            return False
+        if self._state is CircuitState.HALF_OPEN:
+            if self._trial_expired():
+                self._trials = 0
+            self._trials += 1
+            self._trial_started_at = self.clock()
+        return True
+
+    def release(self):
+        """Give back a trial slot of a call that ended without an outcome, e.g. cancelled."""
+        if self._state is CircuitState.HALF_OPEN:
+            self._trials = max(0, self._trials - 1)
+
+    def record_success(self) -> bool:
+        """Record a successful call.
+
+        Returns:
+            True if this closed the circuit
+        """
+        self.consecutive_failures = 0
+        if self._state is CircuitState.CLOSED:
+            return False
+        # Any success, including a late one from before the circuit opened, proves the provider works
+        self._state = CircuitState.CLOSED
+        self._trials = 0
+        self.trips = 0
+        return True
+
+    def record_failure(self) -> bool:
+        """Record a failed call.
+
+        Returns:
+            True if this opened the circuit
+        """
+        self.consecutive_failures += 1
+        state = self.state
+        if state is CircuitState.HALF_OPEN:
+            return self._open()
+        if state is CircuitState.CLOSED and 0 < self.failure_threshold <= self.consecutive_failures:
+            return self._open()
+        return False
+
+    def _open(self) -> bool:
+        """Open the circuit, doubling the cool-down for every trip since it last closed."""
+        self.trips += 1
+        self._state = CircuitState.OPEN
+        self._opened_at = self.clock()
+        self._open_for = min(self.max_cool_down, self.cool_down * 2 ** (self.trips - 1))
+        self._trials = 0
+        return True
+
+    def _trial_expired(self) -> bool:
+        """Check whether the running trials have been out for longer than a cool-down."""
+        return bool(self._trials) and self.clock() - self._trial_started_at >= self.cool_down
@@ -0,0 +1,136 @@
+"""Token budgeting for chat prompts."""
+
+from typing import Dict, List, Optional, Tuple
+
+# Tokens added per message for role and formatting
+MESSAGE_OVERHEAD = 4
+
+# Shortest useful remainder when truncating an older message
+MIN_TRUNCATED_TOKENS = 32
+
+TRUNCATION_MARKER = "[...] "
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a text.
+
+    Uses UTF-8 length / 4, which tracks BPE tokenizers closely for English and
+    errs on the safe side for other scripts, at a fraction of the cost.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Estimated token count
+    """
+    return (len(text.encode("utf-8")) + 3) // 4
+
+def estimate_message_tokens(messages: List[Dict[str, str]]) -> int:
+    """Estimate the number of tokens in a list of chat messages.
+
+    Args:
+        messages: Chat messages
+
+    Returns:
+        Estimated token count
+    """
+    return sum(estimate_tokens(msg.get("content", "")) + MESSAGE_OVERHEAD for msg in messages)
+
+def get_token_budget(model: str, budgets: Dict[str, int], default: int) -> int:
+    """Get the prompt token budget for a model.
+
+    Args:
+        model: Model name
+        budgets: Budgets by model name or name prefix
+        default: Budget for models without an entry
+
+    Returns:
+        Token budget
+    """
+    if model in budgets:
+        return budgets[model]
+
+    # Longest matching prefix, so "gpt-4o-mini" wins over "gpt-4"
+    matches = [prefix for prefix in budgets if model.startswith(prefix)]
+    if matches:
+        return budgets[max(matches, key=len)]
+    return default
+
+def fit_oldest_messages(messages: List[Dict[str, str]], budget: int) -> Tuple[List[Dict[str, str]], int]:
+    """Take the oldest chat messages that fit into a token budget.
+
+    Messages are taken in order until the next one does not fit. A message
+    longer than half the budget is truncated to that size (keeping its end),
+    so at least two messages are taken whenever there are two.
+
+    Args:
+        messages: Chat messages, oldest first
+        budget: Token budget
+
+    Returns:
+        Tuple of the taken messages (oldest first, as many as were taken from
+        the input) and their estimated tokens
+    """
+    taken: List[Dict[str, str]] = []
+    used = 0
+    for msg in messages:
+        if estimate_message_tokens([msg]) > budget // 2:
+            msg = _truncate(msg, budget // 2) or msg
+        tokens = estimate_message_tokens([msg])
+        if taken and used + tokens > budget:
+            break
+        taken.append(msg)
+        used += tokens
+    return taken, used
+
+def _truncate(message: Dict[str, str], max_tokens: int) -> Optional[Dict[str, str]]:
+    """Keep the end of a message so it fits in max_tokens."""
+    content_tokens = max_tokens - MESSAGE_OVERHEAD - estimate_tokens(TRUNCATION_MARKER)
+    if content_tokens < MIN_TRUNCATED_TOKENS:
+        return None
+
+    data = message.get("content", "").encode("utf-8")
+    tail = data[-content_tokens * 4:].decode("utf-8", errors="ignore")
+    return {**message, "content": TRUNCATION_MARKER + tail}
+
+def fit_messages(messages: List[Dict[str, str]], budget: int) -> Tuple[List[Dict[str, str]], int]:
+    """Fit chat messages into a token budget.
+
+    System messages and the newest message are always kept. Older messages
+    are added newest first while they fit; the first one that does not fit
+    is truncated to the remaining budget (keeping its end) and everything
+    older is dropped.
+
+    Args:
+        messages: Chat messages, oldest first
+        budget: Token budget
+
+    Returns:
+        Tuple of the fitted messages (oldest first) and their estimated tokens
+    """
+    if not messages:
+        return [], 0
+
+    system = [msg for msg in messages if msg.get("role") == "system"]
+    others = [msg for msg in messages if msg.get("role") != "system"]
+    if not others:
+        return system, estimate_message_tokens(system)
+
+    newest = others[-1]
+    used = estimate_message_tokens(system) + estimate_message_tokens([newest])
+
+    kept: List[Dict[str, str]] = []
+    for msg in reversed(others[:-1]):
+        tokens = estimate_message_tokens([msg])
+        if used + tokens <= budget:
+            kept.append(msg)
+            used += tokens
+            continue
+
+        truncated = _truncate(msg, budget - used)
+        if truncated is not None:
+            kept.append(truncated)
+            used += estimate_message_tokens([truncated])
+        break
+
+    kept.reverse()
+    return system + kept + [newest], used
@@ -0,0 +1,224 @@
+"""In-memory cookie store with per-provider cookie pools."""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from .helpers import create_dummy_cookies
+from .logging import logger
+
+# Pool used by providers without a pool of their own (and by Auto mode)
+DEFAULT_POOL = "*"
+
+class CookieSet(dict):
+    """Cookies for one account, tagged with a fingerprint of their content."""
+
+    __slots__ = ("fingerprint",)
+
+    def __init__(self, cookies: Dict[str, Any], fingerprint: str):
+        super().__init__(cookies)
+        self.fingerprint = fingerprint
+
+def _fingerprint(cookies: Dict[str, Any]) -> str:
+    """Identify a cookie set by its content, so it survives file reloads."""
+    payload = json.dumps(cookies, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+def _cookie_set(cookies: Any) -> Optional[CookieSet]:
+    """Build a cookie set from a JSON object, skipping anything else."""
+    if not isinstance(cookies, dict) or not cookies:
+        return None
+    cookies = {str(name): str(value) for name, value in cookies.items()}
+    return CookieSet(cookies, _fingerprint(cookies))
+
+def parse_cookie_pools(data: Any) -> Dict[str, List[CookieSet]]:
+    """Parse a cookie file into cookie pools by provider.
+
+    Accepted layouts:
+
+    * ``{"name": "value", ...}`` - one cookie set for every provider
+    * ``[{...}, {...}]`` - a pool of cookie sets for every provider
+    * ``{"Provider": {...} or [{...}, ...], "*": ...}`` - pools by provider
+      name, with ``"*"`` used for all other providers
+
+    Args:
+        data: Decoded JSON content
+
+    Returns:
+        Cookie sets by provider name
+    """
+    if isinstance(data, list):
+        entries = {DEFAULT_POOL: data}
+    elif isinstance(data, dict) and data and all(isinstance(value, (dict, list)) for value in data.values()):
+        entries = data
+    else:
+        entries = {DEFAULT_POOL: [data]}
+
+    pools = {}
+    for provider, sets in entries.items():
+        if isinstance(sets, dict):
+            sets = [sets]
+        pool = [cookie_set for cookie_set in map(_cookie_set, sets) if cookie_set is not None]
+        if pool:
+            pools[str(provider)] = pool
+    return pools
+
+class _CookieFile:
+    """Parsed cookie file and the file state it was parsed from."""
+
+    __slots__ = ("signature", "pools", "checked_at")
+
+    def __init__(self, signature, pools: Dict[str, List[CookieSet]], checked_at: float):
+        self.signature = signature
+        self.pools = pools
+        self.checked_at = checked_at
+
+class CookieStore:
+    """Keep parsed cookie files in memory and rotate through cookie pools.
+
+    A file is parsed once and re-parsed only when its modification time or
+    size changes; the file is checked at most every ``check_interval``
+    seconds. Each provider rotates round-robin through its pool so requests
+    are spread over accounts. A cookie set rejected as unauthorized
+    ``unauthorized_limit`` times in a row is retired until the file provides
+    a set with different content. Thread-safe.
+    """
+
+    def __init__(self, check_interval: float = 1.0, unauthorized_limit: int = 2):
+        """Initialize the store.
+
+        Args:
+            check_interval: Minimum seconds between checks of a file for changes
+            unauthorized_limit: Consecutive unauthorized errors that retire a cookie set
+        """
+        self.check_interval = check_interval
+        self.unauthorized_limit = unauthorized_limit
+        self._files: Dict[str, _CookieFile] = {}
+        self._cursors: Dict[tuple, int] = {}
+        self._failures: Dict[str, int] = {}
+        self._retired: Set[str] = set()
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def get(self, path: Optional[str], provider: str) -> Dict[str, str]:
+        """Get the next cookie set for a provider.
+
+        Args:
+            path: Cookie file path
+            provider: Provider name
+
+        Returns:
+            Cookie set, or dummy cookies if the file has none left to use
+        """
+        if not path:
+            return create_dummy_cookies()
+
+        pools = self._pools(path)
+        pool = pools.get(provider) or pools.get(DEFAULT_POOL) or []
+        with self._lock:
+            live = [cookie_set for cookie_set in pool if cookie_set.fingerprint not in self._retired]
+            if not live:
+                if pool:
+                    logger.warning(f"All cookie sets for provider '{provider}' in {path} are retired, using dummy cookies")
+                return create_dummy_cookies()
+
+            key = (path, provider)
+            index = self._cursors.get(key, 0)
+            self._cursors[key] = index + 1
+            return live[index % len(live)]
+
+    def record_success(self, cookies: Dict[str, str]):
+        """Reset the unauthorized count of a cookie set after a successful call.
+
+        Args:
+            cookies: Cookie set returned by ``get``
+        """
+        if isinstance(cookies, CookieSet) and cookies.fingerprint in self._failures:
+            with self._lock:
+                self._failures.pop(cookies.fingerprint, None)
+
+    def record_unauthorized(self, cookies: Dict[str, str], provider: str):
+        """Count an unauthorized error against a cookie set, retiring it at the limit.
+
+        Args:
+            cookies: Cookie set returned by ``get``
+            provider: Provider that rejected the cookies
+        """
+        if not isinstance(cookies, CookieSet):
+            return
+
+        with self._lock:
+            failures = self._failures.get(cookies.fingerprint, 0) + 1
+            self._failures[cookies.fingerprint] = failures
+            if failures < self.unauthorized_limit or cookies.fingerprint in self._retired:
+                return
+            self._retired.add(cookies.fingerprint)
+            del self._failures[cookies.fingerprint]
+        logger.warning(
+            f"Retired cookie set {cookies.fingerprint} after {failures} unauthorized errors from provider '{provider}'"
+        )
+
+    def _pools(self, path: str) -> Dict[str, List[CookieSet]]:
+        """Get the cookie pools of a file, reloading it if it changed."""
+        now = time.monotonic()
+        cached = self._files.get(path)
+        if cached is not None and now - cached.checked_at < self.check_interval:
+            return cached.pools
+
+        try:
+            stat = os.stat(path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            signature = None
+
+        if cached is not None and cached.signature == signature:
+            cached.checked_at = now
+            return cached.pools
+
+        pools = self._load(path) if signature is not None else {}
+        if pools is None:
+            # Unreadable, e.g. caught mid-write: keep serving the last good copy
+            if cached is None:
+                cached = _CookieFile(None, {}, now)
+                with self._lock:
+                    self._files[path] = cached
+            cached.checked_at = now
+            return cached.pools
+        if not pools:
+            logger.warning(f"No cookies found in {path}, using dummy cookies")
+        with self._lock:
+            self._files[path] = _CookieFile(signature, pools, now)
+            self.reloads += 1
+        return pools
+
+    def _load(self, path: str) -> Optional[Dict[str, List[CookieSet]]]:
+        """Read and parse a cookie file, returning None if it cannot be read."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                pools = parse_cookie_pools(json.load(f))
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Failed to load cookie file {path}: {e}")
+            return None
+
+        sets = sum(len(pool) for pool in pools.values())
+        logger.info(f"Loaded {sets} cookie sets for {len(pools)} pools from {path}")
+        return pools
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cookie store statistics.
+
+        Returns:
+            Dictionary with pool sizes by file and provider, retired sets and reloads
+        """
+        with self._lock:
+            return {
+                "files": {
+                    path: {provider: len(pool) for provider, pool in cached.pools.items()}
+                    for path, cached in self._files.items()
+                },
+                "retired": len(self._retired),
+                "reloads": self.reloads,
+            }
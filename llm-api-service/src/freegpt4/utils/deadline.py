@@ -0,0 +1,96 @@
+"""Per-request deadlines."""
+
+import math
+import time
+from typing import Callable, Optional
+
+from .exceptions import DeadlineExceededError, ValidationError
+
+class Deadline:
+    """Time budget of one request, shared by every stage working on it.
+
+    Stages clamp their own timeouts to the remaining budget with ``timeout``
+    and skip work the budget cannot cover. A deadline created without
+    ``seconds`` never expires.
+    """
+
+    __slots__ = ("seconds", "expires_at", "clock")
+
+    def __init__(self, seconds: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        """Start the budget now.
+
+        Args:
+            seconds: Budget in seconds, None for no deadline
+            clock: Monotonic time source
+        """
+        self.seconds = seconds
+        self.clock = clock
+        self.expires_at = math.inf if seconds is None else clock() + seconds
+
+    @classmethod
+    def from_header(cls, value: Optional[str], default: float, maximum: float) -> "Deadline":
+        """Build a request deadline from an ``X-Request-Timeout`` header.
+
+        Args:
+            value: Header value in seconds, or None if the header is absent
+            default: Budget without the header (0 for no deadline)
+            maximum: Largest budget a client may ask for
+
+        Returns:
+            Deadline starting now
+
+        Raises:
+            ValidationError: If the header is not a positive number
+        """
+        if value is None or not value.strip():
+            return cls(default or None)
+        try:
+            seconds = float(value)
+        except ValueError:
+            raise ValidationError("X-Request-Timeout must be a number of seconds")
+        if not 0 < seconds < math.inf:
+            raise ValidationError("X-Request-Timeout must be a positive number of seconds")
+        return cls(min(seconds, maximum))
+
+    def remaining(self) -> float:
+        """Get the seconds left, infinite without a deadline."""
+        return max(0.0, self.expires_at - self.clock())
+
+    @property
+    def expired(self) -> bool:
+        """Check whether the budget is spent."""
+        return self.clock() >= self.expires_at
+
+    def allows(self, seconds: float) -> bool:
+        """Check whether the remaining budget covers a stage of the given length."""
+        return self.remaining() > seconds
+
+    def timeout(self, limit: Optional[float] = None) -> Optional[float]:
+        """Clamp a stage timeout to the remaining budget.
+
+        Args:
+            limit: Stage timeout in seconds, None for none
+
+        Returns:
+            The smaller of the limit and the remaining budget, None if both are unbounded
+
+        Raises:
+            DeadlineExceededError: If the budget is already spent
+        """
+        self.check()
+        remaining = self.remaining()
+        if limit is None:
+            return None if remaining == math.inf else remaining
+        return min(limit, remaining)
+
+    def check(self):
+        """Raise if the budget is spent.
+
+        Raises:
+            DeadlineExceededError: If the budget is already spent
+        """
+        if self.expired:
+            raise DeadlineExceededError(f"Request did not complete within its {self.seconds:g}s deadline")
+
+# Shared default for callers without a deadline; it never expires, so it is safe to share
+NO_DEADLINE = Deadline()
@@ -0,0 +1,123 @@
+"""Long-lived asyncio event loop shared by synchronous request handlers."""
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, AsyncIterator, Awaitable, Iterator, Optional
+
+from .logging import logger
+
+class BackgroundEventLoop:
+    """Run coroutines on a single event loop owned by a daemon thread.
+
+    Flask views are synchronous, so each request used to create and close its
+    own loop. Submitting the async work here instead lets every in-flight
+    request share one loop, so concurrent provider calls interleave.
+    """
+
+    def __init__(self, name: str = "freegpt4-loop"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Get the shared loop, starting its thread on first use."""
+        if not self.is_running:
+            with self._lock:
+                if not self.is_running:
+                    self._start()
+        return self._loop
+
+    @property
+    def is_running(self) -> bool:
+        """Check whether the loop thread is alive."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def _start(self):
+        """Start the loop in a daemon thread and wait until it runs."""
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run_loop():
+            asyncio.set_event_loop(loop)
+            loop.call_soon(ready.set)
+            loop.run_forever()
+
+        thread = threading.Thread(target=run_loop, name=self.name, daemon=True)
+        thread.start()
+        ready.wait()
+
+        self._loop = loop
+        self._thread = thread
+        logger.debug(f"Background event loop '{self.name}' started")
+
+    def run(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the shared loop and wait for its result.
+
+        Args:
+            coro: Coroutine to run
+            timeout: Maximum seconds to wait, None to wait forever
+
+        Returns:
+            The coroutine result
+
+        Raises:
+            TimeoutError: If the timeout expires (the coroutine is cancelled)
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Coroutine did not finish within {timeout} seconds")
+
+    def iterate(self, agen: AsyncIterator[Any]) -> Iterator[Any]:
+        """Consume an async iterator from synchronous code.
+
+        Items are pulled one at a time, so a slow consumer (such as a client
+        reading a streamed response) also slows the producer down. Closing
+        the returned iterator closes the async iterator on the loop.
+
+        Args:
+            agen: Async iterator to consume
+
+        Yields:
+            Items produced by the async iterator
+        """
+        done = object()
+
+        async def next_item():
+            try:
+                return await agen.__anext__()
+            except StopAsyncIteration:
+                return done
+
+        async def close():
+            if hasattr(agen, "aclose"):
+                await agen.aclose()
+
+        try:
+            while True:
+                item = self.run(next_item())
+                if item is done:
+                    return
+                yield item
+        finally:
+            self.run(close())
+
+    def shutdown(self, timeout: float = 5.0):
+        """Stop the loop and wait for its thread to exit."""
+        with self._lock:
+            if not self.is_running:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+            logger.debug(f"Background event loop '{self.name}' stopped")
+
+# Global background loop instance
+background_loop = BackgroundEventLoop()
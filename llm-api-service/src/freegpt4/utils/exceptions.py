@@ -31,3 +31,7 @@ class AIProviderError(FreeGPTException):
 class FileUploadError(FreeGPTException):
     """File upload error."""
     pass
+
+class DeadlineExceededError(AIProviderError):
+    """Request deadline exceeded before a provider answered."""
+    pass
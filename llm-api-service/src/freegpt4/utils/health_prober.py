@@ -0,0 +1,150 @@
+"""Background health probing of providers."""
+
+import asyncio
+import concurrent.futures
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from .logging import logger
+from .provider_monitor import ProviderMonitor
+
+class HealthProber:
+    """Probe providers in the background so routing starts from warm data.
+
+    Every provider is probed once when the prober starts, then about every
+    ``interval`` seconds, randomized by ``jitter`` so probes of different
+    providers (and server instances) do not line up. A provider that served
+    live calls since its last probe is skipped for that round, as the live
+    calls already keep its health current. At most ``concurrency`` probes
+    run at once. The probe itself records its outcome in the monitor.
+    """
+
+    def __init__(
+        self,
+        probe: Callable[..., Awaitable[bool]],
+        providers: Callable[[], Iterable[str]],
+        monitor: ProviderMonitor,
+        interval: float = 300.0,
+        jitter: float = 0.2,
+        concurrency: int = 3,
+        rng: Optional[random.Random] = None
+    ):
+        """Initialize the prober.
+
+        Args:
+            probe: Coroutine function probing one provider by name, returning success
+            providers: Callable returning the provider names to probe
+            monitor: Provider monitor, used to detect live traffic
+            interval: Mean seconds between probes of a provider
+            jitter: Relative random spread of the interval, between 0 and 1
+            concurrency: Maximum probes running at once
+            rng: Random generator, for reproducible schedules
+        """
+        self.probe = probe
+        self.providers = providers
+        self.monitor = monitor
+        self.interval = interval
+        self.jitter = jitter
+        self.concurrency = concurrency
+        self.rng = rng or random.Random()
+        self.probe_kwargs: Dict[str, Any] = {}
+        self._due: Dict[str, float] = {}
+        self._seen: Dict[str, Optional[float]] = {}
+        self._future: Optional[concurrent.futures.Future] = None
+        self.probes = 0
+        self.failures = 0
+        self.skipped = 0
+
+    @property
+    def is_running(self) -> bool:
+        """Check whether the probing loop is running."""
+        return self._future is not None and not self._future.done()
+
+    def start(self, loop: asyncio.AbstractEventLoop, **probe_kwargs):
+        """Start probing on a running event loop, from any thread.
+
+        Args:
+            loop: Running event loop
+            **probe_kwargs: Extra keyword arguments for every probe call
+        """
+        if self.is_running:
+            return
+        self.probe_kwargs = probe_kwargs
+        self._future = asyncio.run_coroutine_threadsafe(self.run(), loop)
+        logger.info(f"Provider health probing started (every ~{self.interval:.0f}s, {self.concurrency} at once)")
+
+    def stop(self):
+        """Stop the probing loop."""
+        if self._future is not None:
+            self._future.cancel()
+            self._future = None
+
+    async def run(self):
+        """Probe due providers until cancelled."""
+        while True:
+            try:
+                await self.probe_due()
+            except Exception as e:
+                logger.error(f"Provider probing round failed: {e}")
+            next_due = min(self._due.values(), default=time.monotonic() + self.interval)
+            await asyncio.sleep(max(1.0, next_due - time.monotonic()))
+
+    async def probe_due(self) -> int:
+        """Probe every provider whose probe is due.
+
+        Returns:
+            Number of providers probed
+        """
+        now = time.monotonic()
+        due = []
+        for provider_name in self.providers():
+            if self._due.get(provider_name, now) > now:
+                continue
+            self._due[provider_name] = now + self._next_interval()
+            activity = self.monitor.get_last_activity(provider_name)
+            if provider_name in self._seen and activity != self._seen[provider_name]:
+                # Live calls since the last probe already tell us how the provider is doing
+                self._seen[provider_name] = activity
+                self.skipped += 1
+                continue
+            due.append(provider_name)
+
+        if due:
+            semaphore = asyncio.Semaphore(self.concurrency)
+            await asyncio.gather(*(self._probe(provider_name, semaphore) for provider_name in due))
+        return len(due)
+
+    async def _probe(self, provider_name: str, semaphore: asyncio.Semaphore):
+        """Probe one provider, counting the outcome."""
+        async with semaphore:
+            try:
+                success = await self.probe(provider_name, **self.probe_kwargs)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Probe of provider {provider_name} raised: {e}")
+                success = False
+            self.probes += 1
+            if not success:
+                self.failures += 1
+            self._seen[provider_name] = self.monitor.get_last_activity(provider_name)
+            logger.debug(f"Probe of provider {provider_name}: {'ok' if success else 'failed'}")
+
+    def _next_interval(self) -> float:
+        """Draw the delay until the next probe of a provider."""
+        return self.interval * self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get probing statistics.
+
+        Returns:
+            Dictionary with probe, failure and skip counts
+        """
+        return {
+            "running": self.is_running,
+            "interval": self.interval,
+            "probes": self.probes,
+            "failures": self.failures,
+            "skipped": self.skipped,
+        }
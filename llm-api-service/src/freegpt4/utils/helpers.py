@@ -144,6 +144,35 @@ def create_dummy_cookies() -> Dict[str, str]:
     """
     return {"dummy": "value"}
 
+def parse_bool(value: Any) -> bool:
+    """Parse a boolean flag from a query string, form field or JSON value.
+    
+    Args:
+        value: Raw flag value
+        
+    Returns:
+        True for true-like values ("1", "true", "yes", "on"), False otherwise
+    """
+    if isinstance(value, bool):
+        return value
+    if value is None:
+        return False
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+def format_sse_event(data: Any, event: Optional[str] = None) -> str:
+    """Format a Server-Sent Events message.
+    
+    Args:
+        data: Event payload, JSON-encoded unless it is already a string
+        event: Optional event name
+        
+    Returns:
+        SSE message terminated by a blank line
+    """
+    payload = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False)
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {payload}\n\n"
+
 def safe_filename(filename: str) -> str:
     """Create a safe filename by removing dangerous characters.
     
@@ -5,7 +5,9 @@ import time
 from typing import Optional, Dict, Any, Callable, Awaitable
 from functools import wraps
 
+from .deadline import Deadline, NO_DEADLINE
 from .logging import logger
+from .provider_errors import ErrorClass, classify_error
 
 class TimeoutConfig:
     """Configuration for timeouts and retries."""
@@ -16,6 +18,7 @@ class TimeoutConfig:
     MAX_RETRIES = 3       # Maximum number of retries
     RETRY_DELAY = 2       # Delay between retries in seconds
     BACKOFF_FACTOR = 2    # Exponential backoff factor
+    MAX_RETRY_AFTER = 5   # Longest Retry-After delay worth waiting for before falling back
 
 def timeout_handler(timeout_seconds: float = TimeoutConfig.DEFAULT_TIMEOUT):
     """Decorator to add timeout handling to async functions."""
@@ -72,49 +75,67 @@ async def safe_api_call(
     *args,
     timeout: float = TimeoutConfig.DEFAULT_TIMEOUT,
     max_retries: int = TimeoutConfig.MAX_RETRIES,
+    deadline: Deadline = NO_DEADLINE,
+    proxied: bool = False,
+    max_retry_after: float = TimeoutConfig.MAX_RETRY_AFTER,
     **kwargs
 ) -> Optional[Any]:
     """Safely call an API function with timeout and retry logic.
     
+    Failures are classified and only retried where that can help: after a
+    short Retry-After delay sent with a rate limit or server error, or at
+    once through another proxy after a network error or block (``api_func``
+    picks the proxy on every call). Everything else gives up right away so
+    the caller can fall back to another provider. Each attempt is limited to
+    the remaining request budget, and a retry is skipped when the budget
+    would run out during its delay.
+    
     Args:
         api_func: The async function to call
         *args: Positional arguments for the function
         timeout: Timeout in seconds
         max_retries: Maximum number of retries
+        deadline: Request deadline
+        proxied: Whether calls go through a proxy that can be swapped on retry
+        max_retry_after: Longest Retry-After delay worth waiting for
         **kwargs: Keyword arguments for the function
         
     Returns:
-        The result of the API call or None if all attempts failed
+        Result of the function call or None if failed
+        
+    Raises:
+        Exception: Unauthorized errors are re-raised so the caller can act on
+            the credentials that caused them
     """
-    current_delay = TimeoutConfig.RETRY_DELAY
-    
     for attempt in range(max_retries + 1):
+        if deadline.expired:
+            logger.warning("API call abandoned, the request deadline has passed")
+            break
         try:
-            return await asyncio.wait_for(api_func(*args, **kwargs), timeout=timeout)
-        except asyncio.TimeoutError:
-            logger.warning(f"API call timed out (attempt {attempt + 1}/{max_retries + 1})")
+            return await asyncio.wait_for(api_func(*args, **kwargs), timeout=min(timeout, deadline.remaining()))
         except Exception as e:
-            error_msg = str(e).lower()
-            
-            # Check for specific error types
-            if "401" in error_msg or "unauthorized" in error_msg:
-                logger.warning(f"API call returned unauthorized error: {e}")
-                return None  # Don't retry auth errors
-            elif "chrome" in error_msg or "browser" in error_msg:
-                logger.warning(f"API call requires browser: {e}")
-                return None  # Don't retry browser errors
-            elif "too slow" in error_msg or "timeout" in error_msg:
-                logger.warning(f"API call connection timeout (attempt {attempt + 1}/{max_retries + 1}): {e}")
-            else:
-                logger.warning(f"API call failed (attempt {attempt + 1}/{max_retries + 1}): {e}")
+            error = classify_error(e)
+            logger.warning(
+                f"API call failed with {error.error_class.value} error (attempt {attempt + 1}/{max_retries + 1}): {e}"
+            )
+            if error.error_class is ErrorClass.UNAUTHORIZED:
+                raise  # Don't retry auth errors
+            delay = error.retry_delay(proxied, max_retry_after)
         
-        # Don't wait after the last attempt
-        if attempt < max_retries:
-            logger.info(f"Retrying in {current_delay} seconds...")
-            await asyncio.sleep(current_delay)
-            current_delay *= TimeoutConfig.BACKOFF_FACTOR
+        # Don't wait after the last attempt, for errors a retry cannot fix, or when the deadline would pass
+        if attempt == max_retries:
+            break
+        if delay is None:
+            logger.info(f"Not retrying {error.error_class.value} error ({error.action.value})")
+            break
+        if not deadline.allows(delay):
+            logger.warning("Not retrying API call, the request deadline is too close")
+            break
+        if delay:
+            logger.info(f"Retrying in {delay:g} seconds...")
+            await asyncio.sleep(delay)
     
-    logger.error(f"API call failed after {max_retries + 1} attempts")
+    logger.error(f"API call failed after {attempt + 1} attempt(s)")
     return None
 
 def configure_g4f_timeouts():
@@ -0,0 +1,207 @@
+"""Classification of provider errors and their retry policies."""
+
+import re
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from enum import Enum
+from typing import Any, Optional
+
+class ErrorClass(Enum):
+    """Kind of provider failure; the value is the error type shown in the monitor."""
+    RATE_LIMITED = "rate_limited"
+    UNAUTHORIZED = "unauthorized"
+    BLOCKED = "blocked"                          # Anti-bot wall in front of the provider
+    MODEL_NOT_SUPPORTED = "model_not_supported"
+    STREAM_NOT_SUPPORTED = "stream_not_supported"  # Retried without streaming by the caller
+    BROWSER_REQUIRED = "browser_required"
+    TIMEOUT = "timeout"
+    NETWORK = "network"
+    SERVER_ERROR = "server_error"
+    UNKNOWN = "unknown"
+
+class RetryAction(Enum):
+    """What to do with the provider after a failed call."""
+    SKIP = "skip"                  # Fall back to the next provider right away
+    RETRY_AFTER = "retry_after"    # Retry once the server's Retry-After delay has passed, if it sent a short one
+    SWITCH_PROXY = "switch_proxy"  # Retry at once through another proxy
+
+# Retry policy of each error class
+RETRY_ACTIONS = {
+    ErrorClass.RATE_LIMITED: RetryAction.RETRY_AFTER,
+    ErrorClass.UNAUTHORIZED: RetryAction.SKIP,
+    ErrorClass.BLOCKED: RetryAction.SWITCH_PROXY,
+    ErrorClass.MODEL_NOT_SUPPORTED: RetryAction.SKIP,
+    ErrorClass.STREAM_NOT_SUPPORTED: RetryAction.SKIP,
+    ErrorClass.BROWSER_REQUIRED: RetryAction.SKIP,
+    ErrorClass.TIMEOUT: RetryAction.SKIP,
+    ErrorClass.NETWORK: RetryAction.SWITCH_PROXY,
+    ErrorClass.SERVER_ERROR: RetryAction.RETRY_AFTER,
+    ErrorClass.UNKNOWN: RetryAction.SKIP,
+}
+
+# Error classes that count against the proxy the call went through
+PROXY_FAULTS = {ErrorClass.BLOCKED, ErrorClass.NETWORK, ErrorClass.TIMEOUT}
+
+# Exception class names (g4f, aiohttp, curl_cffi and builtins), matched along the MRO
+EXCEPTION_CLASSES = {
+    "RateLimitError": ErrorClass.RATE_LIMITED,
+    "ConversationLimitError": ErrorClass.RATE_LIMITED,
+    "MissingAuthError": ErrorClass.UNAUTHORIZED,
+    "NoValidHarFileError": ErrorClass.UNAUTHORIZED,
+    "PaymentRequiredError": ErrorClass.UNAUTHORIZED,
+    "CloudflareError": ErrorClass.BLOCKED,
+    "ModelNotFoundError": ErrorClass.MODEL_NOT_SUPPORTED,
+    "ModelNotSupportedError": ErrorClass.MODEL_NOT_SUPPORTED,
+    "ModelNotAllowedError": ErrorClass.MODEL_NOT_SUPPORTED,
+    "StreamNotSupportedError": ErrorClass.STREAM_NOT_SUPPORTED,
+    "MissingRequirementsError": ErrorClass.BROWSER_REQUIRED,
+    "ServerTimeoutError": ErrorClass.TIMEOUT,
+    "ConnectionTimeoutError": ErrorClass.TIMEOUT,
+    "SocketTimeoutError": ErrorClass.TIMEOUT,
+    "Timeout": ErrorClass.TIMEOUT,
+    "TimeoutError": ErrorClass.TIMEOUT,
+    "ProxyError": ErrorClass.NETWORK,
+    "ClientConnectionError": ErrorClass.NETWORK,
+    "ConnectionError": ErrorClass.NETWORK,
+    "ProviderNotWorkingError": ErrorClass.SERVER_ERROR,
+}
+
+# Last resort for exceptions that carry nothing but a message, checked in order
+MESSAGE_PATTERNS = [
+    (re.compile(r"unauthori[sz]ed|forbidden|invalid (api )?key"), ErrorClass.UNAUTHORIZED),
+    (re.compile(r"rate.?limit|too many requests|quota"), ErrorClass.RATE_LIMITED),
+    (re.compile(r"cloudflare|captcha"), ErrorClass.BLOCKED),
+    (re.compile(r"chrome|browser"), ErrorClass.BROWSER_REQUIRED),
+    (re.compile(r"stream(ing)?\b.*not supported|(does not|doesn't) support stream"), ErrorClass.STREAM_NOT_SUPPORTED),
+    (re.compile(r"model.*not (supported|found|available)"), ErrorClass.MODEL_NOT_SUPPORTED),
+    (re.compile(r"timeout|timed out|too slow"), ErrorClass.TIMEOUT),
+    (re.compile(r"connection|network|proxy"), ErrorClass.NETWORK),
+]
+
+# HTTP status in messages such as g4f's "Response 429: ..." or "500 error"
+STATUS_PATTERN = re.compile(r"\b(?:(?:response|status|error|http)[ :]+([45]\d\d)\b|([45]\d\d) error)")
+
+@dataclass(frozen=True)
+class ProviderError:
+    """A classified provider failure."""
+    error_class: ErrorClass
+    status: Optional[int] = None        # HTTP status, if the error carried one
+    retry_after: Optional[float] = None  # Seconds the server asked us to wait
+
+    @property
+    def action(self) -> RetryAction:
+        """Retry policy for this failure."""
+        return RETRY_ACTIONS[self.error_class]
+
+    @property
+    def proxy_fault(self) -> bool:
+        """Check whether the failure counts against the proxy the call went through."""
+        return self.error_class in PROXY_FAULTS
+
+    def retry_delay(self, proxied: bool, max_retry_after: float) -> Optional[float]:
+        """Get how long to wait before calling the same provider again.
+
+        Args:
+            proxied: Whether the call went through a proxy that can be swapped
+            max_retry_after: Longest Retry-After delay worth waiting for
+
+        Returns:
+            Delay in seconds, or None to move on to the next provider
+        """
+        action = self.action
+        if action is RetryAction.SWITCH_PROXY:
+            return 0.0 if proxied else None
+        if action is RetryAction.RETRY_AFTER and self.retry_after is not None and self.retry_after <= max_retry_after:
+            return self.retry_after
+        return None
+
+def classify_error(error: BaseException) -> ProviderError:
+    """Classify an exception raised by a provider call.
+
+    The exception's class (and its bases) decide first, then an HTTP status
+    attached to it or to its response, then its message.
+
+    Args:
+        error: Raised exception
+
+    Returns:
+        Classified error with status and Retry-After delay when available
+    """
+    status = _status_of(error)
+    retry_after = _retry_after_of(error)
+
+    for cls in type(error).__mro__:
+        error_class = EXCEPTION_CLASSES.get(cls.__name__)
+        if error_class is not None:
+            return ProviderError(error_class, status, retry_after)
+
+    message = str(error).lower()
+    if status is None:
+        match = STATUS_PATTERN.search(message)
+        status = int(match.group(1) or match.group(2)) if match else None
+    if status is not None:
+        error_class = _status_class(status, message)
+        if error_class is not None:
+            return ProviderError(error_class, status, retry_after)
+
+    for pattern, error_class in MESSAGE_PATTERNS:
+        if pattern.search(message):
+            return ProviderError(error_class, status, retry_after)
+    return ProviderError(ErrorClass.UNKNOWN, status, retry_after)
+
+def _status_class(status: int, message: str) -> Optional[ErrorClass]:
+    """Map an HTTP status to an error class, None if it says nothing specific."""
+    if status == 429:
+        return ErrorClass.RATE_LIMITED
+    if status == 403 and ("cloudflare" in message or "captcha" in message):
+        return ErrorClass.BLOCKED
+    if status in (401, 402, 403):
+        return ErrorClass.UNAUTHORIZED
+    if status in (408, 504, 524):
+        return ErrorClass.TIMEOUT
+    if status >= 500:
+        return ErrorClass.SERVER_ERROR
+    return None
+
+def _response_of(error: BaseException) -> Any:
+    """Get the HTTP response attached to an exception, if any."""
+    return getattr(error, "response", None)
+
+def _status_of(error: BaseException) -> Optional[int]:
+    """Get the HTTP status attached to an exception (aiohttp, curl_cffi, requests style)."""
+    for source in (error, _response_of(error)):
+        for attr in ("status", "status_code"):
+            value = getattr(source, attr, None)
+            if isinstance(value, int) and 100 <= value < 600:
+                return value
+    return None
+
+def _retry_after_of(error: BaseException) -> Optional[float]:
+    """Get the Retry-After delay in seconds from an exception's response headers."""
+    for source in (error, _response_of(error)):
+        headers = getattr(source, "headers", None)
+        if hasattr(headers, "get"):
+            value = headers.get("Retry-After") or headers.get("retry-after")
+            if value:
+                return parse_retry_after(str(value))
+    return None
+
+def parse_retry_after(value: str) -> Optional[float]:
+    """Parse a Retry-After header, given in seconds or as an HTTP date.
+
+    Args:
+        value: Header value
+
+    Returns:
+        Seconds to wait, None if the value cannot be parsed
+    """
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
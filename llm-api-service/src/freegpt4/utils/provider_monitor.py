@@ -1,12 +1,127 @@
 """Provider health monitoring and management."""
 
+import random
+import threading
 import time
-from typing import Dict, List, Optional, Set
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
+from .bulkhead import Bulkhead
+from .circuit_breaker import CircuitBreaker, CircuitState
 from .logging import logger
 
+# Number of recent latency samples kept per provider
+LATENCY_SAMPLES = 128
+
+# Success rates and error types cover the last hour, in one-minute buckets
+OUTCOME_BUCKET_SECONDS = 60
+OUTCOME_BUCKETS = 60
+
+# Error types that signal an overloaded provider and shrink its concurrency limit
+OVERLOAD_ERROR_TYPES = {"rate_limited", "timeout"}
+
+class LatencyWindow:
+    """Ring buffer of the most recent latency samples.
+    
+    Samples live in a preallocated ``array``; the sorted view used for
+    percentile queries is built once per change and reused.
+    """
+    
+    __slots__ = ("_samples", "_next", "_count", "_sorted")
+    
+    def __init__(self, size: int = LATENCY_SAMPLES):
+        self._samples = array("d", bytes(8 * size))
+        self._next = 0
+        self._count = 0
+        self._sorted: Optional[List[float]] = None
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def add(self, value: float):
+        """Add a sample, replacing the oldest one when full."""
+        self._samples[self._next] = value
+        self._next = (self._next + 1) % len(self._samples)
+        self._count = min(self._count + 1, len(self._samples))
+        self._sorted = None
+    
+    def percentile(self, percentile: float) -> Optional[float]:
+        """Get a percentile (0-100) of the samples, or None without samples."""
+        if not self._count:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self._samples[:self._count])
+        ordered = self._sorted
+        index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+        return ordered[index]
+    
+    def sample(self, rng: random.Random) -> Optional[float]:
+        """Draw one of the stored samples at random, or None without samples."""
+        if not self._count:
+            return None
+        return self._samples[rng.randrange(self._count)]
+    
+    def mean(self) -> Optional[float]:
+        """Get the mean of the samples, or None without samples."""
+        if not self._count:
+            return None
+        return sum(self._samples[:self._count]) / self._count
+    
+    def percentiles(self, percentiles: Iterable[float] = (50, 95, 99)) -> Dict[str, Optional[float]]:
+        """Get several percentiles in milliseconds, keyed like ``p95``."""
+        values = {}
+        for p in percentiles:
+            value = self.percentile(p)
+            values[f"p{p:g}"] = round(value * 1000) if value is not None else None
+        return values
+
+class OutcomeWindow:
+    """Success and failure counts over a sliding time window.
+    
+    Counts are kept in fixed time buckets, each tagged with the bucket
+    number it was last used for, so stale buckets are ignored and reused
+    without a cleanup pass.
+    """
+    
+    __slots__ = ("bucket_seconds", "clock", "_epochs", "_successes", "_failures")
+    
+    def __init__(
+        self,
+        buckets: int = OUTCOME_BUCKETS,
+        bucket_seconds: float = OUTCOME_BUCKET_SECONDS,
+        clock: Callable[[], float] = time.time
+    ):
+        self.bucket_seconds = bucket_seconds
+        self.clock = clock
+        self._epochs = array("q", [-1] * buckets)
+        self._successes = array("l", bytes(array("l").itemsize * buckets))
+        self._failures = array("l", bytes(array("l").itemsize * buckets))
+    
+    def add(self, success: bool, now: Optional[float] = None):
+        """Count one call outcome."""
+        epoch = int((self.clock() if now is None else now) // self.bucket_seconds)
+        slot = epoch % len(self._epochs)
+        if self._epochs[slot] != epoch:
+            self._epochs[slot] = epoch
+            self._successes[slot] = 0
+            self._failures[slot] = 0
+        if success:
+            self._successes[slot] += 1
+        else:
+            self._failures[slot] += 1
+    
+    def counts(self, now: Optional[float] = None) -> Tuple[int, int]:
+        """Get (successes, failures) within the window."""
+        oldest = int((self.clock() if now is None else now) // self.bucket_seconds) - len(self._epochs) + 1
+        successes = failures = 0
+        for slot, epoch in enumerate(self._epochs):
+            if epoch >= oldest:
+                successes += self._successes[slot]
+                failures += self._failures[slot]
+        return successes, failures
+
 class ProviderStatus(Enum):
     """Provider health status."""
     HEALTHY = "healthy"
@@ -24,19 +139,44 @@ class ProviderHealth:
     last_success: Optional[float] = None
     last_failure: Optional[float] = None
     consecutive_failures: int = 0
-    error_types: Set[str] = None
+    error_types: Dict[str, float] = None  # Error type -> last seen
+    first_token_latencies: LatencyWindow = None
+    total_latencies: LatencyWindow = None
+    chunk_gaps: LatencyWindow = None  # Longest wait between chunks, per streamed call
+    outcomes: OutcomeWindow = None
+    breaker: CircuitBreaker = None
+    bulkhead: Bulkhead = None
     
     def __post_init__(self):
         if self.error_types is None:
-            self.error_types = set()
+            self.error_types = {}
+        if self.first_token_latencies is None:
+            self.first_token_latencies = LatencyWindow()
+        if self.total_latencies is None:
+            self.total_latencies = LatencyWindow()
+        if self.chunk_gaps is None:
+            self.chunk_gaps = LatencyWindow()
+        if self.outcomes is None:
+            self.outcomes = OutcomeWindow()
+        if self.breaker is None:
+            self.breaker = CircuitBreaker()
+        if self.bulkhead is None:
+            self.bulkhead = Bulkhead()
     
     @property
     def success_rate(self) -> float:
-        """Calculate success rate."""
-        total = self.success_count + self.failure_count
+        """Calculate success rate over the recent window."""
+        successes, failures = self.outcomes.counts()
+        total = successes + failures
         if total == 0:
             return 0.0
-        return self.success_count / total
+        return successes / total
+    
+    @property
+    def recent_error_types(self) -> List[str]:
+        """Error types seen within the recent window."""
+        cutoff = self.outcomes.clock() - OUTCOME_BUCKETS * OUTCOME_BUCKET_SECONDS
+        return [error_type for error_type, seen in self.error_types.items() if seen >= cutoff]
     
     @property
     def is_reliable(self) -> bool:
@@ -49,56 +189,292 @@ class ProviderHealth:
         if self.last_success is None:
             return False
         
-        return (time.time() - self.last_success) < 3600  # 1 hour
+        return (self.outcomes.clock() - self.last_success) < 3600  # 1 hour
     
     def update_status(self):
         """Update status based on current metrics."""
+        successes, failures = self.outcomes.counts()
+        if not successes + failures:
+            # Without recent calls the provider is unknown again, not penalized,
+            # and an old failure streak no longer says anything about it
+            self.consecutive_failures = 0
+            self.status = ProviderStatus.UNKNOWN
+            return
+        
+        success_rate = successes / (successes + failures)
         if self.consecutive_failures >= 5:
             self.status = ProviderStatus.UNHEALTHY
-        elif self.consecutive_failures >= 3 or self.success_rate < 0.5:
+        elif self.consecutive_failures >= 3 or success_rate < 0.5:
             self.status = ProviderStatus.DEGRADED
-        elif self.success_rate >= 0.7:
+        elif success_rate >= 0.7:
             self.status = ProviderStatus.HEALTHY
         else:
             self.status = ProviderStatus.UNKNOWN
 
 class ProviderMonitor:
-    """Monitor and manage provider health."""
+    """Monitor and manage provider health.
+    
+    Updates and queries are serialized with a lock, since request threads
+    and the event loop record outcomes concurrently. Every provider has a
+    circuit breaker fed by the recorded outcomes; callers ask
+    ``allow_request`` before calling a provider. Every provider also has a
+    bulkhead capping its calls in flight, whose limit follows the recorded
+    outcomes: successes raise it, rate limits and timeouts cut it.
+    """
     
-    def __init__(self):
+    def __init__(self, clock: Callable[[], float] = time.time):
+        """Initialize the monitor.
+        
+        Args:
+            clock: Wall clock, replaceable for simulations
+        """
         self.providers: Dict[str, ProviderHealth] = {}
-        self.blacklisted_providers: Set[str] = {
-            "Chatai",  # Known to return 401 errors
-            "OpenaiChat",  # Requires Chrome browser
-        }
+        self._clock = clock
+        self._lock = threading.RLock()
+        self.breaker_settings: Dict[str, Any] = {}
+        self.bulkhead_settings: Dict[str, Any] = {}
+    
+    def configure_circuit_breakers(self, **settings):
+        """Set circuit breaker parameters for all providers.
+        
+        Args:
+            **settings: ``CircuitBreaker`` arguments such as ``failure_threshold``
+                and ``cool_down``
+        """
+        with self._lock:
+            self.breaker_settings = dict(settings)
+            for health in self.providers.values():
+                for name, value in settings.items():
+                    setattr(health.breaker, name, value)
+    
+    def configure_bulkheads(self, **settings):
+        """Set concurrency limit parameters for all providers.
+        
+        Args:
+            **settings: ``Bulkhead`` arguments such as ``initial_limit`` and
+                ``max_queue``; providers already seen keep their current limit
+        """
+        with self._lock:
+            self.bulkhead_settings = dict(settings)
+            for health in self.providers.values():
+                for name, value in settings.items():
+                    if name != "initial_limit":
+                        setattr(health.bulkhead, name, value)
     
     def get_provider_health(self, provider_name: str) -> ProviderHealth:
         """Get health information for a provider."""
-        if provider_name not in self.providers:
-            self.providers[provider_name] = ProviderHealth(name=provider_name)
-        return self.providers[provider_name]
+        health = self.providers.get(provider_name)
+        if health is None:
+            with self._lock:
+                health = self.providers.get(provider_name)
+                if health is None:
+                    health = self.providers[provider_name] = ProviderHealth(
+                        name=provider_name,
+                        outcomes=OutcomeWindow(clock=self._clock),
+                        breaker=CircuitBreaker(clock=self._clock, **self.breaker_settings),
+                        bulkhead=Bulkhead(clock=self._clock, **self.bulkhead_settings)
+                    )
+        return health
     
-    def record_success(self, provider_name: str):
-        """Record a successful API call."""
+    def record_success(self, provider_name: str, probe: bool = False):
+        """Record a successful API call.
+        
+        Args:
+            provider_name: Provider name
+            probe: Whether the call was a health probe, which closes an open
+                circuit but says nothing about the provider's concurrency
+        """
         health = self.get_provider_health(provider_name)
-        health.success_count += 1
-        health.last_success = time.time()
-        health.consecutive_failures = 0
-        health.update_status()
+        with self._lock:
+            health.success_count += 1
+            health.last_success = self._clock()
+            health.consecutive_failures = 0
+            health.outcomes.add(True, health.last_success)
+            health.update_status()
+            closed = health.breaker.record_success()
+        if not probe:
+            health.bulkhead.record_success()
         
+        if closed:
+            logger.info(f"Provider {provider_name}: circuit closed after a successful call")
         logger.debug(f"Provider {provider_name}: success recorded (rate: {health.success_rate:.2f})")
     
-    def record_failure(self, provider_name: str, error_type: str = "unknown"):
-        """Record a failed API call."""
+    def record_failure(self, provider_name: str, error_type: str = "unknown", probe: bool = False):
+        """Record a failed API call.
+        
+        Args:
+            provider_name: Provider name
+            error_type: Error class of the failure
+            probe: Whether the call was a health probe, which only updates the
+                status: no user call failed, so the circuit and concurrency
+                limit are left alone
+        """
         health = self.get_provider_health(provider_name)
-        health.failure_count += 1
-        health.last_failure = time.time()
-        health.consecutive_failures += 1
-        health.error_types.add(error_type)
-        health.update_status()
+        with self._lock:
+            health.failure_count += 1
+            health.last_failure = self._clock()
+            health.consecutive_failures += 1
+            health.error_types[error_type] = health.last_failure
+            health.outcomes.add(False, health.last_failure)
+            health.update_status()
+            opened = not probe and health.breaker.record_failure()
+            retry_in = health.breaker.retry_in
+        lowered = not probe and error_type in OVERLOAD_ERROR_TYPES and health.bulkhead.record_overload()
         
+        if lowered:
+            logger.info(f"Provider {provider_name}: concurrency limit lowered to {health.bulkhead.limit} ({error_type})")
+        if opened:
+            logger.warning(
+                f"Provider {provider_name}: circuit opened after {health.consecutive_failures} "
+                f"consecutive failures ({error_type}), next trial in {retry_in:.0f}s"
+            )
         logger.debug(f"Provider {provider_name}: failure recorded (rate: {health.success_rate:.2f}, consecutive: {health.consecutive_failures})")
     
+    def allow_request(self, provider_name: str) -> bool:
+        """Check the circuit of a provider before calling it.
+        
+        While the circuit is half-open this reserves one of the limited
+        trial slots, so a call must follow and its outcome be recorded (or
+        the slot given back with ``release_request``).
+        
+        Args:
+            provider_name: Provider name
+            
+        Returns:
+            True if the provider may be called
+        """
+        health = self.get_provider_health(provider_name)
+        with self._lock:
+            return health.breaker.allow()
+    
+    def release_request(self, provider_name: str):
+        """Give back a trial slot of a call that ended without an outcome, e.g. cancelled.
+        
+        Args:
+            provider_name: Provider name
+        """
+        health = self.get_provider_health(provider_name)
+        with self._lock:
+            health.breaker.release()
+    
+    def get_bulkhead(self, provider_name: str) -> Bulkhead:
+        """Get the bulkhead capping the calls in flight to a provider.
+        
+        Args:
+            provider_name: Provider name
+            
+        Returns:
+            The provider's bulkhead
+        """
+        return self.get_provider_health(provider_name).bulkhead
+    
+    def is_provider_available(self, provider_name: str) -> bool:
+        """Check whether the circuit of a provider would admit a call, without reserving a trial."""
+        health = self.get_provider_health(provider_name)
+        with self._lock:
+            return health.breaker.available()
+    
+    def record_latency(self, provider_name: str, first_token: float, total: Optional[float] = None):
+        """Record latency of a successful API call.
+        
+        Args:
+            provider_name: Provider name
+            first_token: Seconds until the first response chunk
+            total: Seconds until the response was complete
+        """
+        health = self.get_provider_health(provider_name)
+        with self._lock:
+            health.first_token_latencies.add(first_token)
+            health.total_latencies.add(total if total is not None else first_token)
+    
+    def record_chunk_gap(self, provider_name: str, gap: float):
+        """Record the longest wait between two chunks of a streamed call.
+        
+        Args:
+            provider_name: Provider name
+            gap: Seconds
+        """
+        health = self.get_provider_health(provider_name)
+        with self._lock:
+            health.chunk_gaps.add(gap)
+    
+    def get_latency_percentile(
+        self,
+        provider_name: str,
+        percentile: float,
+        kind: str = "first_token",
+        min_samples: int = 5
+    ) -> Optional[float]:
+        """Get a latency percentile over the recent samples of a provider.
+        
+        Args:
+            provider_name: Provider name
+            percentile: Percentile between 0 and 100
+            kind: "first_token", "total" or "chunk_gap"
+            min_samples: Minimum samples needed for a meaningful value
+            
+        Returns:
+            Latency in seconds or None if there are too few samples
+        """
+        health = self.get_provider_health(provider_name)
+        samples = {
+            "first_token": health.first_token_latencies,
+            "total": health.total_latencies,
+            "chunk_gap": health.chunk_gaps
+        }[kind]
+        with self._lock:
+            if len(samples) < min_samples:
+                return None
+            return samples.percentile(percentile)
+    
+    def get_routing_sample(self, provider_name: str, rng: random.Random) -> Tuple[int, int, Optional[float]]:
+        """Get what the router needs to score a provider.
+        
+        Args:
+            provider_name: Provider name
+            rng: Random generator used to draw the latency sample
+            
+        Returns:
+            Windowed successes, windowed failures and one recent total latency
+            drawn at random (None without samples)
+        """
+        health = self.get_provider_health(provider_name)
+        with self._lock:
+            successes, failures = health.outcomes.counts()
+            return successes, failures, health.total_latencies.sample(rng)
+    
+    def get_last_activity(self, provider_name: str) -> Optional[float]:
+        """Get when the last call outcome of a provider was recorded.
+        
+        Args:
+            provider_name: Provider name
+        
+        Returns:
+            Timestamp of the last success or failure, None if never called
+        """
+        health = self.providers.get(provider_name)
+        if health is None:
+            return None
+        with self._lock:
+            return max(filter(None, (health.last_success, health.last_failure)), default=None)
+    
+    def get_mean_latency(self, provider_names: Iterable[str]) -> Optional[float]:
+        """Get the mean recent total latency over providers that have samples.
+        
+        Args:
+            provider_names: Provider names
+            
+        Returns:
+            Mean latency in seconds or None if no provider has samples
+        """
+        with self._lock:
+            means = [
+                self.providers[name].total_latencies.mean()
+                for name in provider_names
+                if name in self.providers and len(self.providers[name].total_latencies)
+            ]
+        return sum(means) / len(means) if means else None
+    
     def get_healthy_providers(self, available_providers: Dict[str, any]) -> List[str]:
         """Get list of healthy providers."""
         healthy = []
@@ -107,14 +483,19 @@ class ProviderMonitor:
             if provider_name == "Auto":
                 continue
             
-            if provider_name in self.blacklisted_providers:
-                continue
-            
             health = self.get_provider_health(provider_name)
+            with self._lock:
+                if not health.breaker.available():
+                    continue
+                health.update_status()
+                half_open = health.breaker.state is CircuitState.HALF_OPEN
             
             # Include provider if it's healthy or unknown (give it a chance)
             if health.status in [ProviderStatus.HEALTHY, ProviderStatus.UNKNOWN]:
                 healthy.append(provider_name)
+            elif half_open:
+                # Cool-down is over: let the provider prove it has recovered
+                healthy.append(provider_name)
             elif health.status == ProviderStatus.DEGRADED and health.consecutive_failures < 3:
                 # Give degraded providers a chance if not too many consecutive failures
                 healthy.append(provider_name)
@@ -129,44 +510,42 @@ class ProviderMonitor:
             if provider_name == "Auto":
                 continue
             
-            if provider_name in self.blacklisted_providers:
-                continue
-            
             health = self.get_provider_health(provider_name)
-            if health.is_reliable:
-                reliable.append(provider_name)
+            with self._lock:
+                if health.is_reliable and health.breaker.available():
+                    reliable.append(provider_name)
         
         # Sort by success rate
-        reliable.sort(key=lambda p: self.get_provider_health(p).success_rate, reverse=True)
+        with self._lock:
+            success_rates = {p: self.get_provider_health(p).success_rate for p in reliable}
+        reliable.sort(key=success_rates.get, reverse=True)
         
         # Add some known reliable providers if list is empty
         if not reliable:
             fallback_providers = ["DuckDuckGo", "Blackbox", "DeepInfra", "PerplexityLabs"]
             for provider in fallback_providers:
-                if provider in available_providers and provider not in self.blacklisted_providers:
+                if provider in available_providers and self.is_provider_available(provider):
                     reliable.append(provider)
         
         return reliable
     
-    def is_provider_blacklisted(self, provider_name: str) -> bool:
-        """Check if provider is blacklisted."""
-        return provider_name in self.blacklisted_providers
-    
-    def blacklist_provider(self, provider_name: str, reason: str = ""):
-        """Add provider to blacklist."""
-        self.blacklisted_providers.add(provider_name)
-        logger.warning(f"Provider {provider_name} blacklisted: {reason}")
-    
     def get_status_summary(self) -> Dict[str, any]:
         """Get summary of all provider statuses."""
         summary = {
             "healthy": [],
             "degraded": [],
             "unhealthy": [],
-            "blacklisted": list(self.blacklisted_providers)
+            "open_circuits": []
         }
         
-        for provider_name, health in self.providers.items():
+        with self._lock:
+            providers = list(self.providers.items())
+            for provider_name, health in providers:
+                health.update_status()
+                if health.breaker.state is CircuitState.OPEN:
+                    summary["open_circuits"].append(provider_name)
+        
+        for provider_name, health in providers:
             if health.status == ProviderStatus.HEALTHY:
                 summary["healthy"].append({
                     "name": provider_name,
@@ -183,10 +562,37 @@ class ProviderMonitor:
                 summary["unhealthy"].append({
                     "name": provider_name,
                     "consecutive_failures": health.consecutive_failures,
-                    "error_types": list(health.error_types)
+                    "error_types": health.recent_error_types
                 })
         
         return summary
+    
+    def get_stats(self) -> Dict[str, Dict[str, any]]:
+        """Get windowed success rates and latency percentiles of every provider that was called.
+        
+        Returns:
+            Dictionary by provider name, with latencies in milliseconds
+        """
+        stats = {}
+        with self._lock:
+            for provider_name, health in self.providers.items():
+                if not health.success_count and not health.failure_count:
+                    continue
+                successes, failures = health.outcomes.counts()
+                stats[provider_name] = {
+                    "status": health.status.value,
+                    "success_rate": round(successes / (successes + failures), 3) if successes + failures else None,
+                    "calls": successes + failures,
+                    "consecutive_failures": health.consecutive_failures,
+                    "circuit": health.breaker.state.value,
+                    "circuit_retry_in": round(health.breaker.retry_in, 1),
+                    "first_token_ms": health.first_token_latencies.percentiles(),
+                    "total_ms": health.total_latencies.percentiles(),
+                    "chunk_gap_ms": health.chunk_gaps.percentiles(),
+                    "concurrency": health.bulkhead.stats(),
+                    "error_types": health.recent_error_types
+                }
+        return stats
 
 # Global provider monitor instance
 provider_monitor = ProviderMonitor()
@@ -0,0 +1,66 @@
+"""Latency-aware provider routing."""
+
+import random
+from typing import Iterable, List, Optional
+
+from .provider_monitor import ProviderMonitor
+
+# Lower bound on a sampled success probability, so scores stay finite
+MIN_SUCCESS_PROBABILITY = 0.01
+
+class ProviderRouter:
+    """Order providers by expected time to a successful response.
+
+    Uses Thompson sampling over each provider's recent window. For every
+    request, a success probability ``p`` is drawn from ``Beta(1 + successes,
+    1 + failures)`` and a latency from the provider's recent latency
+    samples. Providers are ranked by ``latency + (1 - p) / p * failure_cost``,
+    the expected time until a success when each failure costs
+    ``failure_cost`` seconds. Providers with few or no recent calls
+    get wide draws, so they keep receiving some traffic and a recovered
+    provider wins back its share. Providers without latency samples are
+    assumed to be as fast as the average provider.
+    """
+
+    def __init__(
+        self,
+        monitor: ProviderMonitor,
+        prior_latency: float = 5.0,
+        failure_cost: float = 10.0,
+        rng: Optional[random.Random] = None
+    ):
+        """Initialize the router.
+
+        Args:
+            monitor: Provider monitor with the windowed statistics
+            prior_latency: Latency assumed when no provider has samples
+            failure_cost: Seconds a failed attempt is expected to waste
+            rng: Random generator, for reproducible simulations
+        """
+        self.monitor = monitor
+        self.prior_latency = prior_latency
+        self.failure_cost = failure_cost
+        self.rng = rng or random.Random()
+
+    def rank(self, providers: Iterable[str]) -> List[str]:
+        """Order providers for one request, most promising first.
+
+        Args:
+            providers: Candidate provider names
+
+        Returns:
+            Provider names in the order they should be tried
+        """
+        providers = list(providers)
+        default_latency = self.monitor.get_mean_latency(providers) or self.prior_latency
+
+        scored = []
+        for provider_name in providers:
+            successes, failures, latency = self.monitor.get_routing_sample(provider_name, self.rng)
+            probability = max(MIN_SUCCESS_PROBABILITY, self.rng.betavariate(1 + successes, 1 + failures))
+            if latency is None:
+                latency = default_latency
+            scored.append((latency + (1 - probability) / probability * self.failure_cost, provider_name))
+
+        scored.sort()
+        return [provider_name for _, provider_name in scored]
@@ -0,0 +1,238 @@
+"""Health-scored proxy pool."""
+
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .helpers import format_proxy_url
+from .logging import logger
+
+# Latency assumed for proxies without samples when no proxy has any
+DEFAULT_LATENCY = 1.0
+
+# Smallest selection weight factor, so unhealthy proxies still get probed
+MIN_HEALTH = 0.05
+
+class _ProxyStats:
+    """Health of one proxy."""
+
+    __slots__ = (
+        "url", "label", "latency", "error_rate", "requests", "failures",
+        "consecutive_failures", "benched_until", "benches"
+    )
+
+    def __init__(self, url: str, label: str):
+        self.url = url
+        self.label = label
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.benched_until = 0.0
+        self.benches = 0
+
+class ProxyPool:
+    """Pick proxies weighted by their recent health.
+
+    The proxy file is loaded once and reloaded when its modification time or
+    size changes (checked at most every ``check_interval`` seconds); stats of
+    proxies that are still listed survive a reload. Each proxy keeps an EWMA
+    of its latency and error rate, and is chosen with probability
+    proportional to ``(1 - error_rate) / latency``. A proxy that fails
+    ``bench_after`` times in a row is benched for ``bench_seconds``. With
+    ``sticky`` enabled, a provider keeps using the proxy it last used while
+    that proxy is not benched. Thread-safe.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        check_interval: float = 1.0,
+        alpha: float = 0.2,
+        bench_after: int = 3,
+        bench_seconds: float = 60.0,
+        sticky: bool = False
+    ):
+        """Initialize the pool.
+
+        Args:
+            path: Proxy file path (JSON list of proxy dictionaries)
+            check_interval: Minimum seconds between checks of the file for changes
+            alpha: EWMA smoothing factor for latency and error rate
+            bench_after: Consecutive failures that bench a proxy
+            bench_seconds: Seconds a failing proxy is left out of selection
+            sticky: Keep each provider on the proxy it last used
+        """
+        self.path = path
+        self.check_interval = check_interval
+        self.alpha = alpha
+        self.bench_after = bench_after
+        self.bench_seconds = bench_seconds
+        self.sticky = sticky
+        self._proxies: Dict[str, _ProxyStats] = {}
+        self._affinity: Dict[str, str] = {}
+        self._signature = None
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def select(self, provider: Optional[str] = None) -> Optional[str]:
+        """Choose a proxy for a call.
+
+        Args:
+            provider: Provider the call goes to, used for sticky affinity
+
+        Returns:
+            Proxy URL or None if no proxies are configured
+        """
+        self._refresh()
+        now = time.monotonic()
+        with self._lock:
+            if not self._proxies:
+                return None
+
+            if self.sticky and provider is not None:
+                stats = self._proxies.get(self._affinity.get(provider))
+                if stats is not None and stats.benched_until <= now:
+                    return stats.url
+
+            candidates = [stats for stats in self._proxies.values() if stats.benched_until <= now]
+            if not candidates:
+                # Everything is benched: use the proxy that comes back first
+                chosen = min(self._proxies.values(), key=lambda stats: stats.benched_until)
+            else:
+                chosen = random.choices(candidates, weights=self._weights(candidates))[0]
+
+            if provider is not None:
+                self._affinity[provider] = chosen.url
+            return chosen.url
+
+    def _weights(self, candidates: List[_ProxyStats]) -> List[float]:
+        """Selection weights, with unmeasured proxies assumed to be average."""
+        measured = [stats.latency for stats in candidates if stats.latency is not None]
+        default_latency = sum(measured) / len(measured) if measured else DEFAULT_LATENCY
+        return [
+            max(MIN_HEALTH, 1.0 - stats.error_rate) / max(0.01, stats.latency or default_latency)
+            for stats in candidates
+        ]
+
+    def record_success(self, proxy: Optional[str], latency: Optional[float] = None):
+        """Record a call that went through a proxy.
+
+        Args:
+            proxy: Proxy URL returned by ``select``
+            latency: Seconds until the first response chunk
+        """
+        with self._lock:
+            stats = self._proxies.get(proxy)
+            if stats is None:
+                return
+            stats.requests += 1
+            stats.consecutive_failures = 0
+            stats.benches = 0
+            stats.error_rate *= 1 - self.alpha
+            if latency is not None:
+                stats.latency = latency if stats.latency is None else (
+                    self.alpha * latency + (1 - self.alpha) * stats.latency
+                )
+
+    def record_failure(self, proxy: Optional[str]):
+        """Record a call that failed because of its proxy, benching the proxy at the limit.
+
+        Args:
+            proxy: Proxy URL returned by ``select``
+        """
+        with self._lock:
+            stats = self._proxies.get(proxy)
+            if stats is None:
+                return
+            stats.requests += 1
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            stats.error_rate = self.alpha + (1 - self.alpha) * stats.error_rate
+            if stats.consecutive_failures < self.bench_after:
+                return
+
+            # Bench for longer each time the proxy fails again right after a bench
+            stats.benches += 1
+            duration = self.bench_seconds * min(8, 2 ** (stats.benches - 1))
+            stats.benched_until = time.monotonic() + duration
+            stats.consecutive_failures = 0
+            for provider in [name for name, url in self._affinity.items() if url == proxy]:
+                del self._affinity[provider]
+        logger.warning(f"Benched proxy {stats.label} for {duration:.0f}s after {self.bench_after} consecutive failures")
+
+    def _refresh(self):
+        """Reload the proxy file if it changed."""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+
+        try:
+            stat = os.stat(self.path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            signature = None
+        if signature == self._signature and self.reloads:
+            return
+
+        proxies = self._load() if signature is not None else []
+        if proxies is None:
+            return  # Unreadable, e.g. caught mid-write: keep the current list
+
+        with self._lock:
+            current = {}
+            for url, label in proxies:
+                current[url] = self._proxies.get(url) or _ProxyStats(url, label)
+            self._proxies = current
+            self._affinity = {provider: url for provider, url in self._affinity.items() if url in current}
+            self._signature = signature
+            self.reloads += 1
+
+        if proxies:
+            logger.info(f"Loaded {len(proxies)} proxies from {self.path}")
+        else:
+            logger.warning("No proxies configured")
+
+    def _load(self) -> Optional[List[tuple]]:
+        """Read the proxy file as (URL, label) pairs, returning None if it cannot be read."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Failed to load proxy file {self.path}: {e}")
+            return None
+
+        proxies = []
+        for proxy in data if isinstance(data, list) else []:
+            try:
+                # Label without credentials, for logs and stats
+                proxies.append((format_proxy_url(proxy), f"{proxy['protocol']}://{proxy['ip']}:{proxy['port']}"))
+            except (KeyError, TypeError):
+                logger.warning(f"Skipping invalid proxy entry in {self.path}")
+        return proxies
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Get per-proxy statistics, without credentials.
+
+        Returns:
+            One dictionary per proxy with latency, error rate, request counts and bench state
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "proxy": stats.label,
+                    "latency": round(stats.latency, 3) if stats.latency is not None else None,
+                    "error_rate": round(stats.error_rate, 3),
+                    "requests": stats.requests,
+                    "failures": stats.failures,
+                    "benched_for": round(max(0.0, stats.benched_until - now), 1),
+                }
+                for stats in self._proxies.values()
+            ]
@@ -0,0 +1,149 @@
+"""Coalescing of identical in-flight requests."""
+
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+class _Call:
+    """Shared upstream call and the number of callers waiting on it."""
+
+    def __init__(self, task: "asyncio.Future"):
+        self.task = task
+        self.waiters = 0
+
+class _Broadcast:
+    """Shared upstream stream replayed to every subscriber."""
+
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.changed = asyncio.Condition()
+        self.subscribers = 0
+        self.task: Optional["asyncio.Future"] = None
+
+    async def notify(self):
+        """Wake subscribers waiting for new chunks."""
+        async with self.changed:
+            self.changed.notify_all()
+
+class SingleFlight:
+    """Run at most one upstream call per key at a time.
+
+    Callers that ask for a key while a call for it is running attach to that
+    call and receive its result (or error). Streams are buffered and replayed,
+    so a subscriber that joins late still gets every chunk from the start.
+    The upstream call is cancelled once every caller has gone away.
+
+    Must be used from a single event loop.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._streams: Dict[str, _Broadcast] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Run a call, or wait for the identical call already in flight.
+
+        Args:
+            key: Identity of the call
+            factory: Creates the coroutine performing the call
+
+        Returns:
+            Result of the shared call
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(factory()))
+            self._calls[key] = call
+            self.started += 1
+
+            def forget(_):
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+
+            call.task.add_done_callback(forget)
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """Stream a call, or subscribe to the identical stream already in flight.
+
+        Args:
+            key: Identity of the call
+            factory: Creates the async iterator performing the call
+
+        Yields:
+            Every chunk of the shared stream, from the first one
+        """
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast()
+            self._streams[key] = broadcast
+            broadcast.task = asyncio.ensure_future(self._pump(key, broadcast, factory))
+            self.started += 1
+        else:
+            self.coalesced += 1
+
+        broadcast.subscribers += 1
+        index = 0
+        try:
+            while True:
+                async with broadcast.changed:
+                    await broadcast.changed.wait_for(
+                        lambda: index < len(broadcast.chunks) or broadcast.done
+                    )
+                while index < len(broadcast.chunks):
+                    chunk = broadcast.chunks[index]
+                    index += 1
+                    yield chunk
+                if broadcast.done and index >= len(broadcast.chunks):
+                    if broadcast.error is not None:
+                        raise broadcast.error
+                    return
+        finally:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.done:
+                if self._streams.get(key) is broadcast:
+                    del self._streams[key]
+                broadcast.task.cancel()
+
+    async def _pump(self, key: str, broadcast: _Broadcast, factory: Callable[[], AsyncIterator[Any]]):
+        """Consume the upstream stream into the broadcast buffer."""
+        upstream = factory()
+        try:
+            async for chunk in upstream:
+                broadcast.chunks.append(chunk)
+                await broadcast.notify()
+        except asyncio.CancelledError:
+            broadcast.error = asyncio.CancelledError()
+        except Exception as e:
+            broadcast.error = e
+        finally:
+            if hasattr(upstream, "aclose"):
+                await upstream.aclose()
+            broadcast.done = True
+            if self._streams.get(key) is broadcast:
+                del self._streams[key]
+            await broadcast.notify()
+
+    def stats(self) -> Dict[str, int]:
+        """Get coalescing statistics.
+
+        Returns:
+            Dictionary with started and coalesced call counts and calls in flight
+        """
+        return {
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls) + len(self._streams),
+        }
@@ -0,0 +1,123 @@
+"""Pool of reusable SQLite connections."""
+
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+from .logging import logger
+
+class SQLitePool:
+    """Reuse SQLite connections instead of opening one per operation.
+
+    Connections are tuned once when created (WAL journal, ``synchronous``,
+    ``busy_timeout`` and ``cache_size``) and returned to the pool after each
+    use, so their prepared-statement caches survive between operations. A
+    connection is used by one thread at a time; any transaction left open by
+    a caller is rolled back before the connection is reused.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        pool_size: int = 8,
+        busy_timeout: float = 5.0,
+        cache_size_kb: int = 2048,
+        synchronous: str = "NORMAL",
+        cached_statements: int = 128,
+        row_factory=sqlite3.Row
+    ):
+        """Initialize the pool and switch the database to WAL mode.
+
+        Args:
+            path: Database file path
+            pool_size: Maximum number of idle connections kept open
+            busy_timeout: Seconds to wait for a lock held by another connection
+            cache_size_kb: Page cache size per connection in KiB
+            synchronous: SQLite synchronous mode
+            cached_statements: Prepared statements cached per connection
+            row_factory: Row factory for new connections
+        """
+        self.path = path
+        self.pool_size = pool_size
+        self.busy_timeout = busy_timeout
+        self.cache_size_kb = cache_size_kb
+        self.synchronous = synchronous
+        self.cached_statements = cached_statements
+        self.row_factory = row_factory
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self.created = 0
+
+        conn = self._connect()
+        try:
+            mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+            if str(mode).lower() != "wal":
+                logger.warning(f"SQLite database {path} is using journal mode '{mode}' instead of WAL")
+        finally:
+            self._release(conn)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open and tune a new connection."""
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        conn.row_factory = self.row_factory
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        with self._lock:
+            self.created += 1
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        """Take an idle connection or open a new one."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _release(self, conn: sqlite3.Connection):
+        """Return a connection to the pool, closing it if the pool is full."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            return
+
+        if self._idle.qsize() < self.pool_size:
+            self._idle.put(conn)
+        else:
+            conn.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection for the duration of a ``with`` block.
+
+        Yields:
+            Database connection
+        """
+        conn = self._acquire()
+        try:
+            yield conn
+        except BaseException:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                pass
+            raise
+        finally:
+            self._release(conn)
+
+    def close(self):
+        """Close all idle connections."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
@@ -170,3 +170,24 @@ def validate_model(model: str) -> tuple[bool, Optional[str]]:
         return False, "Model name too long"
     
     return True, None
+
+def validate_conversation_id(conversation_id: str) -> tuple[bool, Optional[str]]:
+    """Validate conversation ID.
+    
+    Args:
+        conversation_id: Conversation ID
+        
+    Returns:
+        Tuple of (is_valid, error_message)
+    """
+    if not conversation_id:
+        return False, "Conversation ID cannot be empty"
+    
+    if len(conversation_id) > 64:
+        return False, "Conversation ID must be at most 64 characters long"
+    
+    # Allow alphanumeric, underscore and hyphen (UUIDs included)
+    if not re.match(r'^[a-zA-Z0-9_-]+$', conversation_id):
+        return False, "Conversation ID can only contain letters, numbers, underscores and hyphens"
+    
+    return True, None
@@ -0,0 +1,13 @@
+"""Shared test setup: keep the databases of the service out of the data volume."""
+
+import os
+import tempfile
+
+import pytest
+
+_data_dir = tempfile.mkdtemp(prefix="freegpt4-tests-")
+os.environ.setdefault("DATABASE_PATH", os.path.join(_data_dir, "settings.db"))
+os.environ.setdefault("RESPONSE_CACHE_DISK_PATH", os.path.join(_data_dir, "response_cache.db"))
+
+# The service talks to providers through g4f
+pytest.importorskip("g4f")
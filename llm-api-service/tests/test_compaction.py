@@ -0,0 +1,39 @@
+"""Tests for background compaction of long conversations."""
+
+import asyncio
+from uuid import uuid4
+
+from freegpt4.ai_service import SUMMARY_PREFIX, ai_service
+from freegpt4.config import config
+from freegpt4.utils.context_window import estimate_message_tokens
+
+def test_compaction_replaces_only_summarized_messages(monkeypatch):
+    """A range larger than the transcript budget is compacted in part, never dropped."""
+    monkeypatch.setattr(config.history, "compaction_threshold", 10)
+    monkeypatch.setattr(config.history, "compaction_keep_recent", 4)
+    monkeypatch.setattr(config.history, "compaction_max_tokens", 1000)
+
+    conversation = f"compaction-{uuid4().hex[:8]}"
+    messages = [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i} " + "x" * 800}
+        for i in range(30)
+    ]
+    ai_service.db.append_messages("user", messages, conversation)
+    assert estimate_message_tokens(messages[:-4]) > config.history.compaction_max_tokens
+
+    transcripts = []
+
+    async def summarize(chat_history, **kwargs):
+        transcripts.append(chat_history[-1]["content"])
+        return "summary"
+
+    monkeypatch.setattr(ai_service, "_call_ai_api", summarize)
+    settings = {"provider": "Auto", "model": "gpt-4", "system_prompt": "", "message_history": True}
+    asyncio.run(ai_service._compact_history("user", conversation, settings, False, None))
+
+    stored = ai_service.db.get_messages("user", conversation)
+    summarized = [msg for msg in messages if msg["content"].split(" x")[0] + " " in transcripts[0]]
+    assert 2 <= len(summarized) < len(messages) - 4
+    assert stored[0] == {"role": "system", "content": SUMMARY_PREFIX + "summary"}
+    # Every message that did not reach the summarizer is still stored, in order
+    assert stored[1:] == messages[len(summarized):]
@@ -0,0 +1,43 @@
+"""Tests for background health probing against a stub provider."""
+
+import asyncio
+
+from freegpt4.ai_service import ai_service
+from freegpt4.config import config
+from freegpt4.utils.provider_monitor import ProviderStatus, provider_monitor
+
+def _stub_provider(monkeypatch, behaviour):
+    """Route every provider call through ``behaviour`` and pick a provider to probe."""
+    async def stream(chat_history, ai_provider, model, cookies, proxy, provider_name, deadline):
+        yield await behaviour()
+
+    monkeypatch.setattr(ai_service, "_stream_api_call", stream)
+    return next(name for name, provider in config.available_providers.items() if provider)
+
+def test_failing_probe_leaves_concurrency_and_circuit_alone(monkeypatch):
+    """A timed-out probe marks the provider down without touching its bulkhead or circuit."""
+    async def hang():
+        await asyncio.sleep(1)
+        return "late"
+
+    provider = _stub_provider(monkeypatch, hang)
+    monkeypatch.setattr(config.probing, "timeout", 0.05)
+    health = provider_monitor.get_provider_health(provider)
+    limit = health.bulkhead.limit
+
+    for _ in range(6):
+        assert asyncio.run(ai_service.probe_provider(provider)) is False
+
+    assert health.bulkhead.limit == limit
+    assert provider_monitor.allow_request(provider)
+    provider_monitor.release_request(provider)
+    assert health.status is ProviderStatus.UNHEALTHY
+
+def test_successful_probe_records_health(monkeypatch):
+    """A probe that answers marks the provider healthy."""
+    async def answer():
+        return "pong"
+
+    provider = _stub_provider(monkeypatch, answer)
+    assert asyncio.run(ai_service.probe_provider(provider)) is True
+    assert provider_monitor.get_provider_health(provider).last_success is not None